@@ -5,9 +5,12 @@ use std::io::{self, Read};
 use std::net::TcpListener;
 use std::thread;
 use std::time::Duration;
-use actix_web::{get, web, App, HttpServer, HttpResponse, Responder};
+use actix_web::{get, web, App, HttpRequest, HttpServer, HttpResponse, Responder};
+use actix_web::http::header;
+use futures_util::stream;
 use reqwest::Client;
 use tokio::runtime::Runtime;
+use tokio::sync::broadcast;
 
 // ==================== STRUCTURES (TIDAK BERUBAH) ====================
 #[derive(Serialize, Deserialize, Clone, Debug)]
@@ -41,10 +44,12 @@ struct AppState {
     current_level: Arc<Mutex<i32>>,
     current_state: Arc<Mutex<i32>>,
     influx_config: Arc<Mutex<InfluxConfig>>,  // ✅ BARU
+    live_tx: broadcast::Sender<SensorPacket>,  // ✅ BARU: push ke client /api/stream
 }
 
 impl AppState {
     fn new() -> Self {
+        let (live_tx, _) = broadcast::channel(1024);
         AppState {
             buffer: Arc::new(Mutex::new(Vec::new())),
             arduino_connected: Arc::new(Mutex::new(false)),
@@ -56,6 +61,7 @@ impl AppState {
                 org: "sps".to_string(),
                 bucket: "enose_data".to_string(),
             })),
+            live_tx,
         }
     }
 }
@@ -323,6 +329,9 @@ fn handle_arduino_connection(mut stream: std::net::TcpStream, state: AppState) {
                                 println!("💾 Stored data point. Total: {}", buf.len());
                             }
                             
+                            // ✅ BARU: Push ke semua client /api/stream (error = belum ada subscriber)
+                            let _ = state.live_tx.send(sensor_data.clone());
+                            
                             // ✅ BARU: Kirim ke InfluxDB
                             let config = state.influx_config.lock().unwrap();
                             send_to_influxdb(&sensor_data, &config);
@@ -370,10 +379,109 @@ async fn get_status(data: web::Data<AppState>) -> impl Responder {
     }))
 }
 
+#[derive(Deserialize)]
+struct DataQuery {
+    since: Option<u64>,
+}
+
+// ✅ BARU: Format biner kolom (lihat frontend/enose_wire.py), dipilih client lewat header Accept.
+// Little-endian: "ENC1", u32 n, u64 timestamp[n], f32 x 7 channel [n], i8 state[n], i8 level[n]
+const WIRE_CONTENT_TYPE: &str = "application/x-enose-columns";
+
+fn encode_columns(packets: &[SensorPacket]) -> Vec<u8> {
+    let n = packets.len();
+    let mut out = Vec::with_capacity(8 + n * 38);
+    out.extend_from_slice(b"ENC1");
+    out.extend_from_slice(&(n as u32).to_le_bytes());
+    for p in packets {
+        out.extend_from_slice(&p.timestamp.to_le_bytes());
+    }
+    let channels: [fn(&SensorPacket) -> f64; 7] = [
+        |p| p.no2, |p| p.eth_gm, |p| p.voc_gm, |p| p.co_gm, |p| p.co_m, |p| p.eth_m, |p| p.voc_m,
+    ];
+    for channel in channels {
+        for p in packets {
+            out.extend_from_slice(&(channel(p) as f32).to_le_bytes());
+        }
+    }
+    for p in packets {
+        out.push(p.current_state as i8 as u8);
+    }
+    for p in packets {
+        out.push(p.current_level as i8 as u8);
+    }
+    out
+}
+
+fn wants_columns(req: &HttpRequest) -> bool {
+    req.headers()
+        .get(header::ACCEPT)
+        .and_then(|value| value.to_str().ok())
+        .map_or(false, |accept| accept.contains(WIRE_CONTENT_TYPE))
+}
+
 #[get("/api/data")]
-async fn get_data(data: web::Data<AppState>) -> impl Responder {
+async fn get_data(req: HttpRequest, data: web::Data<AppState>, query: web::Query<DataQuery>) -> impl Responder {
     let buffer = data.buffer.lock().unwrap();
-    HttpResponse::Ok().json(&*buffer)
+    
+    // ✅ Incremental: hanya paket dengan timestamp >= since (inklusif, frontend membuang duplikat)
+    let start = match query.since {
+        Some(since) => buffer.iter().rposition(|p| p.timestamp < since).map_or(0, |i| i + 1),
+        None => 0,
+    };
+    let mut response = HttpResponse::Ok();
+    if let Some(since) = query.since {
+        response.insert_header(("X-Enose-Since", since.to_string()));
+    }
+    response.insert_header((header::VARY, "Accept"));
+    if wants_columns(&req) {
+        response.content_type(WIRE_CONTENT_TYPE).body(encode_columns(&buffer[start..]))
+    } else {
+        response.json(&buffer[start..])
+    }
+}
+
+// ✅ BARU: Stream NDJSON - satu SensorPacket per baris begitu disimpan, koneksi tetap terbuka.
+// ?since= mengirim dulu paket di buffer dengan timestamp >= since (resume setelah reconnect).
+// Baris kosong dikirim sebagai heartbeat jika tidak ada data selama STREAM_HEARTBEAT.
+const STREAM_HEARTBEAT: Duration = Duration::from_secs(5);
+
+fn packet_line(packet: &SensorPacket) -> String {
+    let mut line = serde_json::to_string(packet).unwrap_or_default();
+    line.push('\n');
+    line
+}
+
+#[get("/api/stream")]
+async fn stream_data(data: web::Data<AppState>, query: web::Query<DataQuery>) -> impl Responder {
+    // Subscribe sebelum membaca buffer: paket yang masuk di antaranya tidak hilang (duplikat dibuang frontend)
+    let rx = data.live_tx.subscribe();
+    let mut first_chunk = String::from("\n");
+    if let Some(since) = query.since {
+        let buffer = data.buffer.lock().unwrap();
+        let start = buffer.iter().rposition(|p| p.timestamp < since).map_or(0, |i| i + 1);
+        for packet in &buffer[start..] {
+            first_chunk.push_str(&packet_line(packet));
+        }
+    }
+    
+    let body = stream::unfold((rx, Some(first_chunk)), |(mut rx, pending)| async move {
+        if let Some(chunk) = pending {
+            return Some((Ok::<_, std::io::Error>(web::Bytes::from(chunk)), (rx, None)));
+        }
+        match tokio::time::timeout(STREAM_HEARTBEAT, rx.recv()).await {
+            Ok(Ok(packet)) => Some((Ok(web::Bytes::from(packet_line(&packet))), (rx, None))),
+            // Client terlalu lambat dan ketinggalan paket: tutup stream, client reconnect dengan ?since=
+            Ok(Err(broadcast::error::RecvError::Lagged(_))) => None,
+            Ok(Err(broadcast::error::RecvError::Closed)) => None,
+            Err(_) => Some((Ok(web::Bytes::from_static(b"\n")), (rx, None))),
+        }
+    });
+    
+    HttpResponse::Ok()
+        .content_type("application/x-ndjson")
+        .insert_header(("Cache-Control", "no-cache"))
+        .streaming(body)
 }
 
 #[get("/api/csv")]
@@ -502,8 +610,10 @@ async fn main() -> std::io::Result<()> {
             .app_data(web::Data::new(state.clone()))
             .service(get_status)
             .service(get_data)
+            .service(stream_data)
             .service(get_influx_config)
             .service(get_csv)
+            .service(get_csv_timeseries)
     })
     .bind(("0.0.0.0", 8080))?  // ✅ PORT BERBEDA!
     .run()
@@ -0,0 +1,674 @@
+# benchmark.py
+# Benchmark pipeline frontend: poll -> ingest -> buffer -> render, dengan mock backend lokal.
+#
+#   python benchmark.py                                  # sweep default, hasil ke benchmark_results.json
+#   python benchmark.py --rates 10,100,1000 --duration 10 --points 500,50000,1000000
+#   python benchmark.py --devices 16 --slow-devices 1      # multi-device: 16 backend, 1 yang hang
+#   python benchmark.py --compare old.json --out new.json   # exit code 1 jika ada regresi
+#   python benchmark.py --commands 1000                  # RTT kanal kontrol Arduino lewat stub TCP
+#   python benchmark.py --serve --rate 100               # mock backend + stub Arduino (untuk GUI manual)
+#   python benchmark.py --startup 5 --modes poll,binary    # waktu startup (fast vs lama) + wire JSON vs biner
+import argparse
+import json
+import os
+import platform
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+from enose_metrics import rss_bytes
+from enose_wire import WIRE_CONTENT_TYPE, encode_columns, packets_to_columns
+
+
+# ==================== MOCK BACKEND ====================
+class MockBackend:
+    """Local stand-in for the Rust backend: /api/status and /api/data(?since=) at a fixed packet rate.
+
+    Paket dibuat per tick sesuai `rate_hz` dan disimpan di buffer berukuran
+    `buffer_size` (paket lama dibuang, seperti backend asli). Tiap paket diberi
+    field `seq` tambahan agar sampel yang hilang bisa dihitung (format biner
+    tidak membawa `seq`: lihat `first_seq`). `delay_s`
+    menunda setiap respons (mensimulasikan device yang lambat/hang).
+    `stream=False` mensimulasikan backend lama tanpa /api/stream (404).
+    """
+
+    def __init__(self, rate_hz=100, buffer_size=1000, host="127.0.0.1", port=0, delay_s=0.0, stream=True):
+        self.rate_hz = rate_hz
+        self.delay_s = delay_s
+        self.stream = stream
+        self.buffer = deque(maxlen=buffer_size)
+        self.generated = 0
+        self.first_seq = {}   # timestamp -> seq paket pertama dengan timestamp itu
+        self._lock = threading.Lock()
+        self._new_data = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._threads = [threading.Thread(target=self._generate, name="mock-gen", daemon=True),
+                         threading.Thread(target=self._server.serve_forever, name="mock-http", daemon=True)]
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._new_data.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _generate(self):
+        start = time.monotonic()
+        while not self._stop.is_set():
+            due = int((time.monotonic() - start) * self.rate_hz)
+            now_ms = int(time.time() * 1000)
+            with self._lock:
+                while self.generated < due:
+                    n = self.generated
+                    state = (n // 200) % 7
+                    packet = {"timestamp": now_ms, "sample": "Active", "seq": n,
+                              "current_state": state, "current_level": 1}
+                    for i, name in enumerate(CHANNELS):
+                        packet[name] = round(1.0 + i + 0.5 * np.sin(n / 50 + i) + 0.1 * state, 4)
+                    self.buffer.append(packet)
+                    self.first_seq.setdefault(now_ms, n)
+                    self.generated += 1
+                self._new_data.notify_all()
+            time.sleep(0.002)
+
+    def snapshot(self, since=None):
+        with self._lock:
+            packets = list(self.buffer)
+        if since is None:
+            return packets
+        # Buffer urut waktu -> cari dari belakang
+        i = len(packets)
+        while i > 0 and packets[i - 1]["timestamp"] >= since:
+            i -= 1
+        return packets[i:]
+
+    def _handler_class(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def stream_packets(self, since):
+                # Sama seperti /api/stream backend: backlog >= since, lalu push per paket + heartbeat
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pending = backend.snapshot(since) if since is not None else []
+                sent = pending[-1]["seq"] if pending else backend.generated - 1
+                try:
+                    self.send_chunk(b"\n" + b"".join(json.dumps(p).encode() + b"\n" for p in pending))
+                    while not backend._stop.is_set():
+                        with backend._new_data:
+                            backend._new_data.wait(5.0)
+                            fresh = [p for p in backend.buffer if p["seq"] > sent]
+                        if fresh:
+                            sent = fresh[-1]["seq"]
+                        self.send_chunk(b"".join(json.dumps(p).encode() + b"\n" for p in fresh) or b"\n")
+                    self.send_chunk(b"")
+                except OSError:
+                    pass  # client menutup koneksi
+                self.close_connection = True
+
+            def do_GET(self):
+                if backend.delay_s:
+                    time.sleep(backend.delay_s)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/api/status":
+                    payload = {"arduino_connected": True, "current_state": 2, "current_level": 1,
+                               "data_points": len(backend.buffer)}
+                elif url.path == "/api/data":
+                    since = int(query["since"][0]) if "since" in query else None
+                    payload = backend.snapshot(since)
+                    if WIRE_CONTENT_TYPE in self.headers.get("Accept", ""):
+                        self.send_body(encode_columns(packets_to_columns(payload)), WIRE_CONTENT_TYPE)
+                        return
+                elif url.path == "/api/stream" and backend.stream:
+                    self.stream_packets(int(query["since"][0]) if "since" in query else None)
+                    return
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_body(json.dumps(payload).encode(), "application/json")
+
+            def send_body(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+# ==================== ARDUINO STUB ====================
+class ArduinoStub:
+    """Local TCP stand-in for the Arduino control port: replies "OK <command>" per line.
+
+    `ack=False` meniru firmware lama yang tidak membalas; `drop_after` menutup
+    koneksi setelah N command (menguji reconnect); `delay_s` menunda setiap ack.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, ack=True, delay_s=0.0, drop_after=None):
+        self.ack = ack
+        self.delay_s = delay_s
+        self.drop_after = drop_after
+        self.commands = []
+        self.connections = 0
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                stub.connections += 1
+                for raw in self.rfile:
+                    command = raw.decode(errors="replace").strip()
+                    stub.commands.append(command)
+                    if stub.delay_s:
+                        time.sleep(stub.delay_s)
+                    if stub.ack:
+                        reply = f"ERR {command}" if command.startswith("BAD") else f"OK {command}"
+                        self.wfile.write(f"{reply}\n".encode())
+                    if stub.drop_after and len(stub.commands) % stub.drop_after == 0:
+                        return
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="arduino-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ==================== MEASUREMENT HELPERS ====================
+def summarize(samples):
+    """Latency summary (ms) of a list of samples"""
+    if not samples:
+        return {"count": 0}
+    a = np.asarray(samples, dtype=np.float64)
+    p50, p90, p99 = np.percentile(a, [50, 90, 99])
+    return {"count": int(a.size), "mean": float(a.mean()), "p50": float(p50), "p90": float(p90),
+            "p99": float(p99), "max": float(a.max())}
+
+
+def timed(fn, sink):
+    """Wrap `fn` so each call's duration (ms) is appended to `sink`"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sink.append((time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def run_event_loop(app, seconds):
+    from PyQt6 import QtCore
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec()
+
+
+def make_window(frontend, backend):
+    window = frontend.MainWindow()
+    # Diset sebelum show(): cek koneksi startup berjalan setelah paint pertama
+    window.backend_ip.setText(backend.host)
+    window.backend_port.setText(str(backend.port))
+    window.show()
+    return window
+
+
+# ==================== SCENARIOS ====================
+def bench_live(app, frontend, rate_hz, buffer_size, duration, poll_interval_ms, max_data_points, mode="poll"):
+    """Drive MainWindow against the mock backend and time every stage of the pipeline.
+
+    mode "poll" = polling /api/data (JSON), "binary" = polling /api/data dalam
+    format kolom biner, "stream" = push stream /api/stream.
+    """
+    backend = MockBackend(rate_hz, buffer_size).start()
+    stages = {"fetch": [], "ingest_batch": [], "update_sensor_display": [], "ingest_columns": [],
+              "render_frame": []}
+    e2e_latency, seqs = [], []
+
+    # poll_backend dipanggil lewat nama global modul frontend (di worker thread)
+    original_poll, original_binary = frontend.poll_backend, frontend.WIRE_BINARY
+    frontend.poll_backend = timed(original_poll, stages["fetch"])
+    frontend.WIRE_BINARY = mode == "binary"
+    window = make_window(frontend, backend)
+    try:
+        window.set_poll_interval(poll_interval_ms)
+        window.set_max_data_points(max_data_points)
+        window.stream_check.setChecked(mode == "stream")
+
+        ingest_one = window.update_sensor_display
+
+        def update_sensor_display(packet):
+            start = time.perf_counter()
+            ingest_one(packet)
+            stages["update_sensor_display"].append((time.perf_counter() - start) * 1000)
+            e2e_latency.append(time.time() * 1000 - packet["timestamp"])
+            seqs.append(packet["seq"])
+
+        window.update_sensor_display = update_sensor_display
+        ingest_batch = window.ingest_columns
+        seen_at_timestamp = {}
+
+        def ingest_columns(columns):
+            start = time.perf_counter()
+            ingest_batch(columns)
+            stages["ingest_columns"].append((time.perf_counter() - start) * 1000)
+            now_ms = time.time() * 1000
+            timestamps = columns["timestamp"].tolist()
+            # Poll pertama melewati paket lain dengan timestamp yang sama -> hitungan ikut cursor
+            cursor = window.data_cursor
+            seen_at_timestamp[cursor.timestamp] = cursor.count_at_timestamp - timestamps.count(cursor.timestamp)
+            for ts in timestamps:
+                nth = seen_at_timestamp.get(ts, 0)
+                seen_at_timestamp[ts] = nth + 1
+                seqs.append(backend.first_seq[ts] + nth)
+                e2e_latency.append(now_ms - ts)
+
+        window.ingest_columns = ingest_columns
+        window._on_poll_result = timed(window._on_poll_result, stages["ingest_batch"])
+        window.render_timer.timeout.disconnect()
+        window.render_timer.timeout.connect(timed(window.render_frame, stages["render_frame"]))
+
+        run_event_loop(app, 1.5)          # startup (test_connection, training classifier)
+        rss_start = rss_bytes()
+        generated_start = backend.generated
+        window.start_monitoring()
+        run_event_loop(app, duration)
+        window.stop_monitoring()
+        generated = backend.generated - generated_start
+        rss_end = rss_bytes()
+        window_metrics = window.metrics.snapshot()
+        run_event_loop(app, 0.3)          # poll yang masih berjalan selesai dulu
+    finally:
+        frontend.poll_backend, frontend.WIRE_BINARY = original_poll, original_binary
+        window.close()
+        window.deleteLater()
+        backend.stop()
+
+    unique = np.unique(seqs)
+    span = int(unique[-1] - unique[0] + 1) if unique.size else 0
+    return {
+        "mode": mode,
+        "rate_hz": rate_hz,
+        "buffer_size": buffer_size,
+        "poll_interval_ms": poll_interval_ms,
+        "max_data_points": max_data_points,
+        "duration_s": duration,
+        "generated": generated,
+        "ingested": len(seqs),
+        "dropped": span - int(unique.size),
+        "duplicates": len(seqs) - int(unique.size),
+        "samples_per_sec": len(seqs) / duration,
+        "ingest_ratio": len(seqs) / generated if generated else None,
+        "stages_ms": {name: summarize(values) for name, values in stages.items()},
+        "e2e_latency_ms": summarize(e2e_latency),
+        "rss_start": rss_start,
+        "rss_end": rss_end,
+        "rss_growth": None if rss_start is None or rss_end is None else rss_end - rss_start,
+        "window_metrics": window_metrics,
+    }
+
+
+def bench_devices(app, frontend, n_devices, slow_devices, rate_hz, duration, poll_interval_ms):
+    """Poll `n_devices` mock backends at once (the first `slow_devices` never answer in time)"""
+    backends = [MockBackend(rate_hz, delay_s=30.0 if i < slow_devices else 0.0).start()
+                for i in range(n_devices)]
+    window = make_window(frontend, backends[-1])
+    try:
+        window.device_registry.path = None   # jangan menimpa devices.json milik user
+        for name in list(window.device_tiles):
+            window.remove_device(name)
+        for i, backend in enumerate(backends):
+            device = window.device_registry.add(f"bench-{i:02d}", backend.host, backend.port)
+            window._add_device_tile(device)
+        window.set_poll_interval(poll_interval_ms)
+        window.btn_devices.setChecked(True)
+        run_event_loop(app, 1.5)
+        window.metrics.reset()
+        window.btn_poll_devices.setChecked(True)
+        run_event_loop(app, duration)
+        window.btn_poll_devices.setChecked(False)
+        snapshot = window.metrics.snapshot()
+        devices = [{"name": d.name, "slow": i < slow_devices, "packets": d.packets,
+                    "connected": d.connected, "failures": d.failures}
+                   for i, d in enumerate(window.device_registry)]
+    finally:
+        window.close()
+        window.deleteLater()
+        for backend in backends:
+            backend.stop()
+
+    healthy = [d["packets"] for d in devices if not d["slow"]]
+    return {
+        "devices": n_devices,
+        "slow_devices": slow_devices,
+        "rate_hz": rate_hz,
+        "poll_interval_ms": poll_interval_ms,
+        "duration_s": duration,
+        "per_device": devices,
+        "healthy_samples_per_sec": {"min": min(healthy) / duration, "mean": float(np.mean(healthy)) / duration}
+        if healthy else None,
+        "poll_ms": snapshot["histograms_ms"].get("devices.poll_ms", {"count": 0}),
+        "tile_refresh_ms": snapshot["histograms_ms"].get("devices.refresh_ms", {"count": 0}),
+        "render_frame_ms": snapshot["histograms_ms"].get("render.frame_ms", {"count": 0}),
+    }
+
+
+def bench_control(n_commands, drop_after=100):
+    """Pipelined command throughput/RTT over ArduinoChannel, then bursts of 10 against a stub that drops the link.
+
+    Command yang sedang in-flight saat koneksi putus sengaja digagalkan (tidak
+    diketahui sampai atau tidak), jadi angka `failed` di skenario kedua adalah
+    jumlah command yang perlu dikirim ulang oleh pemanggil.
+    """
+    from enose_control import ArduinoChannel
+
+    def run(stub, burst):
+        channel = ArduinoChannel(stub.host, stub.port, ack_timeout=2.0, queue_timeout=10.0)
+        start = time.perf_counter()
+        statuses = {"acked": 0, "unacked": 0, "failed": 0}
+        rtts = []
+        for first in range(0, n_commands, burst):
+            futures = [channel.send(f"SET_LEVEL {i}") for i in range(first, min(first + burst, n_commands))]
+            for future in futures:
+                try:
+                    result = future.result(timeout=30)
+                    statuses[result["status"]] += 1
+                    if result["rtt_ms"] is not None:
+                        rtts.append(result["rtt_ms"])
+                except Exception:
+                    statuses["failed"] += 1
+        elapsed = time.perf_counter() - start
+        stats = channel.stats()
+        channel.stop()
+        stub.stop()
+        return dict(statuses, commands=n_commands, elapsed_s=elapsed, commands_per_sec=n_commands / elapsed,
+                    rtt_ms=summarize(rtts), reconnects=stats["reconnects"], connections=stub.connections)
+
+    return {"steady": run(ArduinoStub().start(), n_commands),
+            "drop_every": drop_after,
+            "dropping": run(ArduinoStub(drop_after=drop_after).start(), 10)}
+
+
+def bench_redraw(app, frontend, points, repeats):
+    """Cost of one full redraw with a full buffer of `points` samples per channel"""
+    backend = MockBackend(rate_hz=1).start()
+    window = make_window(frontend, backend)
+    results = []
+    try:
+        for n in points:
+            window.set_max_data_points(n)
+            x = np.arange(1, n + 1, dtype=np.float64)
+            data = np.cumsum(np.random.default_rng(n).normal(size=(len(CHANNELS), n)), axis=1)
+
+            start = time.perf_counter()
+            window.plot_buffer.extend(x, data)
+            fill_ms = (time.perf_counter() - start) * 1000
+            window.data_count = n
+
+            render, paint = [], []
+            for _ in range(repeats):
+                window._mark_curves_dirty()
+                start = time.perf_counter()
+                window.render_frame()
+                render.append((time.perf_counter() - start) * 1000)
+                app.processEvents()        # paint dari setData ikut dihitung
+                paint.append((time.perf_counter() - start) * 1000)
+
+            results.append({
+                "max_data_points": n,
+                "buffer_bytes": int(window.plot_buffer._data.nbytes + window.plot_buffer._x.nbytes),
+                "fill_ms": fill_ms,
+                "render_frame_ms": summarize(render),
+                "frame_with_paint_ms": summarize(paint),
+            })
+            print(f"  redraw {n:>8} pts: render p50 {results[-1]['render_frame_ms']['p50']:.2f} ms, "
+                  f"with paint p50 {results[-1]['frame_with_paint_ms']['p50']:.2f} ms")
+    finally:
+        window.close()
+        window.deleteLater()
+        backend.stop()
+    return results
+
+
+# Dijalankan di proses baru (import dingin): import frontend -> window -> tunggu frame pertama plot
+STARTUP_SCRIPT = """
+import json, os, sys, time
+import frontend
+frontend.FAST_START = {fast}
+from PyQt6 import QtWidgets
+app = QtWidgets.QApplication(sys.argv)
+window = frontend.MainWindow()
+window.show()
+deadline = time.monotonic() + 60
+while "first_frame" not in window._startup_marks and time.monotonic() < deadline:
+    app.processEvents()
+print(json.dumps({{name: (t - frontend._T0) * 1000 for name, t in window._startup_marks.items()}}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+def bench_startup(runs):
+    """Cold-start timeline (ms since `import frontend`) with FAST_START on and off"""
+    results = {}
+    for label, fast in (("fast", True), ("legacy", False)):
+        marks, process_ms = {}, []
+        for _ in range(runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT.format(fast=fast)], capture_output=True,
+                                 text=True, cwd=os.path.dirname(os.path.abspath(__file__)), timeout=120)
+            process_ms.append((time.perf_counter() - start) * 1000)
+            for name, value in json.loads(out.stdout.strip().splitlines()[-1]).items():
+                marks.setdefault(name, []).append(value)
+        results[label] = {"marks_ms": {name: summarize(values) for name, values in marks.items()},
+                          "process_ms": summarize(process_ms)}
+        print(f"  {label}: " + " · ".join(f"{name} {stats['p50']:.0f}" for name, stats
+                                           in results[label]["marks_ms"].items()) + " ms (p50)")
+    return results
+
+
+# ==================== REGRESSION CHECK ====================
+def compare(baseline, current, tolerance):
+    """List metrics that got worse than `tolerance` (relative) versus a previous result file"""
+    regressions = []
+
+    def check(name, old, new, higher_is_better=False):
+        if old is None or new is None or old <= 0:
+            return
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({"metric": name, "baseline": old, "current": new, "change": change})
+
+    old_live = {(r.get("mode", "poll"), r["rate_hz"], r["buffer_size"]): r for r in baseline.get("live", [])}
+    for run in current.get("live", []):
+        old = old_live.get((run["mode"], run["rate_hz"], run["buffer_size"]))
+        if old is None:
+            continue
+        key = f"live[{run['mode']},{run['rate_hz']}Hz]"
+        check(f"{key}.samples_per_sec", old["samples_per_sec"], run["samples_per_sec"], higher_is_better=True)
+        check(f"{key}.e2e_latency_ms.p99", old["e2e_latency_ms"].get("p99"), run["e2e_latency_ms"].get("p99"))
+        for stage, stats in run["stages_ms"].items():
+            check(f"{key}.{stage}.p99", old["stages_ms"].get(stage, {}).get("p99"), stats.get("p99"))
+        if run["dropped"] > old["dropped"]:
+            regressions.append({"metric": f"{key}.dropped", "baseline": old["dropped"],
+                                "current": run["dropped"], "change": None})
+
+    old_startup = (baseline.get("startup") or {}).get("fast")
+    new_startup = (current.get("startup") or {}).get("fast")
+    if old_startup and new_startup:
+        for name in ("first_paint", "first_frame"):
+            check(f"startup.{name}_ms.p50", old_startup["marks_ms"].get(name, {}).get("p50"),
+                  new_startup["marks_ms"].get(name, {}).get("p50"))
+
+    old_redraw = {r["max_data_points"]: r for r in baseline.get("redraw", [])}
+    for run in current.get("redraw", []):
+        old = old_redraw.get(run["max_data_points"])
+        if old is not None:
+            check(f"redraw[{run['max_data_points']}].frame_with_paint_ms.p50",
+                  old["frame_with_paint_ms"].get("p50"), run["frame_with_paint_ms"].get("p50"))
+    return regressions
+
+
+def environment_info():
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+    import pyqtgraph
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pyqt": PYQT_VERSION_STR,
+        "qt": QT_VERSION_STR,
+        "pyqtgraph": pyqtgraph.__version__,
+        "qpa_platform": os.environ.get("QT_QPA_PLATFORM"),
+    }
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="E-Nose frontend pipeline benchmark")
+    parser.add_argument("--rates", type=_int_list, default=[10, 100, 1000], help="packet rates (Hz)")
+    parser.add_argument("--buffer", type=int, default=1000, help="mock backend buffer size (packets)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per live run")
+    parser.add_argument("--modes", default="poll,binary,stream",
+                        help="ingest modes for live runs (poll, binary, stream)")
+    parser.add_argument("--poll-interval", type=int, default=1000, help="frontend poll interval (ms)")
+    parser.add_argument("--live-points", type=int, default=1000, help="max_data_points during live runs")
+    parser.add_argument("--points", type=_int_list, default=[500, 5000, 50000, 200000, 1000000],
+                        help="max_data_points values for the redraw sweep")
+    parser.add_argument("--repeats", type=int, default=20, help="redraws per point count")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="previous result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--devices", type=int, default=0, help="also run an N-device multi-poll scenario")
+    parser.add_argument("--slow-devices", type=int, default=1, help="devices in that scenario that hang")
+    parser.add_argument("--commands", type=int, default=0, help="also run an N-command Arduino control scenario")
+    parser.add_argument("--startup", type=int, default=3, help="cold-start runs per startup mode (0 = skip)")
+    parser.add_argument("--serve", action="store_true", help="only run the mock backend + Arduino stub")
+    parser.add_argument("--rate", type=int, default=100, help="packet rate for --serve")
+    parser.add_argument("--port", type=int, default=8080, help="port for --serve")
+    parser.add_argument("--arduino-port", type=int, default=8082, help="Arduino stub port for --serve")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        backend = MockBackend(args.rate, args.buffer, port=args.port).start()
+        stub = ArduinoStub(port=args.arduino_port).start()
+        print(f"🧪 Mock backend at {backend.url} ({args.rate} packets/s, buffer {args.buffer}), "
+              f"Arduino stub at {stub.host}:{stub.port} - Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            backend.stop()
+            stub.stop()
+        return 0
+
+    from PyQt6 import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    # Dialog modal akan memblokir run offscreen -> cukup dicetak
+    for name in ("information", "warning", "critical"):
+        setattr(QtWidgets.QMessageBox, name, staticmethod(lambda parent, title, text, *a: print(f"   [{title}]")))
+    import frontend
+
+    # Cache kalibrasi, rekaman, spool EI dll. dari window benchmark masuk folder sementara, bukan CWD
+    scratch = tempfile.mkdtemp(prefix="enose_bench_")
+    for name in ("CALIBRATION_DIR", "RECORDINGS_DIR", "REPLAY_CACHE_DIR", "EI_SPOOL_DIR", "PROTOCOL_RUNS_DIR"):
+        setattr(frontend, name, os.path.join(scratch, getattr(frontend, name)))
+
+    results = {"meta": environment_info(), "config": vars(args), "live": [], "redraw": [], "devices": None,
+               "control": None, "startup": None}
+    if args.startup:
+        print(f"⏱ startup: {args.startup} cold start(s) per mode")
+        results["startup"] = bench_startup(args.startup)
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        for rate in args.rates:
+            print(f"📡 live run ({mode}): {rate} Hz for {args.duration:.0f} s")
+            run = bench_live(app, frontend, rate, args.buffer, args.duration, args.poll_interval,
+                             args.live_points, mode)
+            results["live"].append(run)
+            print(f"  {run['samples_per_sec']:.0f} samples/s, dropped {run['dropped']}, "
+                  f"e2e p50 {run['e2e_latency_ms'].get('p50', 0):.0f} ms")
+    if args.devices:
+        print(f"🛰 multi-device run: {args.devices} devices ({args.slow_devices} hanging)")
+        run = bench_devices(app, frontend, args.devices, args.slow_devices, args.rates[0],
+                            args.duration, args.poll_interval)
+        results["devices"] = run
+        print(f"  healthy devices: {run['healthy_samples_per_sec']} samples/s, "
+              f"tile refresh p99 {run['tile_refresh_ms'].get('p99', 0):.1f} ms")
+    if args.commands:
+        print(f"🎛 control channel: {args.commands} pipelined commands")
+        run = bench_control(args.commands)
+        results["control"] = run
+        for key in ("steady", "dropping"):
+            print(f"  {key}: {run[key]['commands_per_sec']:.0f} cmd/s, acked {run[key]['acked']}, "
+                  f"failed {run[key]['failed']}, RTT p50 {run[key]['rtt_ms'].get('p50', 0):.1f} ms")
+    print("🖼️ redraw sweep")
+    results["redraw"] = bench_redraw(app, frontend, args.points, args.repeats)
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            results["regressions"] = compare(json.load(f), results, args.tolerance)
+        for r in results["regressions"]:
+            print(f"⚠️ regression: {r['metric']} {r['baseline']} -> {r['current']}")
+        status = 1 if results["regressions"] else 0
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"💾 Results written to {args.out}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# enose_batch.py
+# Batch CLI: bersihkan, segmentasi, fitur & ringkasan banyak CSV e-nose secara paralel (tanpa Qt)
+#
+#   python frontend.py batch . --out dataset.npz          # semua *.csv di bawah folder, semua core
+#   python enose_batch.py "data ke 2" --out cycles.csv --workers 4
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+from enose_calibration import CALIBRATION_MODES, calibrate_columns
+from enose_classifier import label_from_filename
+from enose_features import FEATURE_NAMES, cycle_features
+from enose_storage import read_csv
+
+
+def find_csv_files(paths):
+    """Expand files/directories (recursively) into a sorted list of *.csv paths"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found += [os.path.join(root, name) for name in names if name.lower().endswith(".csv")]
+        elif path.lower().endswith(".csv"):
+            found.append(path)
+    return sorted(set(found))
+
+
+def clean_columns(columns):
+    """Drop non-finite rows and repeated timestamps, clip negative readings to 0.
+
+    /api/csv sudah meng-clip nilai negatif di backend, /api/csv/timeseries belum;
+    setelah ini kedua skema konsisten. Return (columns, report).
+    """
+    data = np.vstack([columns[name] for name in CHANNELS])
+    finite = np.isfinite(data).all(axis=0)
+    timestamps = columns["timestamp"]
+    # read_csv sudah mengurutkan waktu -> duplikat selalu bersebelahan, simpan yang pertama
+    unique = np.concatenate([[True], timestamps[1:] != timestamps[:-1]]) if len(timestamps) else finite
+    keep = finite & unique
+    cleaned = {name: values[keep] for name, values in columns.items()}
+    negative = 0
+    for name in CHANNELS:
+        negative += int((cleaned[name] < 0).sum())
+        cleaned[name] = np.maximum(cleaned[name], 0.0)
+    report = {"rows_in": int(len(timestamps)), "rows": int(keep.sum()),
+              "non_finite": int((~finite).sum()), "duplicate_timestamps": int((finite & ~unique).sum()),
+              "negative_clipped": negative}
+    return cleaned, report
+
+
+def process_file(path, min_samples=5, calibration="off"):
+    """Parse -> clean -> calibrate -> segment -> featurize one CSV; runs in a worker process, never raises"""
+    start = time.perf_counter()
+    try:
+        columns, report = clean_columns(read_csv(path))
+        columns, report["calibration"] = calibrate_columns(columns, calibration)
+        cycles, features = cycle_features(columns, min_samples)
+    except Exception as e:
+        return {"file": path, "error": f"{type(e).__name__}: {e}"}
+    timestamps = columns["timestamp"]
+    data = np.vstack([columns[name] for name in CHANNELS])
+    summary = {name: {"mean": float(row.mean()), "std": float(row.std()), "min": float(row.min()),
+                      "max": float(row.max())} if row.size else {} for name, row in zip(CHANNELS, data)}
+    return {
+        "file": path,
+        "label": label_from_filename(path),
+        "clean": report,
+        "duration_s": float(timestamps[-1] - timestamps[0]) / 1000 if len(timestamps) else 0.0,
+        "channels": summary,
+        "cycles": cycles,
+        "features": features,
+        "process_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def run_batch(paths, workers=None, min_samples=5, on_result=None, calibration="off"):
+    """Process `paths` on a process pool; results come back in input order"""
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers == 1:
+        mapped = (process_file(path, min_samples, calibration) for path in paths)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # Chunk besar mengurangi overhead IPC untuk ribuan file kecil
+        chunksize = max(1, len(paths) // (workers * 8))
+        mapped = pool.map(process_file, paths, [min_samples] * len(paths), [calibration] * len(paths),
+                          chunksize=chunksize)
+    try:
+        for result in mapped:
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+def consolidate(results):
+    """Stack per-file cycles into one table; returns (table dict, files list, summary dict)"""
+    ok = [r for r in results if "error" not in r]
+    files = [dict({key: r[key] for key in ("file", "label", "clean", "duration_s", "channels")},
+                  cycles=int(len(r["cycles"]))) for r in ok]
+    counts = [len(r["cycles"]) for r in ok]
+    n_features = len(FEATURE_NAMES)
+    table = {
+        "file_index": np.repeat(np.arange(len(ok)), counts),
+        "label": np.repeat(np.array([r["label"] or "" for r in ok], dtype=str), counts),
+        "cycles": np.concatenate([r["cycles"] for r in ok]) if ok else np.empty(0),
+        "features": (np.concatenate([r["features"] for r in ok]) if ok
+                     else np.empty((0, len(CHANNELS), n_features))),
+    }
+    labels, label_counts = np.unique(table["label"], return_counts=True)
+    summary = {
+        "files": len(results),
+        "failed": [{"file": r["file"], "error": r["error"]} for r in results if "error" in r],
+        "rows": sum(f["clean"]["rows"] for f in files),
+        "rows_dropped": sum(f["clean"]["rows_in"] - f["clean"]["rows"] for f in files),
+        "negative_clipped": sum(f["clean"]["negative_clipped"] for f in files),
+        "cycles": int(sum(counts)),
+        "cycles_per_label": {str(label or "unlabelled"): int(n) for label, n in zip(labels, label_counts)},
+        "calibration": files[0]["clean"]["calibration"]["mode"] if files else "off",
+        "channels": list(CHANNELS),
+        "feature_names": list(FEATURE_NAMES),
+    }
+    return table, files, summary
+
+
+def write_dataset(path, table, files, summary):
+    """.npz (arrays + JSON metadata) or .csv (one row per cycle, channel_feature columns)"""
+    if path.lower().endswith(".csv"):
+        names = [f"{channel}_{feature}" for channel in CHANNELS for feature in FEATURE_NAMES]
+        flat = table["features"].reshape(len(table["features"]), -1)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "label", "state", "level", "t0", "t1", "samples"] + names)
+            for i, cycle in enumerate(table["cycles"]):
+                writer.writerow([files[table["file_index"][i]]["file"], table["label"][i], cycle["state"],
+                                 cycle["level"], cycle["t0"], cycle["t1"], cycle["stop"] - cycle["start"]]
+                                + [f"{value:.6g}" for value in flat[i]])
+    else:
+        np.savez_compressed(path, file_index=table["file_index"], label=table["label"],
+                            cycles=table["cycles"], features=table["features"],
+                            files=np.array(json.dumps(files)), summary=np.array(json.dumps(summary)))
+    summary_path = os.path.splitext(path)[0] + ".summary.json"
+    with open(summary_path, "w") as f:
+        json.dump({"summary": summary, "files": files}, f, indent=1)
+    return summary_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process e-nose CSV exports into one cycle dataset")
+    parser.add_argument("paths", nargs="+", help="CSV files and/or directories (searched recursively)")
+    parser.add_argument("--out", default="enose_dataset.npz", help=".npz or .csv output")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--min-samples", type=int, default=5, help="shortest state/level segment kept")
+    parser.add_argument("--calibrate", choices=CALIBRATION_MODES, default="off",
+                        help="baseline correction from IDLE/PURGE rows before features/summary")
+    args = parser.parse_args(argv)
+
+    paths = find_csv_files(args.paths)
+    if not paths:
+        print("❌ No CSV files found")
+        return 1
+    print(f"📂 {len(paths)} CSV file(s), {args.workers or os.cpu_count()} worker(s)")
+    start = time.perf_counter()
+    done = [0]
+
+    def report(result):
+        done[0] += 1
+        if "error" in result:
+            print(f"❌ {result['file']}: {result['error']}")
+        elif done[0] % 500 == 0:
+            print(f"  {done[0]}/{len(paths)}")
+
+    results = run_batch(paths, args.workers, args.min_samples, on_result=report, calibration=args.calibrate)
+    table, files, summary = consolidate(results)
+    summary_path = write_dataset(args.out, table, files, summary)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {summary['cycles']} cycles from {len(files)} file(s), {summary['rows']} rows "
+          f"({summary['rows_dropped']} dropped, {summary['negative_clipped']} values clipped) "
+          f"in {elapsed:.1f} s ({len(paths) / elapsed:.0f} files/s)")
+    print(f"   per label: {summary['cycles_per_label']}")
+    print(f"💾 {args.out} + {summary_path}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# enose_buffer.py
+# Penyimpanan data plot berbasis NumPy (tanpa ketergantungan Qt)
+import numpy as np
+
+# Urutan channel mengikuti field SensorPacket di backend Rust
+CHANNELS = ("no2", "eth_gm", "voc_gm", "co_gm", "co_m", "eth_m", "voc_m")
+CHANNEL_LABELS = ("NO₂ GM", "Ethanol GM", "VOC GM", "CO GM", "CO MiCS", "Ethanol MiCS", "VOC MiCS")
+
+
+class ChannelRingBuffer:
+    """Preallocated (channels x capacity) ring buffer with zero-copy views for plotting.
+
+    Setiap sampel ditulis dua kali (slot i dan i + capacity), sehingga jendela
+    terbaru selalu berupa slice kontigu dari array yang sama - tidak perlu copy
+    atau np.roll saat di-plot, dan biaya append tidak bergantung pada capacity.
+    """
+
+    def __init__(self, n_channels, capacity, dtype=np.float64):
+        self.n_channels = n_channels
+        self.capacity = int(capacity)
+        self._x = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._data = np.zeros((n_channels, 2 * self.capacity), dtype=dtype)
+        self._head = 0   # slot tulis berikutnya, 0 <= head < capacity
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, x, values):
+        """Append one sample (`values` has one entry per channel)"""
+        h = self._head
+        self._x[h] = self._x[h + self.capacity] = x
+        self._data[:, h] = self._data[:, h + self.capacity] = values
+        self._head = (h + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, x, values):
+        """Append many samples at once: `x` shape (n,), `values` shape (channels, n)"""
+        x = np.asarray(x, dtype=np.float64)
+        values = np.asarray(values)
+        if x.size > self.capacity:
+            x = x[-self.capacity:]
+            values = values[:, -self.capacity:]
+        n = x.size
+        if n == 0:
+            return
+        idx = (self._head + np.arange(n)) % self.capacity
+        self._x[idx] = self._x[idx + self.capacity] = x
+        self._data[:, idx] = values
+        self._data[:, idx + self.capacity] = values
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def view(self):
+        """Return (x, data) views of the stored window, oldest first, without copying"""
+        end = self._head + self.capacity
+        start = end - self._size
+        return self._x[start:end], self._data[:, start:end]
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def resize(self, capacity):
+        """Change capacity, keeping the newest samples that still fit"""
+        x, data = self.view()
+        x, data = x.copy(), data.copy()
+        self.__init__(self.n_channels, capacity, self._data.dtype)
+        self.extend(x, data)
+
+
+def minmax_decimate(x, data, n_buckets):
+    """Peak-preserving min/max decimation of (channels, n) data to ~2 * n_buckets points.
+
+    Setiap bucket menyumbang titik minimum dan maksimumnya (urut waktu), jadi
+    puncak transien tetap terlihat walau jumlah vertex dibatasi sekitar lebar
+    layar. Return (xs, ys), keduanya (channels, m); x bisa berbeda per channel.
+    """
+    n = x.size
+    n_channels = data.shape[0]
+    if n <= 2 * n_buckets:
+        return np.broadcast_to(x, data.shape), data
+
+    size = -(-n // n_buckets)          # ceil(n / n_buckets)
+    n_full = n // size
+    body = n_full * size
+    blocks = data[:, :body].reshape(n_channels, n_full, size)
+    offsets = np.arange(n_full) * size
+    lo = blocks.argmin(axis=2) + offsets
+    hi = blocks.argmax(axis=2) + offsets
+    if body < n:
+        tail = data[:, body:]
+        lo = np.concatenate([lo, tail.argmin(axis=1)[:, None] + body], axis=1)
+        hi = np.concatenate([hi, tail.argmax(axis=1)[:, None] + body], axis=1)
+
+    idx = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=2).reshape(n_channels, -1)
+    return x[idx], np.take_along_axis(data, idx, axis=1)
@@ -0,0 +1,281 @@
+# enose_calibration.py
+# Kalibrasi baseline & kompensasi drift per channel dari fase IDLE/PURGE, cache per device (tanpa Qt)
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+
+CALIBRATION_VERSION = 1
+BASELINE_STATES = (0, 4)    # IDLE, PURGE: sensor di udara bersih
+CALIBRATION_MODES = ("off", "subtract", "ratio")
+RATIO_FLOOR = 0.01          # ppm; channel dengan baseline ~0 memakai subtract, bukan rasio
+AXIS_LABELS = {"off": "Concentration (ppm)", "subtract": "Δ vs baseline (ppm)", "ratio": "Response R/R0"}
+CSV_UNITS = {"subtract": "Δppm", "ratio": "R/R0"}   # pengganti "(ppm)" di header export terkalibrasi
+
+
+def apply_calibration(values, baseline, mode):
+    """Vectorized correction of (channels, n) `values` with a (channels,) or (channels, n) baseline.
+
+    "subtract" -> x - b, "ratio" -> x / b (R/R0). Baseline None atau mode "off"
+    mengembalikan `values` apa adanya; baseline NaN (belum diketahui) tidak mengoreksi.
+    """
+    if mode == "off" or baseline is None:
+        return values
+    values = np.asarray(values, dtype=np.float64)
+    baseline = np.asarray(baseline, dtype=np.float64)
+    if baseline.ndim == 1:
+        baseline = baseline[:, None]
+    known = np.isfinite(baseline)
+    baseline = np.where(known, baseline, 0.0)
+    if mode == "subtract":
+        return np.where(known, values - baseline, values)
+    if mode == "ratio":
+        usable = known & (np.abs(baseline) >= RATIO_FLOOR)
+        return np.where(usable, values / np.where(usable, baseline, 1.0), np.where(known, values - baseline, values))
+    raise ValueError(f"unknown calibration mode {mode!r}")
+
+
+class BaselineEstimator:
+    """Incremental per-channel baseline from the IDLE/PURGE rows of a stream or a recording.
+
+    Tiap segmen baseline (baris state 0/4 berturut-turut) diringkas dengan median
+    `tail` sampel terakhirnya (akhir purge = sensor sudah pulih). Hasilnya masuk
+    `history` (timestamp akhir segmen, baseline); `baseline_at()` menginterpolasi
+    history untuk koreksi drift pada data offline. State kecil dan bisa disimpan
+    (`to_dict`), jadi rekaman panjang cukup diproses dari baris terakhir yang sudah dilihat.
+    """
+
+    def __init__(self, n_channels=len(CHANNELS), tail=50, min_samples=10, max_history=200):
+        self.n_channels = n_channels
+        self.tail = tail
+        self.min_samples = min_samples
+        self.max_history = max_history
+        self.history = []           # [(timestamp, [baseline per channel]), ...]
+        self.rows = 0               # baris yang sudah diproses (untuk resume rekaman)
+        self._segment = np.empty((n_channels, 0))
+        self._segment_len = 0
+        self._segment_end = None
+
+    @property
+    def baseline(self):
+        """Latest baseline (channels,), or None before any IDLE/PURGE data"""
+        if self._segment_len >= self.min_samples:
+            return self._segment_baseline()
+        if self.history:
+            return np.array(self.history[-1][1])
+        return None
+
+    def update(self, timestamps, values, state):
+        """Add a batch (values (channels, n)); returns True when a baseline segment closed"""
+        state = np.asarray(state)
+        n = state.size
+        self.rows += n
+        if n == 0:
+            return False
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps)
+        in_baseline = np.isin(state, BASELINE_STATES)
+        edges = np.flatnonzero(in_baseline[1:] != in_baseline[:-1]) + 1
+        closed = False
+        for start, stop in zip(np.concatenate([[0], edges]), np.concatenate([edges, [n]])):
+            if not in_baseline[start]:
+                closed |= self._close_segment()
+                continue
+            block = values[:, start:stop]
+            # Sentinel -1.0 (field hilang) tidak boleh ikut median
+            block = np.where(np.isfinite(block) & (block != -1.0), block, np.nan)
+            self._segment = np.concatenate([self._segment, block], axis=1)[:, -self.tail:]
+            self._segment_len += int(stop - start)
+            self._segment_end = int(timestamps[stop - 1])
+        return closed
+
+    def _segment_baseline(self):
+        with np.errstate(all="ignore"):
+            return np.nanmedian(self._segment, axis=1) if self._segment.size else None
+
+    def _close_segment(self):
+        if self._segment_len == 0:
+            return False
+        closed = self._segment_len >= self.min_samples
+        if closed:
+            baseline = self._segment_baseline()
+            if self.history:
+                # Channel tanpa sampel valid di segmen ini memakai baseline sebelumnya
+                baseline = np.where(np.isnan(baseline), self.history[-1][1], baseline)
+            self.history.append((self._segment_end, baseline.tolist()))
+            del self.history[:-self.max_history]
+        self._segment = np.empty((self.n_channels, 0))
+        self._segment_len = 0
+        return closed
+
+    def finish(self):
+        """Close a trailing baseline segment (end of a finished recording/file)"""
+        return self._close_segment()
+
+    def baseline_at(self, timestamps):
+        """Per-row baseline (channels, n): linear between segment estimates, held flat at both ends"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        points = list(self.history)
+        if self._segment_len >= self.min_samples:
+            points.append((self._segment_end, self._segment_baseline().tolist()))
+        if not points:
+            return None
+        t = np.array([p[0] for p in points], dtype=np.float64)
+        b = np.array([p[1] for p in points], dtype=np.float64).T
+        return np.vstack([np.interp(timestamps, t, row) for row in b])
+
+    def to_dict(self):
+        return {"tail": self.tail, "min_samples": self.min_samples, "max_history": self.max_history,
+                "rows": self.rows, "history": self.history,
+                "segment": np.where(np.isnan(self._segment), None, self._segment).tolist(),
+                "segment_len": self._segment_len, "segment_end": self._segment_end}
+
+    @classmethod
+    def from_dict(cls, data):
+        segment = np.array(data["segment"], dtype=np.float64)
+        estimator = cls(len(segment) or len(CHANNELS), data["tail"], data["min_samples"], data["max_history"])
+        estimator.rows = data["rows"]
+        estimator.history = [(int(t), list(b)) for t, b in data["history"]]
+        if segment.size:
+            estimator._segment = segment
+        estimator._segment_len = data["segment_len"]
+        estimator._segment_end = data["segment_end"]
+        return estimator
+
+
+class CalibrationCache:
+    """One JSON file per device/recording in `directory`; entries from another version are ignored"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", key)[-60:]
+        digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+        return os.path.join(self.directory, f"{stem}_{digest}.json")
+
+    def load(self, key):
+        """Estimator saved under `key`, or None (missing, unreadable or outdated cache)"""
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+            if entry.get("version") != CALIBRATION_VERSION or entry.get("key") != key:
+                return None
+            return BaselineEstimator.from_dict(entry["estimator"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, key, estimator):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        entry = {"version": CALIBRATION_VERSION, "key": key, "updated": time.time(),
+                 "channels": list(CHANNELS), "estimator": estimator.to_dict()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+def calibrate_recording(reader, cache=None, chunk_rows=65536, **kwargs):
+    """Baseline estimator for a SessionReader, resumed from the cache: only rows not seen yet are read"""
+    key = f"recording:{os.path.abspath(reader.path)}"
+    estimator = cache.load(key) if cache is not None else None
+    if estimator is None or estimator.rows > len(reader):
+        estimator = BaselineEstimator(**kwargs)
+    start = estimator.rows
+    for lo in range(start, len(reader), chunk_rows):
+        hi = min(lo + chunk_rows, len(reader))
+        estimator.update(reader.column("timestamp")[lo:hi], reader.channels(lo, hi), reader.column("state")[lo:hi])
+    if cache is not None and len(reader) > start:
+        cache.save(key, estimator)
+    return estimator
+
+
+def device_key(host, port):
+    """Cache key of a live e-nose backend"""
+    return f"device:{host}:{port}"
+
+
+def replay_baseline(dataset, estimators, start, stop):
+    """(channels, n) per-row baseline for rows [start, stop) of a ReplayDataset.
+
+    `estimators`: reader.path -> BaselineEstimator (calibrate_recording); baris dari
+    rekaman tanpa estimasi (belum selesai dihitung / tanpa fase IDLE/PURGE) = NaN.
+    """
+    baseline = np.full((len(CHANNELS), max(stop - start, 0)), np.nan)
+    for reader, base in zip(dataset.readers, dataset.offsets):
+        lo, hi = max(start - base, 0), min(stop - base, len(reader))
+        estimator = estimators.get(reader.path)
+        if hi <= lo or estimator is None:
+            continue
+        rows = estimator.baseline_at(reader.column("timestamp")[lo:hi])
+        if rows is not None:
+            baseline[:, base + lo - start:base + hi - start] = rows
+    return baseline
+
+
+def calibrate_columns(columns, mode, fallback_samples=50):
+    """Calibrate a whole column dict (one CSV/file); returns (columns, info).
+
+    Baseline dari baris IDLE/PURGE file itu (interpolasi antar segmen -> drift);
+    file tanpa fase tersebut memakai median `fallback_samples` baris pertama.
+    """
+    data = np.vstack([columns[name] for name in CHANNELS]).astype(np.float64)
+    estimator = BaselineEstimator()
+    estimator.update(columns["timestamp"], data, columns["state"])
+    estimator.finish()
+    source = "idle_purge"
+    baseline = estimator.baseline_at(columns["timestamp"])
+    if baseline is None:
+        source = "first_rows"
+        with np.errstate(all="ignore"):
+            baseline = np.nanmedian(data[:, :fallback_samples], axis=1) if data.size else None
+    calibrated = dict(columns)
+    if mode != "off" and baseline is not None:
+        for name, row in zip(CHANNELS, apply_calibration(data, baseline, mode)):
+            calibrated[name] = row
+    return calibrated, {"mode": mode, "source": source, "segments": len(estimator.history)}
+
+
+def calibrate_csv(path, mode, estimator):
+    """Rewrite an /api/csv(/timeseries) export in place with calibrated channels; returns rows changed.
+
+    Baseline per baris dari `estimator` (baseline device live, jadi nilai sama dengan
+    plot); estimator tanpa baseline atau mode "off" membiarkan file apa adanya (0).
+    Tiap header channel diberi satuan (mis. "GMXXX_NO2 (Δppm)") agar file tidak tertukar
+    dengan data mentah; sentinel -1.0 (field hilang), kolom run_count/run_end dan baris
+    yang jumlah kolomnya tidak cocok ditulis ulang apa adanya. Nilai channel yang bukan
+    angka -> ValueError sebelum file disentuh.
+    """
+    if mode == "off" or estimator is None:
+        return 0
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        lines = list(reader)
+    data = [i for i, row in enumerate(lines) if len(row) == len(header)]
+    baseline = estimator.baseline_at([float(lines[i][0]) for i in data]) if data else None
+    if baseline is None:
+        return 0
+    channels = slice(1, 1 + len(CHANNELS))
+    values = np.array([lines[i][channels] for i in data], dtype=np.float64).T
+    calibrated = np.where(values == -1.0, values, apply_calibration(values, baseline, mode))
+    unit = f" ({CSV_UNITS[mode]})"
+    header[channels] = [re.sub(r"\s*\(ppm\)$", "", h) + unit for h in header[channels]]
+    for i, column in zip(data, calibrated.T.tolist()):
+        row = lines[i]
+        lines[i] = [row[0]] + [f"{v:.6g}" for v in column] + row[channels.stop:]
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(lines)
+    os.replace(tmp_path, path)
+    return len(data)
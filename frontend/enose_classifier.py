@@ -0,0 +1,137 @@
+# enose_classifier.py
+# Klasifikasi aroma lokal (tanpa cloud): LDA NumPy di atas fitur per siklus
+import glob
+import os
+import re
+
+import numpy as np
+
+from enose_features import FEATURE_NAMES, cycle_features
+from enose_storage import read_csv
+
+# Fitur yang dipakai model; slope & AUC bergantung durasi siklus jadi tidak dipakai
+MODEL_FEATURES = ("baseline", "peak", "delta", "steady_mean")
+SIZE_TOKENS = ("besar", "kecil")
+COLOR_TOKENS = ("hijau", "merah")
+
+
+def label_from_filename(path):
+    """'cabai besar hijau.csv' / 'cabai_hijau_besar_1.csv' -> 'besar_hijau' (None if unlabelled)"""
+    tokens = set(re.split(r"[^a-z]+", os.path.basename(path).lower()))
+    size = [t for t in SIZE_TOKENS if t in tokens]
+    color = [t for t in COLOR_TOKENS if t in tokens]
+    if len(size) != 1 or len(color) != 1:
+        return None
+    return f"{size[0]}_{color[0]}"
+
+
+def class_display_name(label):
+    """'besar_hijau' -> 'Cabai Besar Hijau'"""
+    return "Cabai " + " ".join(part.capitalize() for part in label.split("_"))
+
+
+def cycle_vectors(features):
+    """(n_cycles, n_channels, n_features) -> (n_cycles, d) model inputs (signed log scale)"""
+    cols = [FEATURE_NAMES.index(name) for name in MODEL_FEATURES]
+    x = np.asarray(features, dtype=np.float64)[:, :, cols].reshape(len(features), -1)
+    return np.sign(x) * np.log1p(np.abs(x))
+
+
+def build_training_set(paths, min_samples=5):
+    """Featurize labelled CSVs; returns (X, y, groups) with one row per cycle"""
+    xs, ys, groups = [], [], []
+    for path in paths:
+        label = label_from_filename(path)
+        if label is None:
+            continue
+        _, features = cycle_features(read_csv(path), min_samples)
+        if len(features) == 0:
+            continue
+        xs.append(cycle_vectors(features))
+        ys += [label] * len(features)
+        groups += [path] * len(features)
+    if not xs:
+        return np.empty((0, 0)), np.array([], dtype=str), np.array([], dtype=str)
+    return np.vstack(xs), np.array(ys), np.array(groups)
+
+
+def default_training_files(data_dir):
+    """Bundled datasets: *.csv next to the app and in 'data ke 2/'"""
+    return sorted(glob.glob(os.path.join(data_dir, "*.csv"))
+                  + glob.glob(os.path.join(data_dir, "data ke 2", "*.csv")))
+
+
+class CycleClassifier:
+    """Shrinkage LDA on standardized cycle vectors; predict_proba via softmax of the scores.
+
+    Dengan puluhan siklus dan d = 28 fitur, kovarians di-shrink ke diagonal
+    agar tetap bisa diinvers. Skoring satu siklus hanya satu perkalian matriks.
+    """
+
+    def __init__(self, shrinkage=0.3):
+        self.shrinkage = shrinkage
+        self.classes = np.array([], dtype=str)
+        self.n_train = 0
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        if len(X) == 0:
+            raise ValueError("no labelled cycles to train on")
+        self.classes, y_idx = np.unique(y, return_inverse=True)
+        self.mean = X.mean(axis=0)
+        self.scale = X.std(axis=0) + 1e-9
+        Z = (X - self.mean) / self.scale
+
+        centroids = np.array([Z[y_idx == k].mean(axis=0) for k in range(len(self.classes))])
+        resid = Z - centroids[y_idx]
+        cov = resid.T @ resid / len(Z)
+        target = np.eye(len(cov)) * np.trace(cov) / len(cov)
+        cov = (1 - self.shrinkage) * cov + self.shrinkage * target
+
+        self.coef = np.linalg.solve(cov, centroids.T)                    # (d, n_classes)
+        priors = np.bincount(y_idx, minlength=len(self.classes)) / len(y_idx)
+        self.intercept = -0.5 * np.einsum("kd,dk->k", centroids, self.coef) + np.log(priors)
+        self.n_train = len(Z)
+        return self
+
+    def decision_function(self, X):
+        Z = (np.atleast_2d(X) - self.mean) / self.scale
+        return Z @ self.coef + self.intercept
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        scores = scores - scores.max(axis=1, keepdims=True)
+        p = np.exp(scores)
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes[self.decision_function(X).argmax(axis=1)]
+
+    def classify_cycle(self, features):
+        """Features of one cycle (n_channels, n_features) -> (label, confidence)"""
+        p = self.predict_proba(cycle_vectors(np.asarray(features)[None]))[0]
+        k = int(p.argmax())
+        return str(self.classes[k]), float(p[k])
+
+
+def leave_one_file_out(X, y, groups, **kwargs):
+    """Accuracy when each file is held out in turn (cycles of one file are not independent)"""
+    correct = 0
+    for group in np.unique(groups):
+        test = groups == group
+        if len(np.unique(y[~test])) < 2:
+            continue
+        model = CycleClassifier(**kwargs).fit(X[~test], y[~test])
+        correct += int((model.predict(X[test]) == y[test]).sum())
+    return correct / max(len(y), 1)
+
+
+def train_default(data_dir):
+    """Train on the bundled datasets; returns (classifier, training info dict)"""
+    files = default_training_files(data_dir)
+    X, y, groups = build_training_set(files)
+    model = CycleClassifier().fit(X, y)
+    info = {"files": len(np.unique(groups)), "cycles": len(y),
+            "lofo_accuracy": leave_one_file_out(X, y, groups)}
+    return model, info
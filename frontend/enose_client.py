@@ -0,0 +1,371 @@
+# enose_client.py
+# Helper akses HTTP ke Rust backend (tanpa ketergantungan Qt)
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from enose_wire import WIRE_CONTENT_TYPE, decode_columns
+
+# `requests` (~100 ms import) baru diimpor saat request pertama, bukan saat startup GUI
+
+
+class BackendError(Exception):
+    """Non-200 reply from the Rust backend"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"HTTP {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class DownloadCancelled(Exception):
+    """Streaming download stopped by the user"""
+
+
+# ==================== POOLED HTTP CLIENT ====================
+class HttpClient:
+    """Shared keep-alive HTTP client: one Session with a bounded connection pool per host"""
+
+    def __init__(self, pool_size=4, retries=2, backoff=0.2, timeout=5):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.adapter = None
+        self._session = None
+        self._lock = threading.Lock()
+        self._requests = 0
+
+    @property
+    def session(self):
+        """requests.Session, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        # Retry hanya untuk GET (idempotent); POST ke Edge Impulse tidak diulang otomatis
+        retry = Retry(total=self.retries, connect=self.retries, read=self.retries, backoff_factor=self.backoff,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}),
+                      raise_on_status=False)
+        self.adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.pool_size,
+                                   pool_block=True, max_retries=retry)
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        return session
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self._requests += 1
+        return self.session.request(method, url, **kwargs)
+
+    def stats(self):
+        """Requests sent plus TCP/TLS connections opened vs reused across all host pools"""
+        if self.adapter is None:
+            return {"requests": self._requests, "connections_opened": 0, "connections_reused": 0}
+        pools = self.adapter.poolmanager.pools
+        host_pools = [pool for pool in map(pools.get, pools.keys()) if pool is not None]
+        opened = sum(pool.num_connections for pool in host_pools)
+        attempts = sum(pool.num_requests for pool in host_pools)
+        return {
+            "requests": self._requests,
+            "connections_opened": opened,
+            "connections_reused": max(attempts - opened, 0),
+        }
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class PacketCursor:
+    """Incremental cursor for /api/data (last timestamp + packets already seen at it)"""
+
+    def __init__(self):
+        self.timestamp = None
+        self.count_at_timestamp = 0
+
+    def reset(self):
+        self.timestamp = None
+        self.count_at_timestamp = 0
+
+    def params(self):
+        """Query params for the next /api/data request"""
+        # `since` inklusif (>=): paket dengan milidetik yang sama tidak boleh hilang
+        if self.timestamp is None:
+            return {}
+        return {"since": self.timestamp}
+
+    def advance(self, packets):
+        """Return packets not seen yet and move the cursor past them.
+
+        Backend lama mengabaikan ?since= dan mengirim seluruh buffer, jadi
+        penyaringan selalu dilakukan di sisi klien. Poll pertama hanya
+        mengambil paket terbaru (monitoring dimulai dari "sekarang").
+        """
+        if not packets:
+            return []
+
+        if self.timestamp is None:
+            # Semua paket lain dengan timestamp yang sama dianggap sudah terlihat
+            self.timestamp = int(packets[-1].get('timestamp', 0))
+            self.count_at_timestamp = sum(
+                1 for p in packets if int(p.get('timestamp', 0)) == self.timestamp) - 1
+            new_packets = packets[-1:]
+        else:
+            new_packets = []
+            skip = self.count_at_timestamp
+            for packet in packets:
+                ts = int(packet.get('timestamp', 0))
+                if ts < self.timestamp:
+                    continue
+                if ts == self.timestamp and skip > 0:
+                    skip -= 1
+                    continue
+                new_packets.append(packet)
+
+        if new_packets:
+            last_ts = int(new_packets[-1].get('timestamp', 0))
+            same_ts = sum(1 for p in new_packets if int(p.get('timestamp', 0)) == last_ts)
+            if last_ts == self.timestamp:
+                self.count_at_timestamp += same_ts
+            else:
+                self.timestamp = last_ts
+                self.count_at_timestamp = same_ts
+
+        return new_packets
+
+    def advance_columns(self, columns):
+        """Same as advance() for a decoded column dict (sorted by time); returns the new rows"""
+        ts = columns["timestamp"]
+        if ts.size == 0:
+            return columns
+        if self.timestamp is None:
+            keep = np.zeros(ts.size, dtype=bool)
+            keep[-1] = True
+            self.timestamp = int(ts[-1])
+            self.count_at_timestamp = int((ts == self.timestamp).sum()) - 1
+        else:
+            keep = ts > self.timestamp
+            same = np.flatnonzero(ts == self.timestamp)
+            keep[same[self.count_at_timestamp:]] = True
+
+        new_ts = ts[keep]
+        if new_ts.size:
+            last_ts = int(new_ts[-1])
+            same_ts = int((new_ts == last_ts).sum())
+            if last_ts == self.timestamp:
+                self.count_at_timestamp += same_ts
+            else:
+                self.timestamp = last_ts
+                self.count_at_timestamp = same_ts
+        if keep.all():
+            return columns
+        return {name: values[keep] for name, values in columns.items()}
+
+
+# ==================== BLOCKING CALLS (dijalankan di worker thread) ====================
+def _get_json(client, url, params=None, metrics=None, name="http"):
+    # Waktu HTTP (sampai body diterima) dan decode JSON dicatat terpisah jika `metrics` diberikan
+    start = time.perf_counter()
+    response = client.get(url, params=params)
+    if response.status_code != 200:
+        raise BackendError(response.status_code, response.text)
+    received = time.perf_counter()
+    data = response.json()
+    if metrics is not None:
+        metrics.observe(f"{name}.http_ms", (received - start) * 1000)
+        metrics.observe(f"{name}.json_decode_ms", (time.perf_counter() - received) * 1000)
+        metrics.incr(f"{name}.bytes", len(response.content))
+    return data
+
+
+def fetch_status(client, base_url, metrics=None):
+    """GET /api/status and return the decoded JSON"""
+    return _get_json(client, f"{base_url}/api/status", metrics=metrics, name="status")
+
+
+def fetch_packets(client, base_url, params=None, metrics=None, binary=False):
+    """GET /api/data (optionally with ?since=).
+
+    Return list of packet dict (JSON), atau dict kolom NumPy jika `binary` dan
+    backend mendukung format kolom (backend lama mengabaikan Accept -> JSON).
+    """
+    url = f"{base_url}/api/data"
+    if not binary:
+        return _get_json(client, url, params, metrics=metrics, name="data")
+    start = time.perf_counter()
+    response = client.get(url, params=params,
+                          headers={"Accept": f"{WIRE_CONTENT_TYPE}, application/json;q=0.5"})
+    if response.status_code != 200:
+        raise BackendError(response.status_code, response.text)
+    received = time.perf_counter()
+    if response.headers.get("Content-Type", "").startswith(WIRE_CONTENT_TYPE):
+        data, decode_name = decode_columns(response.content), "data.binary_decode_ms"
+    else:
+        data, decode_name = response.json(), "data.json_decode_ms"
+    if metrics is not None:
+        metrics.observe("data.http_ms", (received - start) * 1000)
+        metrics.observe(decode_name, (time.perf_counter() - received) * 1000)
+        metrics.incr("data.bytes", len(response.content))
+    return data
+
+
+def poll_backend(client, base_url, params=None, metrics=None, binary=False):
+    """One monitoring poll: new packets (list or column dict, see fetch_packets) plus the current status"""
+    start = time.perf_counter()
+    packets = fetch_packets(client, base_url, params, metrics, binary)
+    status = fetch_status(client, base_url, metrics)
+    if metrics is not None:
+        metrics.observe("poll.rtt_ms", (time.perf_counter() - start) * 1000)
+    return packets, status
+
+
+def download_csv(client, url, filename, progress=None, cancel=None,
+                 chunk_size=64 * 1024, timeout=(5, 30)):
+    """Stream a CSV export to disk chunk by chunk, then rename it into place.
+
+    Timeout read berlaku per chunk, bukan untuk seluruh download. `progress(done, total)`
+    dipanggil tiap chunk (total None jika server tidak mengirim Content-Length);
+    `cancel` adalah threading.Event - jika di-set, file sementara dihapus.
+    """
+    with client.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise BackendError(response.status_code, response.text)
+        total = int(response.headers.get('Content-Length', 0)) or None
+
+        tmp_path = f"{filename}.part"
+        done = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if cancel is not None and cancel.is_set():
+                        raise DownloadCancelled(url)
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress is not None:
+                        progress(done, total)
+            os.replace(tmp_path, filename)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):   # open() sendiri bisa gagal
+                os.remove(tmp_path)
+            raise
+    return filename
+
+
+# ==================== PUSH STREAM (NDJSON) ====================
+class StreamUnsupported(Exception):
+    """Backend has no /api/stream endpoint (older build) - use polling instead"""
+
+
+class PacketStream:
+    """Long-lived NDJSON connection to /api/stream, read on its own thread.
+
+    Setiap baris = satu SensorPacket (baris kosong = heartbeat). Saat koneksi
+    putus, stream reconnect dengan backoff dan melanjutkan dari cursor lewat
+    ?since=, duplikat dibuang oleh PacketCursor. Callback dipanggil dari thread
+    stream: `on_packets(list)` untuk paket baru, `on_state(state, detail)` dengan
+    state "connecting", "connected", "reconnecting", "unsupported" atau "stopped".
+    """
+
+    def __init__(self, base_url, cursor, on_packets, on_state=None,
+                 connect_timeout=3, read_timeout=15, max_backoff=10.0):
+        self.url = f"{base_url}/api/stream"
+        self.cursor = cursor
+        self.on_packets = on_packets
+        self.on_state = on_state or (lambda state, detail=None: None)
+        self.timeout = (connect_timeout, read_timeout)   # read > heartbeat backend (5 detik)
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self._session = None     # dibuat di thread stream
+        self._response = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="enose-stream", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Signal the stream thread and wait up to `timeout` s (0 = don't wait; it closes its own session)"""
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            response.close()   # membangunkan read yang sedang blocking
+        if timeout:
+            self._thread.join(timeout)
+
+    def _run(self):
+        import requests
+
+        self._session = requests.Session()
+        try:
+            self._reconnect_loop()
+        finally:
+            self._session.close()
+
+    def _reconnect_loop(self):
+        backoff = 0.5
+        self.on_state("connecting", None)
+        while not self._stop.is_set():
+            try:
+                self._read_stream()
+                backoff = 0.5       # putus setelah tersambung: reconnect cepat
+                detail = "stream closed by backend"
+            except StreamUnsupported:
+                self.on_state("unsupported", None)
+                return
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                detail = str(e)
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self.on_state("reconnecting", detail)
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+        self.on_state("stopped", None)
+
+    def _read_stream(self):
+        with self._session.get(self.url, params=self.cursor.params(), stream=True,
+                               timeout=self.timeout) as response:
+            if response.status_code == 404:
+                raise StreamUnsupported(self.url)
+            if response.status_code != 200:
+                raise BackendError(response.status_code, response.text)
+            self._response = response
+            self.on_state("connected", None)
+            try:
+                pending = b""
+                # chunk_size=None: setiap chunk HTTP diteruskan begitu tiba
+                for chunk in response.iter_content(chunk_size=None):
+                    if self._stop.is_set():
+                        return
+                    lines = (pending + chunk).split(b"\n")
+                    pending = lines.pop()
+                    packets = [json.loads(line) for line in lines if line.strip()]
+                    if packets:
+                        new_packets = self.cursor.advance(packets)
+                        if new_packets:
+                            self.on_packets(new_packets)
+            finally:
+                self._response = None
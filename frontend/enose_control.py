@@ -0,0 +1,309 @@
+# enose_control.py
+# Kanal kontrol Arduino: satu koneksi TCP persisten, antrian command, ack & RTT (tanpa Qt)
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+ACK_PREFIXES = ("OK", "ACK")
+ERROR_PREFIXES = ("ERR", "ERROR", "NAK")
+
+
+class CommandRejected(Exception):
+    """Arduino answered a command with ERR/NAK"""
+
+
+class ArduinoChannel:
+    """Long-lived, non-blocking line-protocol connection to the Arduino.
+
+    Satu thread I/O memegang socket (selectors): setelah start() koneksi
+    dijaga tetap terbuka (TCP keepalive, reconnect dengan backoff),
+    kirim command dari antrian tanpa menunggu ack sebelumnya (pipelined),
+    lalu mencocokkan balasan "OK ..."/"ACK ..."/"ERR ..." ke command yang
+    namanya disebut di balasan, atau ke command tertua yang masih menunggu.
+    Firmware yang tidak pernah membalas tetap didukung: setelah `ack_timeout`
+    command dianggap terkirim dengan status "unacked".
+
+    `send()` mengembalikan concurrent.futures.Future berisi dict
+    {command, status ("acked"/"unacked"), reply, rtt_ms}.
+    """
+
+    def __init__(self, host, port, ack_timeout=2.0, queue_timeout=30.0, connect_timeout=3.0,
+                 max_backoff=30.0, on_state=None, on_line=None):
+        self.host = host
+        self.port = int(port)
+        self.ack_timeout = ack_timeout
+        self.queue_timeout = queue_timeout
+        self.connect_timeout = connect_timeout
+        self.max_backoff = max_backoff
+        self.on_state = on_state or (lambda state, detail=None: None)
+        self.on_line = on_line or (lambda line: None)
+
+        self.state = "idle"
+        self.sent = 0
+        self.acked = 0
+        self.unacked = 0
+        self.failed = 0
+        self.reconnects = 0
+        self._rtts = deque(maxlen=200)
+
+        self._lock = threading.Lock()
+        self._outbox = deque()       # (command, future, enqueued)
+        self._pending = deque()      # (command, future, sent_at) menunggu ack
+        self._sock = None
+        self._connecting_since = None
+        self._write_buf = b""
+        self._read_buf = b""
+        self._backoff = 0.0         # reconnect pertama langsung, lalu 0.5 s, 1 s, ...
+        self._next_connect = 0.0
+        self._stop = threading.Event()
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        self._thread = None
+
+    # ---------- API (thread mana pun) ----------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="arduino-channel", daemon=True)
+            self._thread.start()
+        return self
+
+    def send(self, command):
+        """Queue a command; returns a Future resolved on ack, ack timeout or failure"""
+        future = Future()
+        with self._lock:
+            self._outbox.append((command.strip(), future, time.monotonic()))
+        self.start()
+        self._wake()
+        return future
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._fail_all(ConnectionError("control channel closed"))
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def stats(self):
+        with self._lock:
+            rtts = np.array(self._rtts) if self._rtts else None
+            return {
+                "state": self.state,
+                "sent": self.sent,
+                "acked": self.acked,
+                "unacked": self.unacked,
+                "failed": self.failed,
+                "reconnects": self.reconnects,
+                "queued": len(self._outbox),
+                "in_flight": len(self._pending),
+                "rtt_p50_ms": float(np.percentile(rtts, 50)) if rtts is not None else None,
+                "rtt_p99_ms": float(np.percentile(rtts, 99)) if rtts is not None else None,
+            }
+
+    # ---------- thread I/O ----------
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _set_state(self, state, detail=None):
+        if state != self.state:
+            self.state = state
+            self.on_state(state, detail)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self._sock is None and now >= self._next_connect:
+                self._connect()
+            self._expire(now)
+            self._flush_outbox()
+
+            for key, events in self._selector.select(timeout=self._select_timeout()):
+                if key.data == "wake":
+                    try:
+                        self._wake_r.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                if self._connecting_since is not None and events & selectors.EVENT_WRITE:
+                    self._finish_connect()
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._read()
+                if self._sock is not None and events & selectors.EVENT_WRITE:
+                    self._write()
+        self._close(None)
+        self._set_state("closed")
+
+    def _select_timeout(self):
+        deadlines = [1.0]
+        if self._pending:
+            deadlines.append(self._pending[0][2] + self.ack_timeout - time.monotonic())
+        if self._sock is None:
+            deadlines.append(self._next_connect - time.monotonic())
+        if self._connecting_since is not None:
+            deadlines.append(self._connecting_since + self.connect_timeout - time.monotonic())
+        return max(min(deadlines), 0.005)
+
+    def _connect(self):
+        self._set_state("connecting")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Deteksi link mati dalam ~25 detik, bukan default OS (2 jam); tidak semua OS punya opsi ini
+        for option, value in (("TCP_KEEPIDLE", 10), ("TCP_KEEPINTVL", 5), ("TCP_KEEPCNT", 3)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            sock.connect_ex((self.host, self.port))
+        except OSError as e:
+            sock.close()
+            self._schedule_reconnect(e)
+            return
+        self._sock = sock
+        self._connecting_since = time.monotonic()
+        self._selector.register(sock, selectors.EVENT_WRITE, "sock")
+
+    def _finish_connect(self):
+        error = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            self._close(OSError(error, f"connect to {self.host}:{self.port} failed"))
+            return
+        self._connecting_since = None
+        self._backoff = 0.0
+        self._selector.modify(self._sock, selectors.EVENT_READ, "sock")
+        self._set_state("connected")
+
+    def _schedule_reconnect(self, error):
+        self._next_connect = time.monotonic() + self._backoff
+        self._backoff = min(max(self._backoff * 2, 0.5), self.max_backoff)
+        self._set_state("disconnected", str(error))
+
+    def _close(self, error):
+        if self._sock is not None:
+            try:
+                self._selector.unregister(self._sock)
+            except (KeyError, ValueError):
+                pass
+            self._sock.close()
+            self._sock = None
+            self._connecting_since = None
+            self._write_buf = self._read_buf = b""
+            if error is not None:
+                self.reconnects += 1
+        # Command yang sudah ditulis tapi belum di-ack: status tidak pasti -> gagal
+        while self._pending:
+            command, future, _ = self._pending.popleft()
+            self._resolve_error(future, ConnectionError(f"connection lost before ack: {command}"))
+        if error is not None:
+            self._schedule_reconnect(error)
+
+    def _flush_outbox(self):
+        if self._sock is None or self._connecting_since is not None:
+            return
+        with self._lock:
+            batch = list(self._outbox)
+            self._outbox.clear()
+        if not batch:
+            return
+        now = time.monotonic()
+        for command, future, _ in batch:
+            self._write_buf += f"{command}\n".encode()
+            self._pending.append((command, future, now))
+        with self._lock:
+            self.sent += len(batch)
+        self._write()
+
+    def _write(self):
+        try:
+            n = self._sock.send(self._write_buf)
+            self._write_buf = self._write_buf[n:]
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            self._close(e)
+            return
+        mask = selectors.EVENT_READ | (selectors.EVENT_WRITE if self._write_buf else 0)
+        self._selector.modify(self._sock, mask, "sock")
+
+    def _read(self):
+        try:
+            data = self._sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._close(e)
+            return
+        if not data:
+            self._close(ConnectionError("Arduino closed the connection"))
+            return
+        self._read_buf += data
+        *lines, self._read_buf = self._read_buf.split(b"\n")
+        for raw in lines:
+            line = raw.decode(errors="replace").strip()
+            if line:
+                self._handle_line(line)
+
+    def _handle_line(self, line):
+        upper = line.upper()
+        is_ack = upper.startswith(ACK_PREFIXES)
+        is_error = upper.startswith(ERROR_PREFIXES)
+        if not (is_ack or is_error) or not self._pending:
+            self.on_line(line)
+            return
+        # Balasan yang menyebut nama command dicocokkan ke command itu, selain itu FIFO
+        index = next((i for i, (command, _, _) in enumerate(self._pending) if command.upper() in upper), 0)
+        command, future, sent_at = self._pending[index]
+        del self._pending[index]
+        rtt_ms = (time.monotonic() - sent_at) * 1000
+        if is_error:
+            self._resolve_error(future, CommandRejected(f"{command}: {line}"))
+            return
+        with self._lock:
+            self.acked += 1
+            self._rtts.append(rtt_ms)
+        if not future.done():
+            future.set_result({"command": command, "status": "acked", "reply": line, "rtt_ms": rtt_ms})
+
+    def _expire(self, now):
+        while self._pending and now - self._pending[0][2] >= self.ack_timeout:
+            command, future, _ = self._pending.popleft()
+            with self._lock:
+                self.unacked += 1
+            if not future.done():
+                future.set_result({"command": command, "status": "unacked", "reply": None, "rtt_ms": None})
+        if self._connecting_since is not None and now - self._connecting_since >= self.connect_timeout:
+            self._close(TimeoutError(f"connect to {self.host}:{self.port} timed out"))
+        with self._lock:
+            stale = [item for item in self._outbox if now - item[2] >= self.queue_timeout]
+            for item in stale:
+                self._outbox.remove(item)
+        for command, future, _ in stale:
+            self._resolve_error(future, TimeoutError(f"Arduino unreachable, dropped: {command}"))
+
+    def _resolve_error(self, future, error):
+        with self._lock:
+            self.failed += 1
+        if not future.done():
+            future.set_exception(error)
+
+    def _fail_all(self, error):
+        with self._lock:
+            queued = list(self._outbox)
+            self._outbox.clear()
+        for _, future, _ in queued + list(self._pending):
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
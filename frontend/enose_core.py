@@ -0,0 +1,158 @@
+# enose_core.py
+# Inti ingest tanpa Qt: recorder, siklus + klasifikasi, statistik/alarm, kalibrasi, upload EI, protokol (GUI & daemon)
+import time
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+from enose_calibration import BaselineEstimator, apply_calibration
+from enose_client import PacketCursor
+from enose_dedup import RunLengthCompactor
+from enose_features import CycleTracker
+from enose_metrics import Metrics
+from enose_stats import OnlineStats
+from enose_wire import column_packet
+
+STATE_NAMES = ("IDLE", "PRE_COND", "RAMP_UP", "HOLD", "PURGE", "RECOVERY", "DONE")
+
+
+def describe_status(data):
+    """/api/status dict -> fields shown by the GUI labels and logged by the daemon"""
+    state = data.get("current_state", 0)
+    level = data.get("current_level", 0)
+    # Arduino kirim samplingActive di current_level, fase aktuator di current_state
+    sampling_active = level == 1
+    return {"state": state, "state_name": STATE_NAMES[state] if 0 <= state < len(STATE_NAMES) else "UNKNOWN",
+            "level": level, "data_points": data.get("data_points", 0), "sampling_active": sampling_active,
+            "actuator": {1: "fan", 2: "pump"}.get(state) if sampling_active else None,
+            "arduino_connected": bool(data.get("arduino_connected", False))}
+
+
+class AcquisitionCore:
+    """Everything the ingest path does apart from drawing, shared by MainWindow and the headless daemon.
+
+    `ingest_packets()` / `ingest_columns()` menjalankan recorder, cycle tracker +
+    classifier, statistik online, estimasi baseline, uploader EI dan protocol runner,
+    lalu mengembalikan dict hasil (nilai, event alarm, siklus yang selesai) yang
+    dipakai GUI untuk label/plot dan daemon untuk log. Recorder, uploader dan runner
+    dipasang/dilepas pemiliknya (atribut bisa None).
+    """
+
+    def __init__(self, metrics=None, stats_options=None, calibration_cache=None, calibration_mode="off",
+                 dedup_options=None):
+        self.metrics = metrics or Metrics()
+        self.cursor = PacketCursor()
+        self.stats = OnlineStats(**(stats_options or {}))
+        # Pembacaan berulang -> run (plot & upload EI); recorder, statistik & siklus tetap resolusi penuh
+        self.dedup = RunLengthCompactor(**(dedup_options or {}))
+        self.cycle_tracker = CycleTracker()
+        self.classifier = None
+        self.recorder = None
+        self.ei_uploader = None
+        self.protocol_runner = None
+        self.calibration_cache = calibration_cache
+        self.calibration_mode = calibration_mode
+        self.calibration = None         # BaselineEstimator backend aktif (set_device)
+        self.device = None
+
+    def set_device(self, key):
+        """Select the backend being ingested; its baseline is loaded from the calibration cache"""
+        if key == self.device:
+            return False
+        self.device = key
+        cached = self.calibration_cache.load(key) if self.calibration_cache is not None else None
+        self.calibration = cached or BaselineEstimator()
+        return True
+
+    # ---------- ingest ----------
+    def ingest_packets(self, packets):
+        """JSON packets (already past the cursor) -> result dict, or None for an empty batch"""
+        if not packets:
+            return None
+        cycles = []
+        for packet in packets:
+            if self.recorder is not None:
+                self.recorder.append(packet)
+            closed = self.cycle_tracker.add(packet)
+            if closed is not None:
+                cycles.append(self._cycle_result(*closed))
+        timestamps = [p.get("timestamp", 0) for p in packets]
+        values = np.array([[float(p.get(key, 0)) for p in packets] for key in CHANNELS])
+        state = [int(p.get("current_state", 0)) for p in packets]
+        level = [int(p.get("current_level", 0)) for p in packets]
+        return self._ingest_rows(packets, timestamps, values, state, level, packets[-1], cycles)
+
+    def ingest_columns(self, columns):
+        """Column dict (binary /api/data, past the cursor) -> result dict, or None for an empty batch"""
+        if len(columns["timestamp"]) == 0:
+            return None
+        if self.recorder is not None:
+            self.recorder.extend(columns)
+        cycles = [self._cycle_result(*closed) for closed in self.cycle_tracker.extend(columns)]
+        values = np.vstack([columns[key] for key in CHANNELS]).astype(np.float64)
+        return self._ingest_rows(columns, columns["timestamp"], values, columns["state"], columns["level"],
+                                 column_packet(columns), cycles)
+
+    def _ingest_rows(self, batch, timestamps, values, state, level, latest, cycles):
+        runs = self.dedup.compact(timestamps, values, state, level)
+        self.metrics.incr("dedup.suppressed", values.shape[1] - runs["index"].size)
+        self.metrics.gauge("dedup.ratio", self.dedup.ratio)
+        self._upload(runs["timestamp"], runs["values"])
+        if self.protocol_runner is not None:
+            self.protocol_runner.feed(batch)
+        start = time.perf_counter()
+        events = self.stats.update(timestamps, values)
+        if events:
+            self.metrics.incr("alarms.raised", len(events))
+        self.metrics.observe("stats.update_ms", (time.perf_counter() - start) * 1000)
+        baseline_updated = self._update_calibration(timestamps, values, state)
+        self.metrics.incr("ingest.packets", values.shape[1])
+        return {"n": values.shape[1], "timestamps": timestamps, "values": values, "runs": runs, "latest": latest,
+                "cycles": cycles, "events": events, "baseline_updated": baseline_updated}
+
+    def _cycle_result(self, info, features):
+        self.metrics.incr("cycles.closed")
+        prediction = None
+        if self.classifier is not None:
+            start = time.perf_counter()
+            label, confidence = self.classifier.classify_cycle(features)
+            prediction = {"label": label, "confidence": confidence, "ms": (time.perf_counter() - start) * 1000}
+        return {"info": info, "features": features, "prediction": prediction}
+
+    def _upload(self, timestamps, values):
+        """Queue the runs for Edge Impulse (baseline-corrected; the uploader resamples them to its fixed interval)"""
+        if self.ei_uploader is None:
+            return
+        start = time.perf_counter()
+        try:
+            if self.calibration is not None:
+                values = apply_calibration(values, self.calibration.baseline, self.calibration_mode)
+            for timestamp, row in zip(np.asarray(timestamps).tolist(), np.asarray(values).T.tolist()):
+                self.ei_uploader.add_sample(timestamp or int(time.time() * 1000), row)
+        except Exception as e:
+            self.metrics.incr("ei.add_failures")
+            print(f"❌ Edge Impulse send failed: {e}")
+        self.metrics.observe("ei.add_sample_ms", (time.perf_counter() - start) * 1000)
+
+    def _update_calibration(self, timestamps, values, state):
+        """Feed the baseline estimator; the cache is written each time a baseline segment closes"""
+        if self.calibration is None or not self.calibration.update(timestamps, values, state):
+            return False
+        self.metrics.incr("calibration.segments")
+        if self.calibration_cache is not None:
+            try:
+                self.calibration_cache.save(self.device, self.calibration)
+            except OSError as e:
+                print(f"❌ Calibration cache save failed: {e}")
+        return True
+
+    def close(self):
+        """Flush/stop everything attached (recorder, uploader, protocol runner)"""
+        if self.protocol_runner is not None:
+            self.protocol_runner.stop(timeout=5)
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.ei_uploader is not None:
+            self.ei_uploader.stop()
+            self.ei_uploader = None
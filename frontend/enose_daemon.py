@@ -0,0 +1,320 @@
+# enose_daemon.py
+# Mode headless (python frontend.py --headless): poller + recorder + uploader EI sebagai proses panjang tanpa Qt
+#
+#   python frontend.py --headless --backend 192.168.100.161:8080 --record --metrics-port 9108
+#   python frontend.py --headless --backend 10.0.0.7:8080 --name nose-7 --log-file nose-7.log --edge-impulse
+#
+# Log: satu objek JSON per baris (stdout atau file rotasi). Metrics: GET /metrics dan /health (JSON, localhost).
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from enose_calibration import CALIBRATION_MODES, CalibrationCache, device_key
+from enose_client import HttpClient, poll_backend
+from enose_core import STATE_NAMES, AcquisitionCore, describe_status
+from enose_metrics import Metrics, rss_bytes
+from enose_storage import SessionRecorder
+from enose_upload import EdgeImpulseIntegration, EdgeImpulseUploader
+
+LOG_MAX_BYTES = 10 * 1024 * 1024   # per file log; LOG_BACKUPS file lama disimpan
+LOG_BACKUPS = 3
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line: ts, lvl, instance, event plus the record's `fields`.
+
+    Level log memakai kunci "lvl" karena "level" sudah dipakai data (level sampling).
+    """
+
+    def __init__(self, instance):
+        super().__init__()
+        self.instance = instance
+
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                 "lvl": record.levelname.lower(), "instance": self.instance, "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def make_logger(instance, log_file=None):
+    logger = logging.getLogger(f"enose.daemon.{instance}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if log_file:
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonLogFormatter(instance))
+    logger.handlers[:] = [handler]
+    return logger
+
+
+class MetricsServer:
+    """GET /metrics (daemon snapshot incl. Metrics histograms/counters) and /health, as JSON"""
+
+    def __init__(self, snapshot, host="127.0.0.1", port=0):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics":
+                    data = snapshot()
+                elif self.path.split("?")[0] == "/health":
+                    data = {"ok": True, "connected": snapshot()["connected"]}
+                else:
+                    self.send_error(404)
+                    return
+                body = json.dumps(data, default=str).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AcquisitionDaemon:
+    """Poll loop around an AcquisitionCore for one backend; logs cycles, alarms, status changes.
+
+    Memori tetap: tidak ada buffer plot, histogram Metrics berukuran tetap, recorder
+    menulis ke disk per batch dan window EI yang gagal di-spool ke disk. Backend
+    yang mati di-poll ulang dengan backoff eksponensial sampai `max_backoff_s`.
+    """
+
+    def __init__(self, backend_url, core, client, log, poll_interval=1.0, binary=True,
+                 heartbeat_s=60.0, max_backoff_s=30.0):
+        self.backend_url = backend_url
+        self.core = core
+        self.metrics = core.metrics
+        self.client = client
+        self.log = log
+        self.poll_interval = poll_interval
+        self.binary = binary
+        self.heartbeat_s = heartbeat_s
+        self.max_backoff_s = max_backoff_s
+
+        self.connected = False
+        self.failures = 0
+        self.last_error = None
+        self.status = {}
+        self._status_key = None
+        self._started = time.monotonic()
+        self._heartbeat = (time.monotonic(), 0)   # (waktu, total paket) heartbeat terakhir
+
+    def _event(self, event, log_level=logging.INFO, /, **fields):
+        # Positional-only: field data boleh bernama "level" (level sampling)
+        self.log.log(log_level, event, extra={"fields": fields})
+
+    def run(self, stop, duration=None):
+        """Poll until `stop` is set (or `duration` seconds passed)"""
+        end = self._started + duration if duration else None
+        while not stop.is_set() and (end is None or time.monotonic() < end):
+            tick = time.monotonic()
+            if self.poll_once():
+                delay = self.poll_interval
+            else:
+                delay = min(self.poll_interval * 2 ** min(self.failures, 10), self.max_backoff_s)
+            if tick - self._heartbeat[0] >= self.heartbeat_s:
+                self._log_heartbeat()
+            stop.wait(max(tick + delay - time.monotonic(), 0))
+
+    def poll_once(self):
+        """One poll + ingest; returns False if the backend could not be reached"""
+        try:
+            payload, status = poll_backend(self.client, self.backend_url, self.core.cursor.params(),
+                                           metrics=self.metrics, binary=self.binary)
+        except Exception as e:
+            self.metrics.incr("poll.failures")
+            self.failures += 1
+            self.last_error = str(e)
+            if self.connected or self.failures == 1:
+                self._event("backend_unreachable", logging.WARNING, backend=self.backend_url, error=str(e))
+            self.connected = False
+            return False
+        if not self.connected:
+            self._event("backend_connected", backend=self.backend_url, after_failures=self.failures)
+        self.connected = True
+        self.failures = 0
+        self.last_error = None
+
+        start = time.perf_counter()
+        if isinstance(payload, dict):
+            columns = self.core.cursor.advance_columns(payload)
+            self.metrics.incr("ingest.already_seen", len(payload["timestamp"]) - len(columns["timestamp"]))
+            result = self.core.ingest_columns(columns)
+        else:
+            packets = self.core.cursor.advance(payload)
+            self.metrics.incr("ingest.already_seen", len(payload) - len(packets))
+            result = self.core.ingest_packets(packets)
+        self.metrics.observe("ingest.batch_ms", (time.perf_counter() - start) * 1000)
+        if result is not None:
+            self._log_result(result)
+        self._log_status(status)
+        return True
+
+    def _log_result(self, result):
+        for cycle in result["cycles"]:
+            info, prediction = cycle["info"], cycle["prediction"]
+            fields = {"state": STATE_NAMES[info["state"]] if 0 <= info["state"] < len(STATE_NAMES) else "UNKNOWN",
+                      "level": info["level"], "samples": info["samples"], "t0": info["t0"], "t1": info["t1"]}
+            if prediction is not None:
+                fields.update(odor=prediction["label"], confidence=round(prediction["confidence"], 3))
+            self._event("cycle_closed", **fields)
+        for event in result["events"]:
+            level = logging.WARNING if event["severity"] == "warn" else logging.ERROR   # fault/alarm
+            self._event("alarm", level, **event)
+        if result["baseline_updated"]:
+            baseline = self.core.calibration.baseline
+            self._event("baseline_updated", segments=len(self.core.calibration.history),
+                        baseline=[round(float(v), 4) for v in baseline])
+
+    def _log_status(self, status):
+        self.status = status
+        info = describe_status(status)
+        key = (info["state"], info["level"], info["arduino_connected"])
+        if key != self._status_key:
+            self._status_key = key
+            self._event("status", **info)
+
+    def _log_heartbeat(self):
+        now = time.monotonic()
+        packets = self.metrics.snapshot()["counters"].get("ingest.packets", 0)
+        last_time, last_packets = self._heartbeat
+        self._heartbeat = (now, packets)
+        self._event("heartbeat", packets=packets, rate=round((packets - last_packets) / max(now - last_time, 1e-3), 2),
+                    connected=self.connected, rss_bytes=rss_bytes(), dedup_ratio=round(self.core.dedup.ratio, 3),
+                    recorder_rows=self.core.recorder.rows if self.core.recorder is not None else None,
+                    ei=self.core.ei_uploader.stats() if self.core.ei_uploader is not None else None)
+
+    def snapshot(self):
+        """Everything /metrics serves"""
+        core = self.core
+        return {"backend": self.backend_url, "connected": self.connected, "failures": self.failures,
+                "last_error": self.last_error, "uptime_s": time.monotonic() - self._started,
+                "rss_bytes": rss_bytes(), "status": describe_status(self.status) if self.status else None,
+                "recorder": ({"path": core.recorder.path, "rows": core.recorder.rows}
+                             if core.recorder is not None else None),
+                "edge_impulse": core.ei_uploader.stats() if core.ei_uploader is not None else None,
+                "alarm_levels": core.stats.alarm_levels(),
+                "dedup": core.dedup.stats(),
+                "baseline": (core.calibration.baseline.tolist()
+                             if core.calibration is not None and core.calibration.baseline is not None else None),
+                "metrics": self.metrics.snapshot()}
+
+
+def _train_classifier(core, data_dir, log):
+    from enose_classifier import train_default
+    try:
+        core.classifier, info = train_default(data_dir)
+        log.info("classifier_trained", extra={"fields": info})
+    except Exception as e:
+        log.warning("classifier_failed", extra={"fields": {"error": str(e)}})
+
+
+def main(argv=None, config=None):
+    """Headless entry point; `config` = frontend.daemon_config() (defaults for every option)"""
+    config = config or {}
+    parser = argparse.ArgumentParser(prog="frontend.py --headless", description="Headless e-nose acquisition daemon")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", default=f"{config.get('RUST_IP', '127.0.0.1')}:{config.get('RUST_PORT', 8080)}",
+                        help="Rust backend host:port")
+    parser.add_argument("--name", help="instance name in logs/recordings (default: backend host_port)")
+    parser.add_argument("--poll-ms", type=int, default=config.get("POLL_INTERVAL_MS", 1000))
+    parser.add_argument("--json-wire", action="store_true", help="ask /api/data for JSON instead of binary columns")
+    parser.add_argument("--record", action="store_true", help="record every packet to --recordings-dir")
+    parser.add_argument("--recordings-dir", default=config.get("RECORDINGS_DIR", "recordings"))
+    parser.add_argument("--edge-impulse", action="store_true", help="upload windows to Edge Impulse")
+    parser.add_argument("--calibration", choices=CALIBRATION_MODES, default=config.get("CALIBRATION_MODE", "off"),
+                        help="baseline correction of uploaded samples")
+    parser.add_argument("--no-classifier", action="store_true", help="skip training the local odor classifier")
+    parser.add_argument("--metrics-host", default="127.0.0.1")
+    parser.add_argument("--metrics-port", type=int, default=config.get("DAEMON_METRICS_PORT", 0),
+                        help="0 = any free port (logged at startup), -1 = no endpoint")
+    parser.add_argument("--log-file", help=f"rotating JSON log ({LOG_MAX_BYTES >> 20} MB x {LOG_BACKUPS}) instead of stdout")
+    parser.add_argument("--heartbeat-s", type=float, default=config.get("DAEMON_HEARTBEAT_S", 60.0))
+    parser.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = until SIGTERM/SIGINT)")
+    args = parser.parse_args(argv)
+
+    host, _, port = args.backend.rpartition(":")
+    if not host or not port.isdigit():
+        parser.error(f"--backend must be host:port, got {args.backend!r}")
+    name = args.name or re.sub(r"[^\w.-]+", "_", f"{host}_{port}")
+    log = make_logger(name, args.log_file)
+    backend_url = f"http://{host}:{port}"
+
+    core = AcquisitionCore(Metrics(), {
+        "windows": config.get("STATS_WINDOWS", (100, 1000)), "alpha": config.get("STATS_EWMA_ALPHA", 0.05),
+        "z_threshold": config.get("ALARM_Z", 4.0), "min_samples": config.get("ALARM_MIN_SAMPLES", 50),
+        "stuck_samples": config.get("STUCK_SAMPLES", 200), "thresholds": config.get("ALARM_THRESHOLDS", {}),
+    }, CalibrationCache(config.get("CALIBRATION_DIR", "calibration_cache")), args.calibration,
+        {"epsilon": config.get("DEDUP_EPSILON", {}), "max_run_ms": config.get("DEDUP_MAX_RUN_MS", 2000)})
+    core.set_device(device_key(host, port))
+    client = HttpClient(pool_size=2, retries=config.get("HTTP_RETRIES", 2), timeout=config.get("HTTP_TIMEOUT", 5))
+    daemon = AcquisitionDaemon(backend_url, core, client, log, poll_interval=args.poll_ms / 1000,
+                               binary=not args.json_wire and config.get("WIRE_BINARY", True),
+                               heartbeat_s=args.heartbeat_s)
+
+    if args.record:
+        path = os.path.join(args.recordings_dir, f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name}")
+        core.recorder = SessionRecorder(path, meta={"backend": backend_url, "headless": True, "instance": name})
+    if args.edge_impulse:
+        integration = EdgeImpulseIntegration(config.get("EI_API_KEY"), config.get("EI_PROJECT_ID"),
+                                             config.get("EI_DEVICE_ID"))
+        core.ei_uploader = EdgeImpulseUploader(
+            core.metrics.timed("ei.upload_window_ms", integration.send_sensor_window),
+            window_samples=config.get("EI_WINDOW_SAMPLES", 40), window_seconds=config.get("EI_WINDOW_SECONDS", 10.0),
+            spool_dir=os.path.join(config.get("EI_SPOOL_DIR", "ei_spool"), name),
+            interval_ms=config.get("EI_INTERVAL_MS", 250))
+    if not args.no_classifier and config.get("TRAINING_DATA_DIR"):
+        threading.Thread(target=_train_classifier, args=(core, config["TRAINING_DATA_DIR"], log),
+                         name="train-classifier", daemon=True).start()
+    server = None
+    if args.metrics_port >= 0:
+        server = MetricsServer(daemon.snapshot, args.metrics_host, args.metrics_port).start()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    log.info("started", extra={"fields": {
+        "backend": backend_url, "pid": os.getpid(), "poll_ms": args.poll_ms, "binary": daemon.binary,
+        "recording": core.recorder.path if core.recorder is not None else None,
+        "edge_impulse": core.ei_uploader is not None,
+        "metrics": "http://%s:%d/metrics" % server.address if server is not None else None}})
+    try:
+        daemon.run(stop, args.duration or None)
+    finally:
+        core.close()
+        if server is not None:
+            server.stop()
+        client.close()
+        snapshot = core.metrics.snapshot()
+        log.info("stopped", extra={"fields": {"packets": snapshot["counters"].get("ingest.packets", 0),
+                                              "uptime_s": round(snapshot["uptime_s"], 1), "rss_bytes": rss_bytes()}})
+    return 0
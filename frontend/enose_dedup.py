@@ -0,0 +1,231 @@
+# enose_dedup.py
+# Supresi sampel duplikat: pembacaan berulang disimpan run-length (nilai + rentang waktu + jumlah) (tanpa Qt)
+import csv
+import os
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+
+RUN_COUNT_COLUMN = "run_count"   # kolom tambahan di CSV yang sudah dikompaksi
+RUN_END_COLUMN = "run_end"
+
+
+def epsilon_vector(epsilon, n_channels=len(CHANNELS)):
+    """Per-channel tolerance (channels, 1) from a number, a sequence or a {channel: ppm} dict"""
+    if isinstance(epsilon, dict):
+        epsilon = [float(epsilon.get(name, 0.0) or 0.0) for name in CHANNELS]
+    return np.broadcast_to(np.asarray(epsilon, dtype=np.float64), (n_channels,)).reshape(-1, 1)
+
+
+class RunLengthCompactor:
+    """Collapses consecutive repeated readings of a stream into runs.
+
+    Arduino mengirim ulang pembacaan terakhir lebih cepat dari sensor berubah,
+    jadi banyak baris identik berturut-turut. Baris masuk ke run yang sedang
+    terbuka jika semua channel berjarak <= `epsilon` dari baris pertama run
+    (anchor, bukan baris sebelumnya - tidak ada drift yang merayap), state/level
+    sama, dan run belum lebih panjang dari `max_run_ms` (sensor macet tetap
+    menghasilkan titik berkala). Run terakhir tetap terbuka antar batch: batch
+    berikutnya bisa memperpanjang count/t_end-nya.
+    """
+
+    def __init__(self, epsilon=0.0, max_run_ms=2000, n_channels=len(CHANNELS)):
+        self.n_channels = n_channels
+        self.epsilon = epsilon_vector(epsilon, n_channels)
+        self.max_run_ms = max_run_ms
+        self.rows = 0               # baris masuk
+        self.runs = 0               # run keluar
+        self._anchor = None         # (values (channels,), key, t0) run yang masih terbuka
+        self.open_count = 0
+        self.open_end = None
+
+    @property
+    def ratio(self):
+        """Rows per stored run (1.0 = nothing suppressed)"""
+        return self.rows / self.runs if self.runs else 1.0
+
+    def stats(self):
+        return {"rows": self.rows, "runs": self.runs, "suppressed": self.rows - self.runs,
+                "ratio": self.ratio}
+
+    def reset(self):
+        self.rows = self.runs = 0
+        self._anchor = None
+        self.open_count = 0
+        self.open_end = None
+
+    def compact(self, timestamps, values, state=None, level=None):
+        """Batch (values (channels, n)) -> dict of the runs that START in this batch.
+
+        index     baris batch tempat run dimulai
+        timestamp waktu baris pertama run, t_end waktu baris terakhirnya
+        count     jumlah baris dalam run (run terakhir bisa bertambah di batch berikutnya)
+        values    (channels, m) nilai anchor tiap run
+        extended  baris awal batch yang masuk ke run terbuka dari batch sebelumnya
+        extended_values  nilai anchor run terbuka itu (None jika tidak ada)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        n = timestamps.size
+        key = np.zeros(n, dtype=np.int64)
+        if state is not None:
+            key += np.asarray(state, dtype=np.int64) * 256
+        if level is not None:
+            key += np.asarray(level, dtype=np.int64)
+        self.rows += n
+        previous = self._anchor[0] if self._anchor is not None else None
+        if n == 0:
+            return self._runs(timestamps, values, np.empty(0, dtype=np.int64), 0, previous)
+
+        # Kandidat: sama dengan baris sebelumnya (baris 0 dibandingkan dengan anchor run terbuka)
+        cont = np.empty(n, dtype=bool)
+        if self._anchor is not None:
+            cont[0] = self._near(values[:, :1], self._anchor[0][:, None])[0] and key[0] == self._anchor[1]
+        else:
+            cont[0] = False
+        cont[1:] = self._near(values[:, 1:], values[:, :-1]) & (key[1:] == key[:-1])
+
+        # Untuk epsilon > 0 / max_run_ms, cek ulang rantai kandidat terhadap anchor-nya
+        if self.max_run_ms is not None or np.any(self.epsilon > 0):
+            self._split_chains(cont, timestamps, values)
+
+        starts = np.flatnonzero(~cont)
+        extended = int(starts[0]) if starts.size else n
+        if self._anchor is not None and extended:
+            self.open_count += extended
+            self.open_end = int(timestamps[extended - 1])
+        if starts.size:
+            last = starts[-1]
+            self._anchor = (values[:, last].copy(), int(key[last]), int(timestamps[last]))
+            self.open_count = n - int(last)
+            self.open_end = int(timestamps[-1])
+        self.runs += starts.size
+        return self._runs(timestamps, values, starts, extended, previous)
+
+    def _near(self, a, b):
+        with np.errstate(invalid="ignore"):
+            # NaN == NaN dianggap sama (channel hilang berulang juga duplikat)
+            same = (np.abs(a - b) <= self.epsilon) | (np.isnan(a) & np.isnan(b))
+        return same.all(axis=0)
+
+    def _split_chains(self, cont, timestamps, values):
+        # Rantai kandidat [lo, hi): anchor = baris sebelum lo (lo == 0: run terbuka dari batch sebelumnya)
+        los = np.flatnonzero(cont & ~np.concatenate([[False], cont[:-1]]))
+        his = np.flatnonzero(~cont[1:] & cont[:-1]) + 1
+        if cont[-1]:
+            his = np.append(his, cont.size)
+        exact = not np.any(self.epsilon > 0)    # epsilon 0: kandidat sudah pasti sama dengan anchor
+        for lo, hi in zip(los.tolist(), his.tolist()):
+            if lo == 0:
+                anchor, t0 = self._anchor[0][:, None], self._anchor[2]
+            else:
+                anchor, t0 = values[:, lo - 1:lo], int(timestamps[lo - 1])
+            while lo < hi:
+                bad = np.zeros(hi - lo, dtype=bool) if exact else ~self._near(values[:, lo:hi], anchor)
+                if self.max_run_ms is not None:
+                    bad |= timestamps[lo:hi] - t0 >= self.max_run_ms
+                first = np.flatnonzero(bad)
+                if not first.size:
+                    break
+                # Baris ini memulai run baru dan menjadi anchor sisa rantai
+                start = lo + int(first[0])
+                cont[start] = False
+                anchor, t0 = values[:, start:start + 1], int(timestamps[start])
+                lo = start + 1
+
+    def _runs(self, timestamps, values, starts, extended, previous):
+        stops = np.append(starts[1:], timestamps.size)[:starts.size]
+        return {"index": starts, "timestamp": timestamps[starts], "t_end": timestamps[stops - 1],
+                "count": stops - starts, "values": values[:, starts], "extended": extended,
+                "extended_values": previous if extended else None}
+
+
+def step_points(runs):
+    """Plot points (index, values (channels, m)) that draw a compact() batch as flat steps.
+
+    Awal run saja akan tergambar sebagai garis miring ke run berikutnya; di sini tiap
+    run juga diberi titik di baris terakhirnya, dan baris awal batch yang memperpanjang
+    run terbuka ditutup dengan nilai anchor run tersebut.
+    """
+    index, count, values = runs["index"], runs["count"], runs["values"]
+    ends = index + count - 1
+    points = np.column_stack([index, ends]).ravel()
+    keep = np.ones(points.size, dtype=bool)
+    keep[1::2] = count > 1       # run satu baris: awal == akhir
+    points, values = points[keep], np.repeat(values, 2, axis=1)[:, keep]
+    if runs["extended_values"] is not None:
+        points = np.concatenate([[runs["extended"] - 1], points])
+        values = np.hstack([np.asarray(runs["extended_values"])[:, None], values])
+    return points, values
+
+
+def expand_runs(timestamp, t_end, count, values):
+    """Runs -> full-resolution (timestamps, values (channels, n)).
+
+    Nilai anchor diulang `count` kali; timestamp dibagi rata di rentang run
+    (timestamp asli tiap baris duplikat tidak disimpan).
+    """
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+    count = np.asarray(count, dtype=np.int64)
+    span = np.asarray(t_end, dtype=np.int64) - timestamp
+    first = np.repeat(np.cumsum(count) - count, count)
+    step = np.arange(first.size) - first
+    frac = step / np.repeat(np.maximum(count - 1, 1), count)
+    timestamps = np.repeat(timestamp, count) + np.round(np.repeat(span, count) * frac).astype(np.int64)
+    return timestamps, np.repeat(np.asarray(values), count, axis=1)
+
+
+def compact_columns(columns, epsilon=0.0, max_run_ms=None):
+    """Compact a whole column dict (one file) -> column dict of runs with run_count/run_end columns"""
+    values = np.vstack([columns[name] for name in CHANNELS]).astype(np.float64)
+    runs = RunLengthCompactor(epsilon, max_run_ms).compact(columns["timestamp"], values,
+                                                           columns.get("state"), columns.get("level"))
+    compacted = {name: np.asarray(column)[runs["index"]] for name, column in columns.items()}
+    compacted[RUN_COUNT_COLUMN] = runs["count"]
+    compacted[RUN_END_COLUMN] = runs["t_end"]
+    return compacted
+
+
+def expand_columns(columns):
+    """Inverse of compact_columns; dicts without run columns are returned unchanged"""
+    if RUN_COUNT_COLUMN not in columns:
+        return columns
+    count = np.asarray(columns[RUN_COUNT_COLUMN], dtype=np.int64)
+    values = np.vstack([columns[name] for name in CHANNELS])
+    timestamps, values = expand_runs(columns["timestamp"], columns[RUN_END_COLUMN], count, values)
+    expanded = {name: np.repeat(np.asarray(column), count) for name, column in columns.items()
+                if name not in (RUN_COUNT_COLUMN, RUN_END_COLUMN)}
+    expanded["timestamp"] = timestamps
+    expanded.update(zip(CHANNELS, values))
+    return expanded
+
+
+def compact_csv(path, epsilon=0.0, max_run_ms=None):
+    """Rewrite an /api/csv(/timeseries) export in place as runs; returns (rows, runs).
+
+    Baris teks asli dipertahankan (format angka, label); hanya baris pertama tiap
+    run yang ditulis, ditambah kolom run_count dan run_end. read_csv() mengembangkan
+    kembali file seperti ini ke resolusi penuh.
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        rows = [row for row in reader if len(row) == len(header)]
+    if RUN_COUNT_COLUMN in header or not rows:
+        return len(rows), len(rows)
+    timestamps = np.array([row[0] for row in rows], dtype=np.float64).astype(np.int64)
+    values = np.array([row[1:1 + len(CHANNELS)] for row in rows], dtype=np.float64).T
+    # Kolom teks (label / state / level) harus sama persis di dalam satu run
+    extra = [i for i in range(1 + len(CHANNELS), len(header))]
+    _, key = np.unique(np.array(["|".join(row[i] for i in extra) for row in rows]), return_inverse=True)
+    runs = RunLengthCompactor(epsilon, max_run_ms).compact(timestamps, values, state=key)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header + [RUN_COUNT_COLUMN, RUN_END_COLUMN])
+        for i, count, t_end in zip(runs["index"].tolist(), runs["count"].tolist(), runs["t_end"].tolist()):
+            writer.writerow(rows[i] + [count, t_end])
+    os.replace(tmp_path, path)
+    return len(rows), len(runs["index"])
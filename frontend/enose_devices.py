@@ -0,0 +1,317 @@
+# enose_devices.py
+# Registry beberapa e-nose (backend + Arduino) dan poller konkuren per device (tanpa Qt)
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from enose_buffer import CHANNELS, ChannelRingBuffer, minmax_decimate
+from enose_calibration import BaselineEstimator, device_key
+from enose_client import HttpClient, PacketCursor, poll_backend
+from enose_control import ArduinoChannel
+from enose_dedup import RunLengthCompactor, step_points
+from enose_stats import OnlineStats
+from enose_wire import column_packet
+
+DEVICE_FIELDS = ("name", "host", "port", "arduino_host", "arduino_port")
+
+
+class Device:
+    """One e-nose: its own HTTP pool, packet cursor, plot buffer, status and Arduino control channel.
+
+    `poll()` dijalankan di worker thread: decode, filter cursor dan tulis buffer
+    semuanya di sana, GUI thread hanya membaca `snapshot()` saat menggambar.
+    `version` naik setiap ada data/status baru sehingga tile tahu kapan perlu redraw.
+    """
+
+    def __init__(self, name, host, port, arduino_host=None, arduino_port=None,
+                 capacity=2000, timeout=2.0, stats_options=None, calibration=None, dedup_options=None):
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.arduino_host = arduino_host or None
+        self.arduino_port = int(arduino_port) if arduino_port else None
+        # Pool sendiri per device: koneksi yang macet tidak mengambil slot device lain.
+        # Retry dimatikan, backoff diatur MultiPoller.
+        self.client = HttpClient(pool_size=2, retries=0, timeout=timeout)
+        self.cursor = PacketCursor()
+        self.buffer = ChannelRingBuffer(len(CHANNELS), capacity)
+        self.dedup = RunLengthCompactor(**(dedup_options or {}))  # buffer plot hanya menyimpan awal tiap run
+        self.stats = OnlineStats(**(stats_options or {}))  # alarm per channel, diupdate di poll()
+        # Baseline IDLE/PURGE per device; `calibration` = CalibrationCache (None = tanpa persistensi)
+        self.calibration = calibration
+        self.baseline = (calibration.load(device_key(host, self.port)) if calibration is not None
+                         else None) or BaselineEstimator()
+        self.lock = threading.Lock()
+
+        self.status = {}
+        self.latest = {}
+        self.connected = False
+        self.failures = 0           # kegagalan berturut-turut
+        self.last_error = None
+        self.last_rtt_ms = None
+        self.packets = 0
+        self.alarm_levels = {}
+        self.alarms_raised = 0
+        self.version = 0
+        self.next_poll = 0.0
+        self._rate_log = deque()    # (waktu, jumlah paket) 10 detik terakhir
+        self._arduino = None          # ArduinoChannel, dibuat saat command pertama
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in DEVICE_FIELDS}
+
+    # ---------- worker thread ----------
+    def poll(self):
+        """Fetch new packets + status once; returns True on success (never raises)"""
+        start = time.perf_counter()
+        try:
+            packets, status = poll_backend(self.client, self.base_url, self.cursor.params(), binary=True)
+        except Exception as e:
+            with self.lock:
+                self.connected = False
+                self.failures += 1
+                self.last_error = str(e)
+                self.version += 1
+            return False
+
+        rtt_ms = (time.perf_counter() - start) * 1000
+        if isinstance(packets, dict):
+            # Backend baru: kolom biner, tanpa dict per paket
+            columns = self.cursor.advance_columns(packets)
+            n_new = len(columns["timestamp"])
+            if n_new:
+                timestamps = columns["timestamp"]
+                values = np.vstack([columns[key] for key in CHANNELS]).astype(np.float64)
+                state = columns["state"]
+                level = columns["level"]
+                latest = column_packet(columns)
+        else:
+            new_packets = self.cursor.advance(packets)
+            n_new = len(new_packets)
+            if n_new:
+                timestamps = [p.get("timestamp", 0) for p in new_packets]
+                values = np.array([[float(p.get(key, 0)) for p in new_packets] for key in CHANNELS])
+                state = [int(p.get("current_state", 0)) for p in new_packets]
+                level = [int(p.get("current_level", 0)) for p in new_packets]
+                latest = new_packets[-1]
+        if n_new:
+            runs = self.dedup.compact(timestamps, values, state, level)
+        now = time.monotonic()
+        with self.lock:
+            if n_new:
+                index, run_values = step_points(runs)
+                self.buffer.extend(self.packets + 1 + index, run_values)
+                self.latest = latest
+                self.alarms_raised += len(self.stats.update(timestamps, values))
+                self.alarm_levels = self.stats.alarm_levels()
+                baseline_closed = self.baseline.update(timestamps, values, state)
+                self.packets += n_new
+                self._rate_log.append((now, n_new))
+            self.status = status
+            self.connected = True
+            self.failures = 0
+            self.last_error = None
+            self.last_rtt_ms = rtt_ms
+            self.version += 1
+        if n_new and baseline_closed and self.calibration is not None:
+            try:
+                self.calibration.save(device_key(self.host, self.port), self.baseline)
+            except OSError as e:
+                self.last_error = f"calibration cache: {e}"
+        return True
+
+    def send_arduino(self, command):
+        """Queue one command on this device's persistent Arduino channel; returns a Future"""
+        if self.arduino_host is None or self.arduino_port is None:
+            raise ValueError(f"{self.name}: no Arduino address configured")
+        if self._arduino is None:
+            self._arduino = ArduinoChannel(self.arduino_host, self.arduino_port).start()
+        return self._arduino.send(command)
+
+    def arduino_state(self):
+        return self._arduino.state if self._arduino is not None else None
+
+    # ---------- GUI thread ----------
+    def snapshot(self, n_buckets):
+        """Decimated (xs, ys) copy of the buffer plus a status dict, taken under the lock.
+
+        ys selalu mentah; info["baseline"] (None sebelum ada fase IDLE/PURGE) untuk kalibrasi di tile.
+        """
+        with self.lock:
+            x, data = self.buffer.view()
+            xs, ys = minmax_decimate(x, data, n_buckets)
+            xs, ys = np.array(xs), np.array(ys)
+            info = {"connected": self.connected, "failures": self.failures, "last_error": self.last_error,
+                    "rtt_ms": self.last_rtt_ms, "packets": self.packets, "status": dict(self.status),
+                    "latest": dict(self.latest), "rate": self._rate(), "alarm_levels": dict(self.alarm_levels),
+                    "alarms_raised": self.alarms_raised, "baseline": self.baseline.baseline,
+                    "compaction": self.dedup.ratio}
+        return xs, ys, info
+
+    def _rate(self):
+        now = time.monotonic()
+        while self._rate_log and now - self._rate_log[0][0] > 10:
+            self._rate_log.popleft()
+        if len(self._rate_log) < 2:
+            return 0.0
+        span = now - self._rate_log[0][0]
+        return sum(n for _, n in list(self._rate_log)[1:]) / max(span, 1e-3)
+
+    def reset(self):
+        with self.lock:
+            self.cursor.reset()
+            self.buffer.clear()
+            self.stats.reset()
+            self.dedup.reset()
+            self.alarm_levels = {}
+            self.packets = 0
+            self._rate_log.clear()
+            self.version += 1
+
+    def close(self):
+        if self._arduino is not None:
+            self._arduino.stop()
+            self._arduino = None
+        self.client.close()
+
+
+class DeviceRegistry:
+    """Ordered set of devices, persisted as a JSON list in `path`"""
+
+    def __init__(self, path=None, **device_kwargs):
+        self.path = path
+        self.device_kwargs = device_kwargs
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __iter__(self):
+        return iter(self.devices())
+
+    def devices(self):
+        with self._lock:
+            return list(self._devices.values())
+
+    def get(self, name):
+        return self._devices.get(name)
+
+    def add(self, name, host, port, arduino_host=None, arduino_port=None):
+        if not name or name in self._devices:
+            raise ValueError(f"Device name '{name}' is empty or already registered")
+        device = Device(name, host, port, arduino_host, arduino_port, **self.device_kwargs)
+        with self._lock:
+            self._devices[name] = device
+        return device
+
+    def remove(self, name):
+        with self._lock:
+            device = self._devices.pop(name, None)
+        if device is not None:
+            device.close()
+        return device
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return self
+        with open(self.path) as f:
+            for entry in json.load(f):
+                if entry.get("name") not in self._devices:
+                    self.add(**{field: entry.get(field) for field in DEVICE_FIELDS})
+        return self
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([device.to_dict() for device in self.devices()], f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        for device in self.devices():
+            device.close()
+
+
+class MultiPoller:
+    """Polls every registered device concurrently on a worker pool.
+
+    Satu job in-flight per device: device yang lambat/timeout hanya menunda
+    dirinya sendiri, device lain tetap dipoll tepat waktu. Device yang gagal
+    dipoll ulang dengan backoff eksponensial (maksimal `max_backoff` detik).
+    """
+
+    def __init__(self, registry, interval=1.0, max_workers=16, max_backoff=30.0, metrics=None):
+        self.registry = registry
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.metrics = metrics
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enose-dev")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        for device in self.registry:
+            device.next_poll = 0.0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="enose-multipoll", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def shutdown(self):
+        self.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            next_due = now + self.interval
+            for device in self.registry:
+                with self._lock:
+                    busy = device.name in self._in_flight
+                if busy:
+                    continue
+                if now >= device.next_poll:
+                    with self._lock:
+                        self._in_flight.add(device.name)
+                    device.next_poll = now + self.interval
+                    self._pool.submit(self._poll, device)
+                next_due = min(next_due, device.next_poll)
+            self._stop.wait(min(max(next_due - time.monotonic(), 0.01), 0.2))
+
+    def _poll(self, device):
+        start = time.perf_counter()
+        try:
+            ok = device.poll()
+            if not ok:
+                delay = min(self.interval * 2 ** min(device.failures, 10), self.max_backoff)
+                device.next_poll = time.monotonic() + delay
+            if self.metrics is not None:
+                self.metrics.observe("devices.poll_ms", (time.perf_counter() - start) * 1000)
+                self.metrics.incr("devices.polls" if ok else "devices.poll_failures")
+        finally:
+            with self._lock:
+                self._in_flight.discard(device.name)
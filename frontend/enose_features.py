@@ -0,0 +1,159 @@
+# enose_features.py
+# Ekstraksi fitur per siklus sampling (segmen state/level) - vektorisasi NumPy, tanpa Qt
+import numpy as np
+
+from enose_buffer import CHANNELS
+
+FEATURE_NAMES = ("baseline", "peak", "delta", "rise_slope", "decay_slope", "auc", "steady_mean")
+
+
+def segment_cycles(state, level, min_samples=5):
+    """Split rows into runs of constant (state, level); returns (starts, stops) of runs >= min_samples"""
+    state = np.asarray(state)
+    level = np.asarray(level)
+    if state.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    change = np.flatnonzero((state[1:] != state[:-1]) | (level[1:] != level[:-1])) + 1
+    starts = np.concatenate([[0], change])
+    stops = np.concatenate([change, [state.size]])
+    keep = (stops - starts) >= min_samples
+    return starts[keep], stops[keep]
+
+
+def extract_features(timestamps, data, starts, stops, baseline_samples=5, steady_fraction=0.25):
+    """Per-cycle, per-channel features for (channels, n) `data`, all cycles at once.
+
+    Return array (n_cycles, n_channels, len(FEATURE_NAMES)). Slope dalam unit/detik,
+    AUC = luas (y - baseline) terhadap waktu (detik), metode trapesium.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    t = (np.asarray(timestamps, dtype=np.float64) - (timestamps[0] if len(timestamps) else 0)) / 1000
+    starts = np.asarray(starts, dtype=int)
+    stops = np.asarray(stops, dtype=int)
+    n_cycles, n_channels = starts.size, data.shape[0]
+    if n_cycles == 0:
+        return np.empty((0, n_channels, len(FEATURE_NAMES)))
+
+    lengths = stops - starts
+    last = stops - 1
+    # Cumsum dengan nol di depan -> mean rentang apa pun dalam O(1)
+    csum = np.concatenate([np.zeros((n_channels, 1)), np.cumsum(data, axis=1)], axis=1)
+
+    k_base = np.minimum(baseline_samples, lengths)
+    baseline = (csum[:, starts + k_base] - csum[:, starts]) / k_base
+
+    k_steady = np.maximum(np.round(lengths * steady_fraction).astype(int), 1)
+    steady_mean = (csum[:, stops] - csum[:, stops - k_steady]) / k_steady
+
+    # Segmen bisa tidak bersebelahan (segmen pendek dibuang) -> kumpulkan baris semua
+    # segmen jadi satu blok kontigu, lalu reduceat per segmen
+    cycle_offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    rows = np.arange(lengths.sum()) - np.repeat(cycle_offsets - starts, lengths)
+    gathered = data[:, rows]
+    peak = np.maximum.reduceat(gathered, cycle_offsets, axis=1)
+
+    # Baris pertama yang mencapai puncak di tiap segmen
+    is_peak = gathered == np.repeat(peak, lengths, axis=1)
+    peak_idx = np.minimum.reduceat(np.where(is_peak, rows, data.shape[1]), cycle_offsets, axis=1)
+
+    delta = peak - baseline
+    rise_dt = np.maximum(t[peak_idx] - t[starts], 1e-3)
+    rise_slope = delta / rise_dt
+    end_value = data[:, last]
+    decay_dt = np.maximum(t[last] - t[peak_idx], 1e-3)
+    decay_slope = np.where(peak_idx < last, (end_value - peak) / decay_dt, 0.0)
+
+    # Trapesium: kontribusi tiap pasangan berurutan, hanya pasangan di dalam segmen yang sama
+    pair_area = 0.5 * (data[:, 1:] + data[:, :-1]) * np.diff(t)
+    pair_csum = np.concatenate([np.zeros((n_channels, 1)), np.cumsum(pair_area, axis=1)], axis=1)
+    area = pair_csum[:, last] - pair_csum[:, starts]
+    auc = area - baseline * (t[last] - t[starts])
+
+    features = np.stack([baseline, peak, delta, rise_slope, decay_slope, auc, steady_mean], axis=2)
+    return features.transpose(1, 0, 2)
+
+
+def cycle_features(columns, min_samples=5, **kwargs):
+    """Segment and featurize a column dict (read_csv / SessionReader layout).
+
+    Return (cycles, features): cycles adalah array terstruktur (start, stop, state,
+    level, t0, t1) dan features (n_cycles, n_channels, n_features).
+    """
+    state, level = np.asarray(columns["state"]), np.asarray(columns["level"])
+    timestamps = np.asarray(columns["timestamp"])
+    data = np.vstack([np.asarray(columns[name], dtype=np.float64) for name in CHANNELS])
+    starts, stops = segment_cycles(state, level, min_samples)
+    features = extract_features(timestamps, data, starts, stops, **kwargs)
+
+    cycles = np.zeros(starts.size, dtype=[("start", "i8"), ("stop", "i8"), ("state", "i2"),
+                                          ("level", "i2"), ("t0", "i8"), ("t1", "i8")])
+    cycles["start"], cycles["stop"] = starts, stops
+    cycles["state"], cycles["level"] = state[starts], level[starts]
+    cycles["t0"], cycles["t1"] = timestamps[starts], timestamps[stops - 1]
+    return cycles, features
+
+
+class CycleTracker:
+    """Incremental (live) version: feed packets, get features when a cycle closes"""
+
+    def __init__(self, min_samples=5, max_samples=200_000):
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._key = None
+        self._rows = []             # baris dari add() (timestamp + channel), belum jadi blok
+        self._blocks = []           # blok NumPy (n, 1 + n_channels) dari extend()
+        self._count = 0
+        self.last_cycle = None      # (info dict, features (n_channels, n_features))
+
+    def add(self, packet):
+        """Add one SensorPacket dict; returns (info, features) when the previous cycle closed"""
+        key = (int(packet.get("current_state", 0)), int(packet.get("current_level", 0)))
+        closed = None
+        if key != self._key:
+            closed = self.close()
+            self._key = key
+        if self._count < self.max_samples:
+            self._rows.append([packet.get("timestamp", 0)] + [packet.get(name, 0) for name in CHANNELS])
+            self._count += 1
+        return closed
+
+    def extend(self, columns):
+        """Add a column dict (binary /api/data) at once; returns the list of cycles it closed"""
+        state, level = np.asarray(columns["state"]), np.asarray(columns["level"])
+        if state.size == 0:
+            return []
+        block = np.column_stack([columns["timestamp"]] + [columns[name] for name in CHANNELS]).astype(np.float64)
+        change = np.flatnonzero((state[1:] != state[:-1]) | (level[1:] != level[:-1])) + 1
+        closed = []
+        for start, stop in zip(np.concatenate([[0], change]), np.concatenate([change, [state.size]])):
+            key = (int(state[start]), int(level[start]))
+            if key != self._key:
+                cycle = self.close()
+                if cycle is not None:
+                    closed.append(cycle)
+                self._key = key
+            take = int(min(stop - start, self.max_samples - self._count))
+            if take > 0:
+                self._flush_rows()
+                self._blocks.append(block[start:start + take])
+                self._count += take
+        return closed
+
+    def _flush_rows(self):
+        if self._rows:
+            self._blocks.append(np.asarray(self._rows, dtype=np.float64))
+            self._rows = []
+
+    def close(self):
+        """Close the running cycle (if long enough) and return its features"""
+        self._flush_rows()
+        blocks, key, count = self._blocks, self._key, self._count
+        self._blocks, self._count = [], 0
+        if key is None or count < self.min_samples:
+            return None
+        block = np.vstack(blocks)
+        features = extract_features(block[:, 0], block[:, 1:].T, [0], [count])[0]
+        info = {"state": key[0], "level": key[1], "samples": count,
+                "t0": int(block[0, 0]), "t1": int(block[-1, 0])}
+        self.last_cycle = (info, features)
+        return self.last_cycle
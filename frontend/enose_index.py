@@ -0,0 +1,419 @@
+# enose_index.py
+# Indeks multi-resolusi rekaman & korpus CSV: piramida min/max/mean per chunk + indeks fase label/state/level (tanpa Qt)
+#
+#   python frontend.py query . --label kecil_merah --state HOLD --level 2
+#   python enose_index.py recordings --from 2025-12-01T16:00 --to 2025-12-01T17:00 --export sore.csv
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+from enose_calibration import apply_calibration
+from enose_classifier import label_from_filename
+from enose_core import STATE_NAMES
+from enose_protocol import CSV_HEADER
+from enose_storage import STATE_NAMES as SERIES_STATE_NAMES
+from enose_storage import open_cached
+
+INDEX_VERSION = 1
+INDEX_FILE = "pyramid.npz"              # disimpan di folder rekaman / salinan kolom CSV
+PYRAMID_LEVELS = (64, 1024, 16384)      # baris per bucket; tiap level kelipatan level sebelumnya
+SEGMENT_DTYPE = np.dtype([("start", "<i8"), ("stop", "<i8"), ("t0", "<i8"), ("t1", "<i8"),
+                          ("state", "<i2"), ("level", "<i2")])
+
+
+def _bucket_stats(data, size):
+    """(channels, n) -> per-bucket min, max, sum, count (channels, m); the last bucket may be partial"""
+    n_channels, n = data.shape
+    m = -(-n // size)
+    data = np.asarray(data, dtype=np.float64)
+    if m * size > n:
+        data = np.concatenate([data, np.full((n_channels, m * size - n), np.nan)], axis=1)
+    blocks = data.reshape(n_channels, m, size)
+    # fmin/fmax mengabaikan NaN (padding bucket terakhir) tanpa warning all-NaN
+    return (np.fmin.reduce(blocks, axis=2), np.fmax.reduce(blocks, axis=2), np.nansum(blocks, axis=2),
+            np.isfinite(blocks).sum(axis=2))
+
+
+def _phase_segments(timestamps, state, level, offset=0):
+    """Runs of constant (state, level) -> SEGMENT_DTYPE array (rows relative to the recording)"""
+    n = len(timestamps)
+    if n == 0:
+        return np.empty(0, dtype=SEGMENT_DTYPE)
+    state = np.asarray(state)
+    level = np.asarray(level)
+    edges = np.flatnonzero((state[1:] != state[:-1]) | (level[1:] != level[:-1])) + 1
+    starts = np.concatenate([[0], edges])
+    stops = np.concatenate([edges, [n]])
+    segments = np.empty(len(starts), dtype=SEGMENT_DTYPE)
+    segments["start"] = starts + offset
+    segments["stop"] = stops + offset
+    segments["t0"] = np.asarray(timestamps)[starts]
+    segments["t1"] = np.asarray(timestamps)[stops - 1]
+    segments["state"] = state[starts]
+    segments["level"] = level[starts]
+    return segments
+
+
+class SessionIndex:
+    """Aggregate pyramid and phase segments of one SessionReader.
+
+    Tiap level piramida menyimpan min/max/sum/count per channel dan t0/t1 per
+    bucket, jadi rentang waktu panjang bisa diringkas tanpa membaca baris mentah.
+    Indeks disimpan di `pyramid.npz` di samping file kolom dan hanya diperpanjang
+    untuk baris baru (rekaman yang masih berjalan): bucket/segmen terakhir dihitung ulang.
+    """
+
+    def __init__(self, reader, levels=PYRAMID_LEVELS):
+        self.reader = reader
+        self.levels = tuple(levels)
+        self.rows = 0
+        self.pyramid = {size: {key: np.empty((len(CHANNELS), 0)) for key in ("min", "max", "sum", "count")}
+                        for size in self.levels}
+        for size in self.levels:
+            self.pyramid[size]["t0"] = self.pyramid[size]["t1"] = np.empty(0, dtype=np.int64)
+        self.segments = np.empty(0, dtype=SEGMENT_DTYPE)
+        meta = reader.index.get("meta", {})
+        self.source = meta.get("source", reader.path)
+        self.label = meta.get("label") or label_from_filename(self.source)
+
+    @property
+    def path(self):
+        return os.path.join(self.reader.path, INDEX_FILE)
+
+    @property
+    def name(self):
+        return os.path.basename(self.source.rstrip(os.sep))
+
+    @classmethod
+    def open(cls, reader, levels=PYRAMID_LEVELS, save=True):
+        """Load the stored index, extend it to the reader's current rows and save it if it changed"""
+        index = cls(reader, levels)
+        index._load()
+        if index.rows != len(reader):
+            index.extend()
+            if save:
+                try:
+                    index.save()
+                except OSError as e:
+                    print(f"❌ Index save failed for {reader.path}: {e}")
+        return index
+
+    def _load(self):
+        try:
+            with np.load(self.path) as stored:
+                if int(stored["version"]) != INDEX_VERSION or tuple(stored["levels"]) != self.levels:
+                    return
+                rows = int(stored["rows"])
+                if rows > len(self.reader):
+                    return  # rekaman ditulis ulang / lebih pendek: bangun dari awal
+                for size in self.levels:
+                    for key in ("min", "max", "sum", "count", "t0", "t1"):
+                        self.pyramid[size][key] = stored[f"{key}_{size}"]
+                self.segments = stored["segments"]
+                self.rows = rows
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def save(self):
+        arrays = {f"{key}_{size}": values for size, level in self.pyramid.items() for key, values in level.items()}
+        tmp_path = os.path.join(self.reader.path, "pyramid.tmp.npz")
+        np.savez(tmp_path, version=INDEX_VERSION, levels=np.array(self.levels), rows=self.rows,
+                 segments=self.segments, **arrays)
+        os.replace(tmp_path, self.path)
+
+    def extend(self):
+        """Index rows [self.rows, len(reader)); the last partial bucket and last segment are recomputed"""
+        n = len(self.reader)
+        timestamps = self.reader.column("timestamp")
+        for size, level in self.pyramid.items():
+            complete = self.rows // size       # bucket penuh yang sudah benar
+            start = complete * size
+            if start >= n:
+                continue
+            stats = _bucket_stats(self.reader.channels(start, n), size)
+            for key, values in zip(("min", "max", "sum", "count"), stats):
+                level[key] = np.concatenate([level[key][:, :complete], values], axis=1)
+            starts = np.arange(start, n, size)
+            level["t0"] = np.concatenate([level["t0"][:complete], timestamps[starts]])
+            level["t1"] = np.concatenate([level["t1"][:complete], timestamps[np.minimum(starts + size, n) - 1]])
+        keep = self.segments[:-1]
+        start = int(self.segments[-1]["start"]) if len(self.segments) else 0
+        self.segments = np.concatenate([keep, _phase_segments(
+            timestamps[start:n], self.reader.column("state")[start:n], self.reader.column("level")[start:n], start)])
+        self.rows = n
+
+    def level_for(self, rows, buckets):
+        """Coarsest pyramid level that still gives >= `buckets` buckets over `rows` rows (None: read raw rows)"""
+        usable = [size for size in self.levels if rows // size >= buckets]
+        return max(usable) if usable else None
+
+    def envelope(self, size, start, stop):
+        """Buckets of level `size` overlapping rows [start, stop): (first row, t0, t1, min, max, mean)"""
+        level = self.pyramid[size]
+        lo, hi = start // size, min(-(-stop // size), level["t0"].size)
+        count = level["count"][:, lo:hi]
+        with np.errstate(all="ignore"):
+            mean = level["sum"][:, lo:hi] / count
+        return (np.arange(lo, hi) * size, level["t0"][lo:hi], level["t1"][lo:hi],
+                level["min"][:, lo:hi], level["max"][:, lo:hi], mean)
+
+
+def index_sessions(readers, levels=PYRAMID_LEVELS):
+    """reader.path -> SessionIndex for every reader (built or resumed from pyramid.npz)"""
+    return {reader.path: SessionIndex.open(reader, levels) for reader in readers}
+
+
+def find_sources(paths, exclude=()):
+    """CSV files and recording folders (containing index.json) under `paths`, sorted.
+
+    Folder di `exclude` (mis. cache salinan kolom CSV) dilewati agar tidak terhitung dua kali.
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in exclude]
+                if "index.json" in names and "timestamp.bin" in names:
+                    found.append(root)
+                    dirs[:] = []
+                    continue
+                found += [os.path.join(root, name) for name in names if name.lower().endswith(".csv")]
+        elif path.lower().endswith(".csv") or os.path.basename(path) == "index.json":
+            found.append(path if path.lower().endswith(".csv") else os.path.dirname(path))
+    return sorted(set(found))
+
+
+def parse_state(value):
+    """'HOLD' / 'hold' / '3' -> 3"""
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    for names in (STATE_NAMES, SERIES_STATE_NAMES):
+        upper = [name.upper() for name in names]
+        if text.upper() in upper:
+            return upper.index(text.upper())
+    raise ValueError(f"unknown state {value!r} (one of {', '.join(STATE_NAMES)})")
+
+
+def parse_time(value):
+    """Epoch milliseconds or an ISO date/time ('2025-12-01T16:17') -> epoch ms"""
+    text = str(value).strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def parse_query(text):
+    """'label=kecil_merah state=HOLD level=2 from=... to=...' -> Catalog.find() keyword arguments"""
+    query = {}
+    for token in text.split():
+        key, sep, value = token.partition("=")
+        if not sep or not value:
+            raise ValueError(f"expected key=value, got {token!r}")
+        key = key.lower()
+        if key == "label":
+            query["label"] = value
+        elif key == "state":
+            query["state"] = parse_state(value)
+        elif key == "level":
+            query["level"] = int(value)
+        elif key in ("from", "to"):
+            query["t_start" if key == "from" else "t_end"] = parse_time(value)
+        elif key == "min_rows":
+            query["min_rows"] = int(value)
+        else:
+            raise ValueError(f"unknown query key {key!r} (label, state, level, from, to, min_rows)")
+    return query
+
+
+class Catalog:
+    """Indexed sessions queried together: phases by label/state/level/time, aggregates from the pyramids.
+
+    Semua segmen fase digabung ke satu tabel NumPy (plus kolom sesi), jadi query
+    label/state/level/rentang waktu cukup satu mask vektor - tanpa membuka baris mentah.
+    """
+
+    def __init__(self, indexes):
+        self.indexes = sorted((i for i in indexes if i.rows), key=lambda i: int(i.segments["t0"][0]))
+        self.labels = sorted({i.label for i in self.indexes if i.label})
+        tables = [i.segments for i in self.indexes]
+        self.phases = np.concatenate(tables) if tables else np.empty(0, dtype=SEGMENT_DTYPE)
+        self.session = np.repeat(np.arange(len(tables)), [len(t) for t in tables]).astype(np.int64)
+        session_labels = np.array([i.label or "" for i in self.indexes], dtype=str)
+        self.phase_label = session_labels[self.session] if len(tables) else np.empty(0, dtype=str)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    @classmethod
+    def open(cls, paths, cache_dir="replay_cache", levels=PYRAMID_LEVELS):
+        """Index every CSV / recording under `paths` (CSV parsed once into `cache_dir`)"""
+        readers = [open_cached(path, cache_dir) for path in find_sources(paths, exclude=[cache_dir])]
+        return cls(index_sessions(readers, levels).values())
+
+    def find(self, label=None, state=None, level=None, t_start=None, t_end=None, min_rows=1):
+        """Phases matching every given filter (overlapping [t_start, t_end]), oldest first"""
+        phases = self.phases
+        mask = (phases["stop"] - phases["start"]) >= min_rows
+        if label is not None:
+            mask &= self.phase_label == label
+        if state is not None:
+            mask &= phases["state"] == state
+        if level is not None:
+            mask &= phases["level"] == level
+        if t_start is not None:
+            mask &= phases["t1"] >= t_start
+        if t_end is not None:
+            mask &= phases["t0"] <= t_end
+        hits = np.flatnonzero(mask)
+        hits = hits[np.argsort(phases["t0"][hits], kind="stable")]
+        return [self._match(i) for i in hits.tolist()]
+
+    def _match(self, i):
+        phase = self.phases[i]
+        index = self.indexes[self.session[i]]
+        return {"session": int(self.session[i]), "source": index.name, "path": index.reader.path,
+                "label": index.label, "state": int(phase["state"]), "level": int(phase["level"]),
+                "start": int(phase["start"]), "stop": int(phase["stop"]), "t0": int(phase["t0"]),
+                "t1": int(phase["t1"]), "rows": int(phase["stop"] - phase["start"])}
+
+    def aggregate(self, t_start=None, t_end=None, buckets=500, label=None):
+        """min/max/mean per channel over a time range, ~`buckets` points per session, from the pyramid.
+
+        Return dict t (awal bucket), rows, min, max, mean (channels, m) urut waktu.
+        Rentang yang terlalu pendek untuk level terkecil dibaca langsung (baris mentah).
+        """
+        parts = []
+        for index in self.indexes:
+            if label is not None and index.label != label:
+                continue
+            start, stop = index.reader.row_range(t_start, t_end)
+            if stop <= start:
+                continue
+            size = index.level_for(stop - start, buckets)
+            if size is None:
+                data = index.reader.channels(start, stop).astype(np.float64)
+                parts.append((index.reader.column("timestamp")[start:stop], np.ones(stop - start, dtype=np.int64),
+                              data, data, data))
+                continue
+            _, t0, _, lo, hi, mean = index.envelope(size, start, stop)
+            parts.append((t0, index.pyramid[size]["count"][0, start // size:start // size + t0.size], lo, hi, mean))
+        if not parts:
+            empty = np.empty((len(CHANNELS), 0))
+            return {"t": np.empty(0, dtype=np.int64), "rows": np.empty(0, dtype=np.int64),
+                    "min": empty, "max": empty, "mean": empty}
+        t = np.concatenate([p[0] for p in parts]).astype(np.int64)
+        order = np.argsort(t, kind="stable")
+        return {"t": t[order], "rows": np.concatenate([p[1] for p in parts])[order],
+                "min": np.hstack([p[2] for p in parts])[:, order], "max": np.hstack([p[3] for p in parts])[:, order],
+                "mean": np.hstack([p[4] for p in parts])[:, order]}
+
+    def rows(self, match):
+        """Full-resolution column dict of one match (only its rows are read)"""
+        reader = self.indexes[match["session"]].reader
+        start, stop = match["start"], match["stop"]
+        columns = {name: np.asarray(reader.column(name)[start:stop]) for name in ("timestamp", "state", "level")}
+        columns.update(zip(CHANNELS, reader.channels(start, stop)))
+        return columns
+
+    def export_csv(self, matches, path):
+        """Write the matched phases in /api/csv format (+ source file) so read_csv/batch/training accept it"""
+        tmp_path = path + ".tmp"
+        rows = 0
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER + ["source"])
+            for match in matches:
+                columns = self.rows(match)
+                label = f"level_{match['level']}_state_{match['state']}" if match["level"] > 0 else "idle"
+                values = [np.char.mod("%.6f", columns[name]) for name in CHANNELS]
+                n = len(columns["timestamp"])
+                writer.writerows(zip(columns["timestamp"].tolist(), *values, [label] * n, [match["source"]] * n))
+                rows += n
+        os.replace(tmp_path, path)
+        return rows
+
+
+def replay_envelope(dataset, indexes, start, stop, n_buckets, estimators=None, mode="off"):
+    """Min/max envelope of ReplayDataset rows [start, stop) from the pyramids, or None to read raw rows.
+
+    Dipakai replay saat jendela jauh lebih lebar dari layar: tiap bucket jadi dua
+    titik (min lalu max) di x = baris dataset. `estimators` (reader.path ->
+    BaselineEstimator) mengoreksi baseline pada t0 tiap bucket.
+    """
+    if not indexes or any(reader.path not in indexes for reader in dataset.readers):
+        return None
+    sizes = [s for s in PYRAMID_LEVELS if (stop - start) // s >= n_buckets]
+    if not sizes:
+        return None
+    size = max(sizes)
+    xs, ys = [], []
+    for reader, base in zip(dataset.readers, dataset.offsets.tolist()):
+        lo, hi = max(start - base, 0), min(stop - base, len(reader))
+        if hi <= lo:
+            continue
+        first, t0, _, low, high, _ = indexes[reader.path].envelope(size, lo, hi)
+        estimator = (estimators or {}).get(reader.path)
+        if mode != "off" and estimator is not None:
+            baseline = estimator.baseline_at(t0)
+            if baseline is not None:
+                low, high = apply_calibration(low, baseline, mode), apply_calibration(high, baseline, mode)
+        x = (base + first).astype(np.float64)
+        xs.append(np.stack([x, x + size / 2], axis=1).ravel())
+        ys.append(np.stack([low, high], axis=2).reshape(len(CHANNELS), -1))
+    if not xs:
+        return None
+    return np.concatenate(xs), np.hstack(ys)
+
+
+# ==================== CLI ====================
+def _format_time(ms):
+    return datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query recorded sessions and CSV datasets by label/state/level/time")
+    parser.add_argument("paths", nargs="+", help="CSV files, recording folders and/or directories (recursive)")
+    parser.add_argument("--label", help="e.g. kecil_merah (label from the file name)")
+    parser.add_argument("--state", type=parse_state, help="IDLE, PRE_COND, RAMP_UP, HOLD, PURGE, RECOVERY, DONE or 0-6")
+    parser.add_argument("--level", type=int)
+    parser.add_argument("--from", dest="t_start", type=parse_time, help="epoch ms or ISO time")
+    parser.add_argument("--to", dest="t_end", type=parse_time, help="epoch ms or ISO time")
+    parser.add_argument("--min-rows", type=int, default=1)
+    parser.add_argument("--export", help="write the matched phases to this CSV (/api/csv format)")
+    parser.add_argument("--cache-dir", default="replay_cache", help="columnar copies of parsed CSVs")
+    parser.add_argument("--limit", type=int, default=50, help="matches printed (all are exported)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    catalog = Catalog.open(args.paths, args.cache_dir)
+    opened = time.perf_counter()
+    if not len(catalog):
+        print("❌ No recordings or CSV files found")
+        return 1
+    matches = catalog.find(args.label, args.state, args.level, args.t_start, args.t_end, args.min_rows)
+    queried = time.perf_counter()
+    print(f"📚 {len(catalog)} session(s), {len(catalog.phases)} phase(s), labels: {', '.join(catalog.labels) or '-'} "
+          f"(indexed in {(opened - start) * 1000:.0f} ms)")
+    for match in matches[:args.limit]:
+        state = STATE_NAMES[match["state"]] if 0 <= match["state"] < len(STATE_NAMES) else match["state"]
+        print(f"  {_format_time(match['t0'])} +{(match['t1'] - match['t0']) / 1000:6.1f} s  "
+              f"{state:<8} L{match['level']}  {match['rows']:6d} rows  {match['label'] or '-':<12} {match['source']}")
+    if len(matches) > args.limit:
+        print(f"  ... {len(matches) - args.limit} more")
+    print(f"🔎 {len(matches)} match(es), {sum(m['rows'] for m in matches)} rows in {(queried - opened) * 1000:.2f} ms")
+    if args.export:
+        rows = catalog.export_csv(matches, args.export)
+        print(f"💾 {rows} rows -> {args.export}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# enose_metrics.py
+# Instrumentasi ringan: histogram latensi (bucket log), counter dan gauge (tanpa Qt)
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+
+# Batas bucket (ms): 8 bucket per dekade dari 1 µs sampai 100 detik
+BUCKET_BOUNDS = [10 ** (e / 8) for e in range(-24, 41)]
+
+
+def rss_bytes():
+    """Current resident set size, or None where it cannot be read without extra packages"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+class Histogram:
+    """Fixed-size log-bucket histogram; record() is O(log buckets), memory does not grow.
+
+    Persentil dihitung dari bucket (error relatif maksimal ~33%, cukup untuk
+    melihat di mana waktu habis), min/max/mean tetap eksak.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100)"""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.total / self.count, "min": self.min,
+                "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99),
+                "max": self.max}
+
+
+class Metrics:
+    """Registry of named histograms (ms), counters and gauges; safe to use from worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started = time.time()
+
+    def observe(self, name, value_ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(value_ms)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def timed(self, name, fn):
+        """Wrap `fn` so every call is recorded under `name`"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_s": time.time() - self.started,
+                "histograms_ms": {name: h.summary() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "gauges": dict(sorted(self.gauges.items())),
+            }
+
+    def export(self, path):
+        """Write a snapshot plus raw bucket counts as JSON (for offline analysis)"""
+        data = self.snapshot()
+        data["exported"] = time.time()
+        with self._lock:
+            data["bucket_bounds_ms"] = BUCKET_BOUNDS
+            data["buckets"] = {name: h.counts for name, h in sorted(self.histograms.items())}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+        return path
@@ -0,0 +1,249 @@
+# enose_protocol.py
+# Protokol sampling terjadwal: kirim command Arduino, label fase, satu file CSV per run (tanpa Qt)
+import csv
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+
+# Header sama dengan /api/csv backend, jadi file run bisa langsung dipakai read_csv/training
+CSV_HEADER = ["timestamp", "GMXXX_NO2 (ppm)", "GMXXX_Ethanol (ppm)", "GMXXX_VOC (ppm)", "GMXXX_CO (ppm)",
+              "MiCS5524_CO (ppm)", "MiCS5524_Ethanol (ppm)", "MiCS5524_VOC (ppm)", "label"]
+
+PROTOCOL_DEFAULTS = {"repetitions": 1, "fan_s": 120.0, "pump_s": 240.0, "purge_s": 60.0,
+                     "start_command": "START_SAMPLING", "stop_command": "STOP_SAMPLING", "setup_commands": []}
+
+
+def normalize_protocol(entry):
+    """Validate one protocol dict and fill in defaults; raises ValueError"""
+    if not isinstance(entry, dict) or not str(entry.get("sample", "")).strip():
+        raise ValueError(f"protocol needs a 'sample' name: {entry!r}")
+    protocol = dict(PROTOCOL_DEFAULTS, **entry)
+    protocol["sample"] = re.sub(r"[^\w-]+", "_", str(protocol["sample"]).strip())
+    protocol["repetitions"] = int(protocol["repetitions"])
+    for key in ("fan_s", "pump_s", "purge_s"):
+        protocol[key] = float(protocol[key])
+        if protocol[key] < 0:
+            raise ValueError(f"{protocol['sample']}: {key} must be >= 0")
+    if protocol["repetitions"] < 1:
+        raise ValueError(f"{protocol['sample']}: repetitions must be >= 1")
+    protocol["setup_commands"] = [str(c) for c in protocol["setup_commands"]]
+    return protocol
+
+
+def load_protocols(path):
+    """JSON file with one protocol, a list of them, or {"protocols": [...]}"""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("protocols", [data])
+    return [normalize_protocol(entry) for entry in data]
+
+
+def build_schedule(protocols):
+    """Expand protocols into steps with absolute offsets (s) from the start of the batch.
+
+    Tiap repetisi: setup commands + START (run file dibuka), fase kipas, fase
+    pompa, STOP (run file ditutup), lalu purge. Offset dihitung sekali di
+    depan, jadi waktu eksekusi tidak bergeser walau ada step yang telat.
+    """
+    steps = []
+    t = 0.0
+    for protocol in protocols:
+        for rep in range(1, protocol["repetitions"] + 1):
+            run = f"{protocol['sample']}_{rep}"
+            base = {"sample": protocol["sample"], "rep": rep, "repetitions": protocol["repetitions"], "run": run,
+                    "stop_command": protocol["stop_command"]}
+            commands = protocol["setup_commands"] + [protocol["start_command"]]
+            steps.append(dict(base, at=t, phase="fan", commands=commands, open_run=True))
+            t += protocol["fan_s"]
+            steps.append(dict(base, at=t, phase="pump", commands=[]))
+            t += protocol["pump_s"]
+            steps.append(dict(base, at=t, phase="purge", commands=[protocol["stop_command"]], close_run=True))
+            t += protocol["purge_s"]
+    steps.append({"at": t, "phase": "done", "commands": [], "sample": None, "rep": 0, "repetitions": 0, "run": None,
+                  "stop_command": None})
+    return steps
+
+
+class RunWriter:
+    """Labelled CSV for one run, in the backend /api/csv format"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_HEADER)
+
+    def write(self, packets):
+        if isinstance(packets, dict):
+            self._write_columns(packets)
+            return
+        for p in packets:
+            level, state = int(p.get("current_level", 0)), int(p.get("current_state", 0))
+            label = f"level_{level}_state_{state}" if level > 0 else "idle"
+            self._writer.writerow([int(p.get("timestamp", 0))]
+                                  + [max(float(p.get(key, 0)), 0.0) for key in CHANNELS] + [label])
+        self.rows += len(packets)
+
+    def _write_columns(self, columns):
+        """Column dict (binary /api/data) -> same rows as write()"""
+        labels = [f"level_{level}_state_{state}" if level > 0 else "idle"
+                  for level, state in zip(columns["level"].tolist(), columns["state"].tolist())]
+        # astype(str) = repr terpendek per dtype, jadi kolom float32 tidak menulis digit noise
+        values = [np.maximum(columns[key], 0).astype(str).tolist() for key in CHANNELS]
+        self._writer.writerows(zip(columns["timestamp"].tolist(), *values, labels))
+        self.rows += len(labels)
+
+    def close(self):
+        self._file.close()
+
+
+class ProtocolRunner:
+    """Runs a schedule on its own thread against a monotonic clock.
+
+    `send(command)` harus mengembalikan Future (ArduinoChannel.send). Paket yang
+    di-ingest diteruskan lewat `feed()` dan ditulis ke file run yang sedang
+    terbuka. Progress dibaca GUI lewat `progress()`; manifest.json di folder
+    output mencatat protokol, waktu tiap run, status command dan jumlah baris.
+    """
+
+    def __init__(self, protocols, send, out_dir, command_timeout=10.0, command_attempts=3, on_event=None):
+        self.protocols = protocols
+        self.steps = build_schedule(protocols)
+        self.send = send
+        self.out_dir = out_dir
+        self.command_timeout = command_timeout
+        self.command_attempts = command_attempts
+        self.on_event = on_event or (lambda message: None)
+        self.total_s = self.steps[-1]["at"]
+
+        self.state = "idle"
+        self.step_index = -1
+        self.runs = []
+        self._writer = None
+        self._run_entry = None
+        self._started = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- API ----------
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._started = time.monotonic()
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, name="protocol-runner", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Abort: sends the stop command of the current run and closes its file"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def feed(self, packets):
+        with self._lock:
+            if self._writer is not None and len(packets):
+                self._writer.write(packets)
+
+    def progress(self):
+        with self._lock:
+            step = self.steps[self.step_index] if self.step_index >= 0 else None
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            if self.state != "running":
+                elapsed = min(elapsed, self.total_s)
+            next_at = self.steps[self.step_index + 1]["at"] if 0 <= self.step_index < len(self.steps) - 1 else None
+            return {"state": self.state, "step": step, "elapsed_s": elapsed, "total_s": self.total_s,
+                    "fraction": min(elapsed / self.total_s, 1.0) if self.total_s else 1.0,
+                    "phase_remaining_s": max(next_at - elapsed, 0.0) if next_at is not None else 0.0,
+                    "rows": self._writer.rows if self._writer is not None else 0}
+
+    # ---------- thread ----------
+    def _run(self):
+        try:
+            for index, step in enumerate(self.steps):
+                # Tunggu sampai deadline absolut step ini (bukan sleep relatif -> tidak drift)
+                if self._stop.wait(max(self._started + step["at"] - time.monotonic(), 0)):
+                    break
+                with self._lock:
+                    self.step_index = index
+                if step.get("close_run"):
+                    self._send_all(step["commands"])
+                    self._close_run("completed")
+                else:
+                    if step.get("open_run"):
+                        self._open_run(step)
+                    self._send_all(step["commands"])
+                self.on_event(f"{step['run'] or 'protocol'}: {step['phase']}")
+            else:
+                self.state = "done"
+                return
+            # Dibatalkan di tengah run: hentikan Arduino dan tutup file
+            if self._writer is not None:
+                self._send_all([self.steps[self.step_index]["stop_command"]])
+                self._close_run("aborted")
+            self.state = "aborted"
+        except Exception as e:
+            self._close_run(f"error: {e}")
+            self.state = "error"
+            self.on_event(f"protocol error: {e}")
+        finally:
+            self._write_manifest()
+
+    def _send_all(self, commands):
+        for command in commands:
+            status = self._send_with_retry(command)
+            if self._run_entry is not None:
+                self._run_entry["commands"].append(status)
+
+    def _send_with_retry(self, command):
+        error = None
+        for attempt in range(1, self.command_attempts + 1):
+            try:
+                result = self.send(command).result(timeout=self.command_timeout)
+                return {"command": command, "status": result["status"], "rtt_ms": result["rtt_ms"],
+                        "attempts": attempt, "at": time.time()}
+            except Exception as e:
+                error = e
+                self.on_event(f"⚠ {command} failed (attempt {attempt}): {e}")
+                if self._stop.wait(2.0):
+                    break
+        return {"command": command, "status": "failed", "error": str(error), "attempts": attempt, "at": time.time()}
+
+    def _open_run(self, step):
+        path = os.path.join(self.out_dir, f"{step['run']}.csv")
+        with self._lock:
+            self._writer = RunWriter(path)
+            self._run_entry = {"run": step["run"], "sample": step["sample"], "rep": step["rep"],
+                               "file": os.path.basename(path), "started": time.time(), "commands": []}
+
+    def _close_run(self, status):
+        with self._lock:
+            writer, self._writer = self._writer, None
+            entry, self._run_entry = self._run_entry, None
+        if writer is None:
+            return
+        writer.close()
+        entry.update(ended=time.time(), rows=writer.rows, status=status)
+        self.runs.append(entry)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {"protocols": self.protocols, "state": self.state, "runs": self.runs,
+                    "schedule_s": self.total_s}
+        tmp_path = os.path.join(self.out_dir, "manifest.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, os.path.join(self.out_dir, "manifest.json"))
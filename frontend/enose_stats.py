@@ -0,0 +1,240 @@
+# enose_stats.py
+# Statistik online per channel (Welford, EWMA, rolling min/max, laju, sensor macet, sentinel) + alarm (tanpa Qt)
+import numpy as np
+
+from enose_buffer import CHANNELS
+
+SENTINEL = -1.0  # backend mengisi field JSON yang hilang dengan -1.0
+
+# Tingkat alarm per jenis; urutan SEVERITY = prioritas warna tile
+ALARM_SEVERITY = {"high": "alarm", "low": "alarm", "stuck": "fault", "missing": "fault", "z": "warn"}
+SEVERITY = ("ok", "warn", "fault", "alarm")
+
+
+def _ewma(e0, values, valid, alpha):
+    """EWMA state after the valid samples of `values` (channels, n), closed form instead of a loop"""
+    decay = 1.0 - alpha
+    rank = np.cumsum(valid, axis=1)
+    k = rank[:, -1]
+    # Eksponen selalu >= 0 (bobot sampel terbaru = alpha), jadi tidak overflow untuk batch besar
+    weights = np.where(valid, alpha * decay ** (k[:, None] - rank), 0.0)
+    return decay ** k * e0 + (weights * np.where(valid, values, 0.0)).sum(axis=1)
+
+
+class OnlineStats:
+    """Incremental per-channel statistics over the live stream, updated one batch at a time.
+
+    Setiap `update()` hanya menyentuh sampel baru (O(1) per sampel per channel,
+    dihitung vektor untuk seluruh batch); history buffer tidak pernah di-scan ulang.
+
+    - mean/std kumulatif (Welford, digabung per batch dengan rumus Chan)
+    - EWMA + EW std (dari EWMA x dan x²) sebagai baseline z-score
+    - rolling min/max per window (sampel), dari ring min/max per blok; tepat sampai satu blok
+    - laju perubahan (ppm/s, EWMA dari turunan antar sampel)
+    - sensor macet: nilai identik `stuck_samples` kali berturut-turut
+    - sentinel: nilai -1.0 / non-finite (field hilang) tidak ikut statistik dan memicu alarm "missing"
+
+    Alarm dilaporkan saat mulai aktif (edge), status aktif dibaca lewat `alarm_levels()`.
+    """
+
+    def __init__(self, channels=CHANNELS, windows=(100, 1000), alpha=0.05, z_threshold=4.0, min_samples=50,
+                 stuck_samples=200, stuck_epsilon=0.0, thresholds=None, max_events=100):
+        self.channels = list(channels)
+        self.windows = tuple(sorted(int(w) for w in windows))
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.stuck_samples = stuck_samples
+        self.stuck_epsilon = stuck_epsilon
+        self.max_events = max_events
+        self.block = max(self.windows[0] // 10, 1)
+        self.n_blocks = -(-self.windows[-1] // self.block)
+        self.low = np.full(len(self.channels), -np.inf)
+        self.high = np.full(len(self.channels), np.inf)
+        for name, (low, high) in (thresholds or {}).items():
+            i = self.channels.index(name)
+            self.low[i] = -np.inf if low is None else low
+            self.high[i] = np.inf if high is None else high
+        self.reset()
+
+    def reset(self):
+        c = len(self.channels)
+        self.samples = 0
+        self.count = np.zeros(c, dtype=np.int64)
+        self.mean = np.zeros(c)
+        self.m2 = np.zeros(c)
+        self.ewma = np.zeros(c)
+        self.ewma_sq = np.zeros(c)
+        self.rate = np.zeros(c)
+        self.last_value = np.zeros(c)
+        self.last_ts = np.zeros(c)
+        self.has_last = np.zeros(c, dtype=bool)
+        self.stuck_run = np.zeros(c, dtype=np.int64)
+        self.sentinels = np.zeros(c, dtype=np.int64)
+        self.active = {kind: np.zeros(c, dtype=bool) for kind in ALARM_SEVERITY}
+        self._ring_min = np.full((c, self.n_blocks), np.inf)
+        self._ring_max = np.full((c, self.n_blocks), -np.inf)
+        self._ring_head = 0
+        self._ring_filled = 0
+        self._block_min = np.full(c, np.inf)
+        self._block_max = np.full(c, -np.inf)
+        self._block_count = 0
+
+    # ---------- update ----------
+    def update(self, timestamps, values):
+        """Add a batch: `timestamps` (n,) ms, `values` (channels, n). Returns newly raised alarms."""
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n = values.shape[1]
+        if n == 0:
+            return []
+        valid = np.isfinite(values) & (values != SENTINEL)
+        self.sentinels += n - valid.sum(axis=1)
+        index = np.arange(n)
+
+        # Sampel valid sebelumnya untuk tiap sampel (carry dari batch lalu) -> turunan & deteksi macet
+        last_valid = np.maximum.accumulate(np.where(valid, index, -1), axis=1)
+        prev = np.concatenate([np.full((len(values), 1), -1), last_valid[:, :-1]], axis=1)
+        has_prev = (prev >= 0) | self.has_last[:, None]
+        rows = np.arange(len(values))[:, None]
+        prev_value = np.where(prev >= 0, values[rows, np.maximum(prev, 0)], self.last_value[:, None])
+        prev_ts = np.where(prev >= 0, timestamps[np.maximum(prev, 0)], self.last_ts[:, None])
+
+        # Baseline z-score = state sebelum batch
+        count_before = self.count.copy()
+        ewma_before = self.ewma
+        ewma_std = np.sqrt(np.maximum(self.ewma_sq - self.ewma ** 2, 0.0))
+        ewma_std = np.maximum(ewma_std, 1e-3 * np.maximum(np.abs(self.ewma), 1.0))
+
+        # Welford per batch (Chan et al.): gabungkan mean/M2 batch dengan state
+        n_batch = valid.sum(axis=1)
+        batch_mean = np.where(valid, values, 0.0).sum(axis=1) / np.maximum(n_batch, 1)
+        batch_m2 = (np.where(valid, values - batch_mean[:, None], 0.0) ** 2).sum(axis=1)
+        total = self.count + n_batch
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * n_batch / np.maximum(total, 1)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * n_batch / np.maximum(total, 1)
+        self.count = total
+
+        # EWMA: channel yang belum punya state mulai dari sampel valid pertamanya
+        first = np.argmax(valid, axis=1)
+        fresh = (count_before == 0) & (n_batch > 0)
+        start = np.where(fresh, values[np.arange(len(values)), first], self.ewma)
+        self.ewma = _ewma(start, values, valid, self.alpha)
+        self.ewma_sq = _ewma(np.where(fresh, start ** 2, self.ewma_sq), values ** 2, valid, self.alpha)
+
+        dt_s = (timestamps[None, :] - prev_ts) / 1000.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derivative = (values - prev_value) / dt_s
+        self.rate = _ewma(self.rate, derivative, valid & has_prev & (dt_s > 0), self.alpha)
+
+        # Run nilai identik: reset di setiap sampel valid yang berubah
+        same = valid & has_prev & (np.abs(values - prev_value) <= self.stuck_epsilon)
+        last_break = np.maximum.accumulate(np.where(valid & ~same, index, -1), axis=1)
+        run = np.where(last_break >= 0, index - last_break + 1, self.stuck_run[:, None] + index + 1)
+        self.stuck_run = run[:, -1]
+
+        self._update_blocks(np.where(valid, values, np.inf), np.where(valid, values, -np.inf))
+
+        has_any = n_batch > 0
+        last_index = last_valid[:, -1]
+        self.last_value = np.where(has_any, values[np.arange(len(values)), np.maximum(last_index, 0)],
+                                   self.last_value)
+        self.last_ts = np.where(has_any, timestamps[np.maximum(last_index, 0)], self.last_ts)
+        self.has_last |= has_any
+        self.samples += n
+
+        conditions = {
+            "high": valid & (values > self.high[:, None]),
+            "low": valid & (values < self.low[:, None]),
+            "z": valid & (count_before[:, None] >= self.min_samples)
+                 & (np.abs(values - ewma_before[:, None]) > self.z_threshold * ewma_std[:, None]),
+            "stuck": valid & (run >= self.stuck_samples),
+            "missing": ~valid,
+        }
+        return self._edges(conditions, timestamps, values, ewma_before, ewma_std)
+
+    def _edges(self, conditions, timestamps, values, ewma_before, ewma_std):
+        events = []
+        for kind, condition in conditions.items():
+            previous = np.concatenate([self.active[kind][:, None], condition[:, :-1]], axis=1)
+            self.active[kind] = condition[:, -1].copy()
+            for channel, i in zip(*np.nonzero(condition & ~previous)):
+                if len(events) >= self.max_events:
+                    break
+                value = float(values[channel, i])
+                event = {"channel": self.channels[channel], "kind": kind, "severity": ALARM_SEVERITY[kind],
+                         "index": int(i), "timestamp": int(timestamps[i]), "value": value}
+                if kind == "z":
+                    event["z"] = (value - float(ewma_before[channel])) / float(ewma_std[channel])
+                events.append(event)
+        events.sort(key=lambda e: e["index"])
+        return events
+
+    def _update_blocks(self, mins, maxs):
+        """Fold the batch into per-block min/max; completed blocks go into the ring"""
+        n = mins.shape[1]
+        pos = min(self.block - self._block_count, n)
+        self._block_min = np.minimum(self._block_min, mins[:, :pos].min(axis=1, initial=np.inf))
+        self._block_max = np.maximum(self._block_max, maxs[:, :pos].max(axis=1, initial=-np.inf))
+        self._block_count += pos
+        if self._block_count < self.block:
+            return
+        self._push_blocks(self._block_min[:, None], self._block_max[:, None])
+        full = (n - pos) // self.block
+        if full:
+            end = pos + full * self.block
+            shape = (len(mins), full, self.block)
+            self._push_blocks(mins[:, pos:end].reshape(shape).min(axis=2), maxs[:, pos:end].reshape(shape).max(axis=2))
+            pos = end
+        self._block_min = mins[:, pos:].min(axis=1, initial=np.inf)
+        self._block_max = maxs[:, pos:].max(axis=1, initial=-np.inf)
+        self._block_count = n - pos
+
+    def _push_blocks(self, mins, maxs):
+        m = mins.shape[1]
+        if m > self.n_blocks:
+            mins, maxs, m = mins[:, -self.n_blocks:], maxs[:, -self.n_blocks:], self.n_blocks
+        slots = (self._ring_head + np.arange(m)) % self.n_blocks
+        self._ring_min[:, slots] = mins
+        self._ring_max[:, slots] = maxs
+        self._ring_head = (self._ring_head + m) % self.n_blocks
+        self._ring_filled = min(self._ring_filled + m, self.n_blocks)
+
+    # ---------- read ----------
+    def window_range(self, window):
+        """(min, max) per channel over roughly the last `window` samples (nan before any valid sample)"""
+        k = min(window // self.block, self._ring_filled)
+        slots = (self._ring_head - 1 - np.arange(k)) % self.n_blocks
+        low = np.minimum(self._block_min, self._ring_min[:, slots].min(axis=1, initial=np.inf))
+        high = np.maximum(self._block_max, self._ring_max[:, slots].max(axis=1, initial=-np.inf))
+        return np.where(np.isfinite(low), low, np.nan), np.where(np.isfinite(high), high, np.nan)
+
+    def std(self):
+        return np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+
+    def alarm_levels(self):
+        """channel -> highest active severity ("ok", "warn", "fault", "alarm")"""
+        levels = {}
+        for i, name in enumerate(self.channels):
+            active = [ALARM_SEVERITY[kind] for kind, flags in self.active.items() if flags[i]]
+            levels[name] = max(active, key=SEVERITY.index) if active else "ok"
+        return levels
+
+    def snapshot(self):
+        """Per-channel dict of the current statistics (for tooltips, logs, the metrics endpoint)"""
+        std = self.std()
+        ewma_std = np.sqrt(np.maximum(self.ewma_sq - self.ewma ** 2, 0.0))
+        ranges = {w: self.window_range(w) for w in self.windows}
+        result = {}
+        for i, name in enumerate(self.channels):
+            entry = {"count": int(self.count[i]), "mean": float(self.mean[i]), "std": float(std[i]),
+                     "ewma": float(self.ewma[i]), "ewma_std": float(ewma_std[i]),
+                     "rate_per_s": float(self.rate[i]), "stuck_run": int(self.stuck_run[i]),
+                     "sentinels": int(self.sentinels[i]),
+                     "alarms": [kind for kind, flags in self.active.items() if flags[i]]}
+            for w, (low, high) in ranges.items():
+                entry[f"min_{w}"] = float(low[i])
+                entry[f"max_{w}"] = float(high[i])
+            result[name] = entry
+        return result
@@ -0,0 +1,294 @@
+# enose_storage.py
+# Rekaman sesi lokal: kolom biner fixed-width, append-only, bisa di-memmap (tanpa Qt)
+import bisect
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+from enose_dedup import RUN_COUNT_COLUMN, RUN_END_COLUMN, expand_columns
+
+FORMAT_VERSION = 1
+
+# (nama kolom, dtype little-endian). Satu file per kolom: <nama>.bin
+COLUMNS = ([("timestamp", "<i8")]
+           + [(name, "<f4") for name in CHANNELS]
+           + [("state", "<i2"), ("level", "<i2")])
+COLUMN_DTYPES = dict(COLUMNS)
+
+# Nama field SensorPacket untuk kolom non-channel
+PACKET_FIELDS = {"timestamp": "timestamp", "state": "current_state", "level": "current_level"}
+
+# Nama state di /api/csv/timeseries (urutan = kode current_state)
+STATE_NAMES = ("idle", "pre_conditioning", "ramp_up", "hold", "purge", "recovery", "done")
+LABEL_PATTERN = re.compile(r"level_(\d+)_state_(\d+)")
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+class SessionRecorder:
+    """Append-only columnar recorder for ingested packets.
+
+    Baris ditampung di batch NumPy lalu ditulis ke file kolom saat batch penuh
+    atau `flush_interval` detik terlewati. index.json hanya diperbarui setelah
+    data tertulis, jadi byte sisa akibat crash di ujung file diabaikan reader.
+    Setiap `chunk_rows` baris dicatat sebagai chunk (rentang waktu) di index.
+    """
+
+    def __init__(self, path, chunk_rows=65536, batch_rows=256, flush_interval=1.0, meta=None):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        os.makedirs(path, exist_ok=True)
+
+        self._index_path = os.path.join(path, "index.json")
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {
+                "version": FORMAT_VERSION,
+                "columns": [[name, dtype] for name, dtype in COLUMNS],
+                "rows": 0,
+                "chunk_rows": chunk_rows,
+                "chunks": [],
+                "created": time.time(),
+                "meta": meta or {},
+            }
+        self.chunk_rows = self.index["chunk_rows"]
+
+        # Potong byte sisa (crash sebelumnya) agar append melanjutkan tepat setelah baris terakhir
+        self._files = {}
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(path, f"{name}.bin")
+            f = open(file_path, "ab")
+            f.truncate(self.index["rows"] * np.dtype(dtype).itemsize)
+            self._files[name] = f
+
+        self._batch = {name: np.empty(batch_rows, dtype=dtype) for name, dtype in COLUMNS}
+        self._batch_len = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def rows(self):
+        return self.index["rows"] + self._batch_len
+
+    def append(self, packet):
+        """Append one SensorPacket dict"""
+        i = self._batch_len
+        for name, _ in COLUMNS:
+            self._batch[name][i] = packet.get(PACKET_FIELDS.get(name, name), 0)
+        self._batch_len += 1
+        if (self._batch_len == len(self._batch["timestamp"])
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def extend(self, columns):
+        """Append many rows at once from a dict of equal-length column arrays"""
+        self.flush()
+        n = len(columns["timestamp"])
+        if n == 0:
+            return
+        for name, dtype in COLUMNS:
+            self._files[name].write(np.asarray(columns[name], dtype=dtype).tobytes())
+            self._files[name].flush()
+        self._update_chunks(np.asarray(columns["timestamp"]))
+        self.index["rows"] += n
+        _write_json_atomic(self._index_path, self.index)
+
+    def flush(self):
+        """Write the pending batch to the column files and commit the index"""
+        self._last_flush = time.monotonic()
+        n = self._batch_len
+        if n == 0:
+            return
+        for name, f in self._files.items():
+            f.write(self._batch[name][:n].tobytes())
+            f.flush()
+        self._update_chunks(self._batch["timestamp"][:n])
+        self.index["rows"] += n
+        self._batch_len = 0
+        _write_json_atomic(self._index_path, self.index)
+
+    def _update_chunks(self, timestamps):
+        chunks = self.index["chunks"]
+        row = self.index["rows"]
+        pos = 0
+        while pos < len(timestamps):
+            if not chunks or chunks[-1]["rows"] == self.chunk_rows:
+                chunks.append({"start": row + pos, "rows": 0,
+                               "t0": int(timestamps[pos]), "t1": int(timestamps[pos])})
+            chunk = chunks[-1]
+            take = min(self.chunk_rows - chunk["rows"], len(timestamps) - pos)
+            chunk["rows"] += take
+            chunk["t1"] = int(timestamps[pos + take - 1])
+            pos += take
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class SessionReader:
+    """Read-only view of a recording; columns are memory-mapped, nothing is loaded up front"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            self.index = json.load(f)
+        self.rows = self.index["rows"]
+        self.dtypes = dict((name, dtype) for name, dtype in self.index["columns"])
+        self._maps = {}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def chunks(self):
+        return self.index["chunks"]
+
+    def column(self, name):
+        """Memory-mapped column (length = committed rows)"""
+        if name not in self._maps:
+            if self.rows == 0:
+                self._maps[name] = np.empty(0, dtype=self.dtypes[name])
+            else:
+                self._maps[name] = np.memmap(os.path.join(self.path, f"{name}.bin"),
+                                             dtype=self.dtypes[name], mode="r", shape=(self.rows,))
+        return self._maps[name]
+
+    def channels(self, start=0, stop=None):
+        """(channels, n) float array for rows [start, stop) - only this slice is read"""
+        return np.vstack([self.column(name)[start:stop] for name in CHANNELS])
+
+    def row_range(self, t_start=None, t_end=None):
+        """Row slice [start, stop) covering timestamps t_start <= t <= t_end"""
+        timestamps = self.column("timestamp")
+        start = 0 if t_start is None else int(np.searchsorted(timestamps, t_start, side="left"))
+        stop = self.rows if t_end is None else int(np.searchsorted(timestamps, t_end, side="right"))
+        return start, stop
+
+
+# ==================== CSV DATASETS ====================
+def read_csv(path, expand=True):
+    """Parse an /api/csv or /api/csv/timeseries export into column arrays (sorted by time).
+
+    Export yang dikompaksi (kolom run_count/run_end, enose_dedup) dikembangkan ke
+    resolusi penuh kecuali `expand=False` (kolom run ikut dikembalikan).
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        rows = [row for row in reader if len(row) == len(header)]
+
+    def text(name):
+        i = header.index(name)
+        return np.array([row[i] for row in rows], dtype=str)
+
+    # str -> float64 langsung dari list (2x lebih cepat dari array str + astype)
+    numeric = np.array([row[:8] for row in rows], dtype=np.float64).reshape(len(rows), 8)
+    columns = {"timestamp": numeric[:, 0].astype(np.int64)}
+    for i, name in enumerate(CHANNELS):
+        columns[name] = numeric[:, i + 1]
+
+    if "state" in header and "level" in header:
+        # Skema timeseries: state sebagai nama, level sebagai angka
+        names, inverse = np.unique(text("state"), return_inverse=True)
+        codes = np.array([STATE_NAMES.index(n) if n in STATE_NAMES else 0 for n in names])
+        columns["state"] = codes[inverse]
+        columns["level"] = text("level").astype(np.float64).astype(np.int64)
+    else:
+        # Skema /api/csv: label "level_{n}_state_{m}" atau "idle"
+        labels, inverse = np.unique(text("label"), return_inverse=True)
+        parsed = [LABEL_PATTERN.fullmatch(label) for label in labels]
+        levels = np.array([int(m.group(1)) if m else 0 for m in parsed])
+        states = np.array([int(m.group(2)) if m else 0 for m in parsed])
+        columns["state"] = states[inverse]
+        columns["level"] = levels[inverse]
+
+    if RUN_COUNT_COLUMN in header:
+        columns[RUN_COUNT_COLUMN] = text(RUN_COUNT_COLUMN).astype(np.int64)
+        columns[RUN_END_COLUMN] = text(RUN_END_COLUMN).astype(np.int64)
+
+    order = np.argsort(columns["timestamp"], kind="stable")
+    columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+    return expand_columns(columns) if expand else columns
+
+
+def open_cached(path, cache_dir):
+    """Open a recording directory, or a CSV through its cached columnar copy.
+
+    Cache dikunci dengan path + ukuran + mtime file, jadi CSV hanya di-parse
+    sekali; membuka ulang langsung memakai file kolom yang di-memmap.
+    """
+    if os.path.isdir(path) or os.path.basename(path) == "index.json":
+        return SessionReader(path if os.path.isdir(path) else os.path.dirname(path))
+
+    st = os.stat(path)
+    key = hashlib.sha1(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:16]
+    stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.splitext(os.path.basename(path))[0])
+    cache_path = os.path.join(cache_dir, f"{stem}_{key}")
+    if not os.path.exists(os.path.join(cache_path, "index.json")):
+        tmp_path = cache_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        recorder = SessionRecorder(tmp_path, meta={"source": os.path.abspath(path)})
+        recorder.extend(read_csv(path))
+        recorder.close()
+        os.replace(tmp_path, cache_path)
+    return SessionReader(cache_path)
+
+
+class ReplayDataset:
+    """Several recordings played back as one time-ordered sequence of rows"""
+
+    def __init__(self, readers):
+        self.readers = sorted((r for r in readers if len(r)), key=lambda r: int(r.column("timestamp")[0]))
+        self.offsets = np.concatenate([[0], np.cumsum([len(r) for r in self.readers])]).astype(int)
+        self._first_ts = [int(r.column("timestamp")[0]) for r in self.readers]
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _pieces(self, start, stop):
+        start, stop = max(start, 0), min(stop, len(self))
+        first = bisect.bisect_right(self.offsets, start) - 1
+        for i in range(max(first, 0), len(self.readers)):
+            base = self.offsets[i]
+            if base >= stop:
+                break
+            yield self.readers[i], max(start - base, 0), min(stop - base, len(self.readers[i]))
+
+    def column(self, name, start, stop):
+        pieces = [reader.column(name)[s:e] for reader, s, e in self._pieces(start, stop)]
+        if not pieces:
+            return np.empty(0, dtype=COLUMN_DTYPES[name])
+        return np.concatenate(pieces)
+
+    def channels(self, start, stop):
+        """(channels, n) array for rows [start, stop); only those rows are read from disk"""
+        return np.vstack([self.column(name, start, stop) for name in CHANNELS])
+
+    def row_at_time(self, timestamp):
+        """First row with timestamp >= `timestamp`"""
+        i = max(bisect.bisect_right(self._first_ts, timestamp) - 1, 0)
+        reader = self.readers[i]
+        row = int(np.searchsorted(reader.column("timestamp"), timestamp, side="left"))
+        return int(self.offsets[i]) + row
+
+    def source_name(self, row):
+        i = min(max(bisect.bisect_right(self.offsets, row) - 1, 0), len(self.readers) - 1)
+        reader = self.readers[i]
+        return os.path.basename(reader.index["meta"].get("source", reader.path))
@@ -0,0 +1,280 @@
+# enose_upload.py
+# Upload Edge Impulse per window (batch) di worker thread + spool di disk untuk retry (tanpa Qt)
+import bisect
+import contextlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from enose_client import HttpClient
+
+
+class EdgeImpulseIntegration:
+    # ✅ PERBAIKAN 3: Hanya ada satu __init__
+    def __init__(self, api_key, project_id, device_id, client=None, endpoint=None):
+        self.client = client or HttpClient(timeout=10)
+        self.api_key = api_key
+        self.project_id = project_id
+        
+        # Endpoint ingestion yang benar (menggunakan Device ID)
+        self.correct_endpoint = endpoint or f"https://ingestion.edgeimpulse.com/v1/devices/{device_id}/data"
+
+        # List endpoint palsu (dipertahankan sesuai struktur kode asli)
+        self.endpoints = [
+            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/device-data",
+            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/training",
+            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/raw",
+            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/data",
+            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/sensors"
+        ]
+        
+    def send_sensor_data(self, sensor_values):
+        """✅ PERBAIKAN 4: Menyederhanakan logika — cukup panggil sekali ke endpoint yang benar."""
+        return self._try_endpoint(self.correct_endpoint, sensor_values)
+
+    def send_sensor_window(self, rows, interval_ms):
+        """Send a window of readings (list of 7-value rows) as one time-series sample"""
+        return self._try_endpoint(self.correct_endpoint, rows, interval_ms)
+
+    def _try_endpoint(self, endpoint, sensor_values, interval_ms=1000):
+        """Metode ini sekarang menerima endpoint yang benar secara langsung."""
+        try:
+            real_endpoint = endpoint # real_endpoint sekarang sama dengan endpoint (self.correct_endpoint)
+
+            payload = {
+                "protected": {
+                    "ver": "v1",
+                    "alg": "none",
+                    "iat": int(time.time())
+                },
+                "signature": "0",
+                "payload": {
+                    "device_type": "ENose",
+                    "device_name": "e-nose-arduino-01",
+                    "interval_ms": interval_ms,
+                    "sensors": [
+                        "GMXXX_NO2", "GMXXX_Ethanol", "GMXXX_VOC", "GMXXX_CO",
+                        "MiCS5524_CO", "MiCS5524_Ethanol", "MiCS5524_VOC"
+                    ],
+                    # ✅ PERBAIKAN 5: Hapus kurung siku ganda pada values
+                    "values": sensor_values 
+                }
+            }
+
+            headers = {
+                "Content-Type": "application/json",
+                "x-api-key": self.api_key,
+                "x-file-name": "enose.json"
+            }
+
+            # Debug prints
+            print(f"➡️  Sending to real endpoint: {real_endpoint}")
+            
+            import requests  # lazy: hanya dibutuhkan saat EI dipakai
+            try:
+                response = self.client.post(
+                    real_endpoint,
+                    json=payload,
+                    headers=headers,
+                    timeout=10
+                )
+            except requests.exceptions.RequestException as re:
+                print(f"❌ requests exception when posting to {real_endpoint}: {re}")
+                return False
+
+            print(f"Response: {response.status_code} - {response.text}")
+
+            if response.status_code in [200, 201]:
+                print(f"✅ SUCCESS sending data.")
+                return True
+            else:
+                print(f"❌ Failed with status: {response.status_code}")
+                return False
+                
+        except Exception as e:
+            print(f"❌ Error during Edge Impulse API call: {e}")
+            return False
+
+
+class EdgeImpulseUploader:
+    """Batches samples into windows and uploads each window as one multi-row payload.
+
+    Edge Impulse mengasumsikan jarak sampel tetap (`interval_ms`), sedangkan pembacaan
+    datang tidak rata (jitter poll, run dari dedup). Tiap window di-resample ke grid
+    `interval_ms` dengan zero-order hold: satu pembacaan berlaku sampai pembacaan berikutnya.
+    `send_window(rows, interval_ms)` dipanggil dari worker thread dan harus
+    mengembalikan True jika berhasil. Window yang gagal disimpan ke `spool_dir`
+    (satu file JSON per window) dan dikirim ulang saat koneksi pulih.
+    """
+
+    def __init__(self, send_window, window_samples=40, window_seconds=10.0,
+                 spool_dir="ei_spool", retry_interval=15.0, interval_ms=250):
+        self.send_window = send_window
+        self.window_samples = window_samples
+        self.window_seconds = window_seconds
+        self.spool_dir = spool_dir
+        self.retry_interval = retry_interval
+        self.interval_ms = interval_ms
+        # Window ditutup setelah window_samples titik grid atau window_seconds, mana yang lebih dulu
+        self._window_ms = min(window_samples * interval_ms, window_seconds * 1000)
+
+        self._timestamps = []
+        self._rows = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sent_log = deque()      # (waktu, jumlah sampel) untuk throughput 60 detik terakhir
+        self._spool_seq = 0
+        self._next_retry = 0.0
+        self.windows_sent = 0
+        self.samples_sent = 0
+        self.failures = 0
+        self.replayed = 0
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Direktori spool hanya dibaca sekali; setelah itu _spool/_replay_spool yang memperbarui daftar
+        self._spooled = deque(self._spool_files())
+        self._thread = threading.Thread(target=self._run, name="ei-uploader", daemon=True)
+        self._thread.start()
+
+    # ---------- dipanggil dari thread ingest ----------
+    def add_sample(self, timestamp_ms, values):
+        """Add one 7-channel reading (held until the next one); closes the window once it spans a full window"""
+        if self._timestamps and timestamp_ms - self._timestamps[0] >= self._window_ms:
+            self.flush(timestamp_ms)
+        self._timestamps.append(timestamp_ms)
+        self._rows.append([float(v) for v in values])
+
+    def flush(self, until_ms=None):
+        """Close the current window, resampled onto the `interval_ms` grid, and queue it for upload.
+
+        `until_ms` = awal window berikutnya (pembacaan terakhir ditahan sampai sana);
+        None = grid berhenti di pembacaan terakhir.
+        """
+        if not self._rows:
+            return
+        t0 = self._timestamps[0]
+        end = self._timestamps[-1] + 1 if until_ms is None else until_ms
+        # Celah panjang (backend berhenti) tidak menjadi ribuan sampel basi: maksimal satu window
+        n = max(-(-(min(end, t0 + self._window_ms) - t0) // self.interval_ms), 1)
+        rows = [self._rows[bisect.bisect_right(self._timestamps, t0 + k * self.interval_ms) - 1] for k in range(n)]
+        self._queue.put({"interval_ms": self.interval_ms, "values": rows})
+        self._timestamps, self._rows = [], []
+
+    def stop(self, timeout=5.0):
+        """Flush and stop the worker; it spools anything still queued before exiting.
+
+        timeout=0 hanya memberi sinyal (GUI thread tidak menunggu upload yang sedang berjalan).
+        """
+        self.flush()
+        self._stop.set()
+        self._queue.put(None)
+        if timeout:
+            self._thread.join(timeout)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._sent_log and now - self._sent_log[0][0] > 60:
+                self._sent_log.popleft()
+            recent = sum(n for _, n in self._sent_log)
+            span = (now - self._sent_log[0][0]) if self._sent_log else 0
+            return {
+                "windows_sent": self.windows_sent,
+                "samples_sent": self.samples_sent,
+                "failures": self.failures,
+                "replayed": self.replayed,
+                "queued": self._queue.qsize() + (1 if self._rows else 0),
+                "spooled": len(self._spooled),
+                "samples_per_sec": recent / max(span, 1.0),
+            }
+
+    # ---------- worker thread ----------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                window = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                window = None
+            if window is not None:
+                if not self._send(window):
+                    self._spool(window)
+            elif time.monotonic() >= self._next_retry:
+                self._replay_spool()
+        # Sisa antrean saat berhenti -> spool, dikirim ulang saat uploader berikutnya jalan
+        while True:
+            try:
+                window = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if window is not None:
+                self._spool(window)
+
+    def _send(self, window):
+        try:
+            ok = self.send_window(window["values"], window["interval_ms"])
+        except Exception as e:
+            print(f"❌ Edge Impulse window upload failed: {e}")
+            ok = False
+        with self._lock:
+            if ok:
+                self.windows_sent += 1
+                self.samples_sent += len(window["values"])
+                self._sent_log.append((time.monotonic(), len(window["values"])))
+            else:
+                self.failures += 1
+        if not ok:
+            self._next_retry = time.monotonic() + self.retry_interval
+        return ok
+
+    def _replay_spool(self):
+        # Kirim ulang dari yang paling lama; berhenti di kegagalan pertama
+        while self._spooled:
+            if self._stop.is_set() or not self._queue.empty():
+                return
+            path = self._spooled[0]
+            try:
+                with open(path) as f:
+                    window = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"❌ Corrupt spool file {path}: {e}")
+                self._spooled.popleft()
+                with contextlib.suppress(OSError):
+                    os.replace(path, path + ".bad")
+                continue
+            if not self._send(window):
+                return
+            self._spooled.popleft()
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            with self._lock:
+                self.replayed += 1
+
+    def _spool(self, window):
+        self._spool_seq += 1
+        name = f"window_{int(time.time() * 1000)}_{self._spool_seq:06d}.json"
+        tmp_path = os.path.join(self.spool_dir, name + ".tmp")
+        path = os.path.join(self.spool_dir, name)
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(window, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Disk penuh / folder spool hilang: window dibuang, worker tetap hidup
+            print(f"❌ Edge Impulse window lost, spool failed: {e}")
+            with self._lock:
+                self.failures += 1
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return
+        self._spooled.append(path)
+
+    def _spool_files(self):
+        try:
+            names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(".json"))
+        except OSError:
+            return []
+        return [os.path.join(self.spool_dir, n) for n in names]
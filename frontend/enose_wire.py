@@ -0,0 +1,78 @@
+# enose_wire.py
+# Format biner kolom untuk /api/data (negosiasi lewat header Accept) - decode langsung ke NumPy
+#
+# Layout v1, little-endian, satu blok per kolom (n = jumlah paket):
+#   0   4s   magic b"ENC1"
+#   4   u32  n
+#   8   u64  timestamp[n]                (ms)
+#       f32  no2[n] eth_gm[n] voc_gm[n] co_gm[n] co_m[n] eth_m[n] voc_m[n]
+#       i8   current_state[n]
+#       i8   current_level[n]
+# Total 8 + 38 n byte (JSON: ~250 byte per paket). Field "sample" tidak dikirim.
+import struct
+
+import numpy as np
+
+from enose_buffer import CHANNELS
+
+WIRE_CONTENT_TYPE = "application/x-enose-columns"
+WIRE_MAGIC = b"ENC1"
+HEADER = struct.Struct("<4sI")
+WIRE_COLUMNS = ([("timestamp", "<u8")] + [(name, "<f4") for name in CHANNELS]
+                + [("state", "i1"), ("level", "i1")])
+
+
+class WireFormatError(ValueError):
+    """Payload is not a valid ENC1 column block"""
+
+
+def wire_size(n):
+    return HEADER.size + n * sum(np.dtype(dtype).itemsize for _, dtype in WIRE_COLUMNS)
+
+
+def decode_columns(payload):
+    """ENC1 bytes -> dict of column arrays (read_csv / SessionRecorder layout).
+
+    Channel/state/level adalah view read-only ke `payload` (zero-copy); timestamp
+    disalin ke int64 karena kolom lain (dedup, recorder) mengharapkan dtype itu.
+    """
+    if len(payload) < HEADER.size:
+        raise WireFormatError("payload shorter than header")
+    magic, n = HEADER.unpack_from(payload)
+    if magic != WIRE_MAGIC:
+        raise WireFormatError(f"bad magic {magic!r}")
+    if len(payload) != wire_size(n):
+        raise WireFormatError(f"expected {wire_size(n)} bytes for {n} rows, got {len(payload)}")
+    columns = {}
+    offset = HEADER.size
+    for name, dtype in WIRE_COLUMNS:
+        columns[name] = np.frombuffer(payload, dtype=dtype, count=n, offset=offset)
+        offset += n * columns[name].itemsize
+    columns["timestamp"] = columns["timestamp"].astype(np.int64)
+    return columns
+
+
+def encode_columns(columns):
+    """Inverse of decode_columns (the Rust backend does the same; used by the mock backend)"""
+    n = len(columns["timestamp"])
+    parts = [HEADER.pack(WIRE_MAGIC, n)]
+    parts += [np.asarray(columns[name], dtype=dtype).tobytes() for name, dtype in WIRE_COLUMNS]
+    return b"".join(parts)
+
+
+def packets_to_columns(packets):
+    """JSON SensorPacket dicts -> column dict (mock backend encoding, tests)"""
+    columns = {"timestamp": np.array([p.get("timestamp", 0) for p in packets], dtype=np.int64)}
+    for name in CHANNELS:
+        columns[name] = np.array([p.get(name, 0) for p in packets], dtype=np.float64)
+    columns["state"] = np.array([p.get("current_state", 0) for p in packets], dtype=np.int8)
+    columns["level"] = np.array([p.get("current_level", 0) for p in packets], dtype=np.int8)
+    return columns
+
+
+def column_packet(columns, index=-1):
+    """One row of a column dict as a SensorPacket-style dict (latest-value labels, tiles)"""
+    packet = {name: float(columns[name][index]) for name in CHANNELS}
+    packet.update(timestamp=int(columns["timestamp"][index]), current_state=int(columns["state"][index]),
+                  current_level=int(columns["level"][index]))
+    return packet
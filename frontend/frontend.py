@@ -1,9 +1,12 @@
 # frontend.py
 import sys
-import requests
 import json
-import socket
+import os
+import threading
 import time
+_T0 = time.perf_counter()  # awal startup (laporan startup di MainWindow)
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # ==================== FRONTEND CONFIG ====================
@@ -19,96 +22,300 @@ EI_API_KEY = "ei_bf401cc81aec83ef5d47055abbb90a596ad1d26f1c5f4306"
 EI_PROJECT_ID = "819619"
 EI_HMAC_KEY = "5ac940e46d7acb60201701a7f6d3dff3"
 EI_DEVICE_ID = "enosev1"
+EI_WINDOW_SAMPLES = 40      # satu upload = maksimal 40 sampel...
+EI_WINDOW_SECONDS = 10.0    # ...atau 10 detik data, mana yang lebih dulu
+EI_SPOOL_DIR = "ei_spool"   # window yang gagal di-upload disimpan di sini untuk retry
+EI_INTERVAL_MS = 250        # jarak sampel tetap di EI; pembacaan (~250-500 ms, run dedup) di-resample ke grid ini
+
+# ==================== HTTP CLIENT CONFIG ====================
+HTTP_POOL_SIZE = 4      # koneksi keep-alive maksimum per host
+HTTP_RETRIES = 2        # retry untuk GET yang gagal (connect/read/5xx)
+HTTP_TIMEOUT = 5        # detik
+
+# ==================== RECORDER CONFIG ====================
+RECORDINGS_DIR = "recordings"  # satu subfolder per sesi rekaman
+REPLAY_CACHE_DIR = "replay_cache"  # salinan kolom biner dari CSV yang pernah dibuka
+REPLAY_SPEEDS = (1, 2, 5, 10, 50, 100, 1000)
+REPLAY_MAX_GAP_MS = 5000  # jeda lebih lama dari ini (antar file/sesi) dilompati saat play
+
+# ==================== RENDER CONFIG ====================
+POLL_INTERVAL_MS = 1000  # interval ingest dari backend
+STREAM_ENABLED = True              # push stream /api/stream; fallback ke polling jika tidak ada
+STREAM_STATUS_INTERVAL_MS = 2000   # saat stream aktif, timer hanya mengambil /api/status
+RENDER_FPS = 20          # refresh plot & label, independen dari interval poll
+WIRE_BINARY = True       # /api/data sebagai kolom biner (enose_wire); backend lama tetap dapat JSON
+PERF_REFRESH_MS = 1000   # refresh panel Performance (hanya saat panel terlihat)
+
+# ✅ BARU: Fast start - window tampil dulu, pyqtgraph/plot/tile device/cek backend menyusul
+# setelah paint pertama (False = urutan lama: semua dibuat di __init__, popup hasil koneksi)
+FAST_START = True
+
+# ✅ BARU: Multi-device - e-nose tambahan dipoll paralel, satu tile per device
+DEVICES_FILE = "devices.json"
+DEVICE_BUFFER_POINTS = 2000  # titik per device yang disimpan untuk plot tile
+DEVICE_TIMEOUT = 2           # detik; device yang tidak merespons tidak menahan device lain
+DEVICE_REFRESH_MS = 250      # redraw tile (hanya tile yang datanya berubah)
+DEVICE_TILE_COLUMNS = 4
+CURVE_COLORS = ('#ef4444', '#10b981', '#3b82f6', '#f59e0b', '#8b5cf6', '#ec4899', '#06b6d4')
+
+# ✅ BARU: Statistik online + alarm per channel (enose_stats), dihitung per batch ingest
+STATS_WINDOWS = (100, 1000)  # sampel; rolling min/max
+STATS_EWMA_ALPHA = 0.05      # baseline EWMA untuk z-score & laju perubahan
+ALARM_Z = 4.0                # |x - EWMA| > ALARM_Z * EW std -> warn
+ALARM_MIN_SAMPLES = 50       # z-score baru aktif setelah baseline cukup
+STUCK_SAMPLES = 200          # nilai identik berturut-turut -> sensor macet
+ALARM_THRESHOLDS = {}        # channel -> (low, high) ppm, None = tanpa batas; mis. {"no2": (None, 5.0)}
+ALARM_ANNOTATIONS = 50       # garis alarm maksimum di plot
+ALARM_COLORS = {"ok": None, "warn": "#b45309", "fault": "#6b21a8", "alarm": "#b91c1c"}
+
+# ✅ BARU: Kalibrasi baseline per channel dari fase IDLE/PURGE (enose_calibration), cache per device
+CALIBRATION_DIR = "calibration_cache"
+CALIBRATION_MODE = "off"  # "off" | "subtract" | "ratio"; berlaku untuk plot, replay, tile device, upload EI & export CSV
+
+# ✅ BARU: Supresi sampel duplikat (enose_dedup) - pembacaan yang dikirim ulang Arduino disimpan sebagai
+# run (nilai + rentang waktu) di buffer plot, tile device & upload EI; recorder & statistik tetap resolusi penuh
+DEDUP_EPSILON = {}           # channel -> toleransi ppm, mis. {"co_m": 0.002}; kosong = hanya nilai identik
+DEDUP_MAX_RUN_MS = 2000      # run lebih panjang dipecah, sensor macet tetap tergambar sampai sekarang
+EXPORT_COMPACT = False       # default checkbox export: CSV ditulis sebagai run (kolom run_count/run_end)
+
+# ✅ BARU: Protokol sampling terjadwal - satu folder per batch, satu CSV berlabel per run
+PROTOCOL_FILE = "protocol.json"      # dimuat otomatis saat startup jika ada
+PROTOCOL_RUNS_DIR = "protocol_runs"
+PROTOCOL_REFRESH_MS = 500
+
+# ✅ BARU: Klasifikasi lokal - dilatih dari CSV berlabel di folder aplikasi saat startup
+TRAINING_DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ✅ BARU: Mode headless (enose_daemon) - poller/recorder/uploader tanpa Qt, log JSON + /metrics lokal
+DAEMON_METRICS_PORT = 0      # 0 = port bebas (dicatat di log "started"), -1 = tanpa endpoint
+DAEMON_HEARTBEAT_S = 60.0
+
+# python frontend.py --headless [...]: dicek sebelum PyQt6/pyqtgraph di-import, jadi proses daemon
+# tidak memuat Qt sama sekali (banyak instance per mesin)
+def daemon_config():
+    """Constants read by enose_daemon.main (defaults for every --headless option)"""
+    return {
+        "RUST_IP": RUST_IP, "RUST_PORT": RUST_PORT, "POLL_INTERVAL_MS": POLL_INTERVAL_MS,
+        "HTTP_RETRIES": HTTP_RETRIES, "HTTP_TIMEOUT": HTTP_TIMEOUT, "WIRE_BINARY": WIRE_BINARY,
+        "RECORDINGS_DIR": RECORDINGS_DIR, "TRAINING_DATA_DIR": TRAINING_DATA_DIR,
+        "STATS_WINDOWS": STATS_WINDOWS, "STATS_EWMA_ALPHA": STATS_EWMA_ALPHA, "ALARM_Z": ALARM_Z,
+        "ALARM_MIN_SAMPLES": ALARM_MIN_SAMPLES, "STUCK_SAMPLES": STUCK_SAMPLES, "ALARM_THRESHOLDS": ALARM_THRESHOLDS,
+        "CALIBRATION_DIR": CALIBRATION_DIR, "CALIBRATION_MODE": CALIBRATION_MODE,
+        "DEDUP_EPSILON": DEDUP_EPSILON, "DEDUP_MAX_RUN_MS": DEDUP_MAX_RUN_MS,
+        "EI_API_KEY": EI_API_KEY, "EI_PROJECT_ID": EI_PROJECT_ID, "EI_DEVICE_ID": EI_DEVICE_ID,
+        "EI_WINDOW_SAMPLES": EI_WINDOW_SAMPLES, "EI_WINDOW_SECONDS": EI_WINDOW_SECONDS, "EI_SPOOL_DIR": EI_SPOOL_DIR,
+        "EI_INTERVAL_MS": EI_INTERVAL_MS,
+        "DAEMON_METRICS_PORT": DAEMON_METRICS_PORT, "DAEMON_HEARTBEAT_S": DAEMON_HEARTBEAT_S,
+    }
+
+
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    from enose_daemon import main as daemon_main
+    sys.exit(daemon_main(sys.argv[1:], daemon_config()))
 
 from PyQt6 import QtWidgets, QtCore, QtGui
 from PyQt6.QtCore import QTimer
-import pyqtgraph as pg
 
-class EdgeImpulseIntegration:
-    # ✅ PERBAIKAN 3: Hanya ada satu __init__
-    def __init__(self):
-        self.api_key = EI_API_KEY
-        self.project_id = EI_PROJECT_ID
-        
-        # Endpoint ingestion yang benar (menggunakan Device ID)
-        self.correct_endpoint = f"https://ingestion.edgeimpulse.com/v1/devices/{EI_DEVICE_ID}/data"
-
-        # List endpoint palsu (dipertahankan sesuai struktur kode asli)
-        self.endpoints = [
-            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/device-data",
-            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/training",
-            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/raw",
-            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/data",
-            f"https://ingestion.edgeimpulse.com/api/{self.project_id}/sensors"
-        ]
-        
-    def send_sensor_data(self, sensor_values):
-        """✅ PERBAIKAN 4: Menyederhanakan logika — cukup panggil sekali ke endpoint yang benar."""
-        return self._try_endpoint(self.correct_endpoint, sensor_values)
-
-    def _try_endpoint(self, endpoint, sensor_values):
-        """Metode ini sekarang menerima endpoint yang benar secara langsung."""
-        try:
-            real_endpoint = endpoint # real_endpoint sekarang sama dengan endpoint (self.correct_endpoint)
-
-            payload = {
-                "protected": {
-                    "ver": "v1",
-                    "alg": "none",
-                    "iat": int(time.time())
-                },
-                "signature": "0",
-                "payload": {
-                    "device_type": "ENose",
-                    "device_name": "e-nose-arduino-01",
-                    "interval_ms": 1000,
-                    "sensors": [
-                        "GMXXX_NO2", "GMXXX_Ethanol", "GMXXX_VOC", "GMXXX_CO",
-                        "MiCS5524_CO", "MiCS5524_Ethanol", "MiCS5524_VOC"
-                    ],
-                    # ✅ PERBAIKAN 5: Hapus kurung siku ganda pada values
-                    "values": sensor_values 
-                }
-            }
+import numpy as np
 
-            headers = {
-                "Content-Type": "application/json",
-                "x-api-key": self.api_key,
-                "x-file-name": "enose.json"
-            }
+from enose_buffer import CHANNELS, CHANNEL_LABELS, ChannelRingBuffer, minmax_decimate
+from enose_calibration import (AXIS_LABELS, CALIBRATION_MODES, BaselineEstimator, CalibrationCache, apply_calibration,
+                               calibrate_csv, calibrate_recording, device_key, replay_baseline)
+from enose_client import (HttpClient, PacketStream, DownloadCancelled,
+                          fetch_status, poll_backend, download_csv)
+from enose_classifier import class_display_name, train_default
+from enose_control import ArduinoChannel
+from enose_dedup import compact_csv, step_points
+from enose_devices import DeviceRegistry, MultiPoller
+from enose_core import STATE_NAMES, AcquisitionCore, describe_status
+from enose_features import FEATURE_NAMES
+from enose_index import Catalog, index_sessions, parse_query, replay_envelope
+from enose_protocol import ProtocolRunner, load_protocols
+from enose_stats import SEVERITY
+from enose_metrics import Metrics
+from enose_storage import SessionRecorder, ReplayDataset, open_cached
+from enose_upload import EdgeImpulseIntegration, EdgeImpulseUploader
+from enose_wire import column_packet
 
-            # Debug prints
-            print(f"➡️  Sending to real endpoint: {real_endpoint}")
-            
-            try:
-                response = requests.post(
-                    real_endpoint,
-                    json=payload,
-                    headers=headers,
-                    timeout=10
-                )
-            except requests.exceptions.RequestException as re:
-                print(f"❌ requests exception when posting to {real_endpoint}: {re}")
-                return False
+_T_IMPORTS = time.perf_counter()
+
+# pyqtgraph (~250 ms import) dimuat saat plot pertama dibuat, bukan saat startup
+pg = None
+
+
+def load_pyqtgraph():
+    global pg
+    if pg is None:
+        import pyqtgraph
+        pg = pyqtgraph
+    return pg
 
-            print(f"Response: {response.status_code} - {response.text}")
+# ==================== BACKGROUND I/O ENGINE ====================
+class IngestionEngine(QtCore.QObject):
+    """Runs every blocking network call on worker threads and hands results back via a Qt signal"""
+    _delivered = QtCore.pyqtSignal(object, object, object)  # (job, result, error)
 
-            if response.status_code in [200, 201]:
-                print(f"✅ SUCCESS sending data.")
-                return True
-            else:
-                print(f"❌ Failed with status: {response.status_code}")
+    def __init__(self, max_workers=4, parent=None):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enose-io")
+        self._lanes = {}
+        self._busy = set()
+        self._closed = False
+        self.pending = 0
+        # Signal dari worker thread otomatis di-queue ke GUI thread
+        self._delivered.connect(self._deliver)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, tag=None, lane=None, **kwargs):
+        """Run fn(*args, **kwargs) in the background; callbacks run on the GUI thread.
+
+        Job dengan `tag` yang masih berjalan tidak dijalankan dua kali (poll tidak menumpuk
+        saat backend lambat). Job dengan `lane` yang sama dijalankan berurutan (mis. command per device).
+        """
+        if self._closed:
+            return False
+        if tag is not None:
+            if tag in self._busy:
                 return False
-                
-        except Exception as e:
-            print(f"❌ Error during Edge Impulse API call: {e}")
+            self._busy.add(tag)
+
+        job = (tag, on_done, on_error)
+
+        def run():
+            try:
+                result, error = fn(*args, **kwargs), None
+            except Exception as e:
+                result, error = None, e
+            try:
+                self._delivered.emit(job, result, error)
+            except RuntimeError:
+                pass  # window sudah ditutup
+
+        executor = self._pool if lane is None else self._lane(lane)
+        self.pending += 1
+        executor.submit(run)
+        return True
+
+    def _lane(self, name):
+        if name not in self._lanes:
+            self._lanes[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"enose-{name}")
+        return self._lanes[name]
+
+    def _deliver(self, job, result, error):
+        tag, on_done, on_error = job
+        self.pending -= 1
+        self._busy.discard(tag)
+        if error is None:
+            if on_done is not None:
+                on_done(result)
+        elif on_error is not None:
+            on_error(error)
+        else:
+            print(f"❌ Background job failed: {error}")
+
+    def shutdown(self):
+        self._closed = True
+        for executor in [self._pool, *self._lanes.values()]:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+# ==================== DEVICE TILE ====================
+class DeviceTile(QtWidgets.QGroupBox):
+    """Status + mini plot for one registered device (only redrawn when its data changed)"""
+
+    def __init__(self, device, parent=None):
+        super().__init__(device.name, parent)
+        self.device = device
+        self.drawn_version = -1
+        self.alarm_level = "ok"
+        self.calibration_mode = "off"
+        layout = QtWidgets.QVBoxLayout(self)
+
+        self.status_label = QtWidgets.QLabel(f"⚪ {device.host}:{device.port}")
+        self.status_label.setStyleSheet("padding: 3px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
+        layout.addWidget(self.status_label)
+
+        self.plot = load_pyqtgraph().PlotWidget()
+        self.plot.setBackground('#0f172a')
+        self.plot.setMinimumHeight(140)
+        self.plot.showGrid(x=True, y=True, alpha=0.2)
+        self.plot.hideAxis('bottom')
+        self.plot.setToolTip(AXIS_LABELS[self.calibration_mode])
+        self.curves = [self.plot.plot(pen=pg.mkPen(color, width=1)) for color in CURVE_COLORS]
+        layout.addWidget(self.plot)
+
+        self.values_label = QtWidgets.QLabel("-")
+        self.values_label.setStyleSheet("color: #94a3b8; font-size: 10px;")
+        self.values_label.setWordWrap(True)
+        layout.addWidget(self.values_label)
+
+        buttons = QtWidgets.QHBoxLayout()
+        self.btn_start = QtWidgets.QPushButton("START")
+        self.btn_stop = QtWidgets.QPushButton("STOP")
+        self.btn_remove = QtWidgets.QPushButton("✖")
+        self.btn_start.setStyleSheet("background-color: #10b981;")
+        self.btn_stop.setStyleSheet("background-color: #ef4444;")
+        self.btn_remove.setStyleSheet("background-color: #475569;")
+        for button in (self.btn_start, self.btn_stop):
+            button.setEnabled(device.arduino_host is not None)
+        buttons.addWidget(self.btn_start)
+        buttons.addWidget(self.btn_stop)
+        buttons.addWidget(self.btn_remove)
+        layout.addLayout(buttons)
+
+    def set_calibration_mode(self, mode):
+        self.calibration_mode = mode
+        self.plot.setToolTip(AXIS_LABELS[mode])
+        self.drawn_version = -1
+
+    def refresh(self):
+        """Redraw from the device snapshot; returns False if nothing changed"""
+        if self.device.version == self.drawn_version:
             return False
+        self.drawn_version = self.device.version
+        xs, ys, info = self.device.snapshot(max(int(self.plot.width()), 50))
+        ys = apply_calibration(ys, info["baseline"], self.calibration_mode)
+        if xs.size:
+            for i, curve in enumerate(self.curves):
+                curve.setData(xs[i], ys[i])
+
+        status = info["status"]
+        state = status.get('current_state', 0)
+        state_name = STATE_NAMES[state] if 0 <= state < len(STATE_NAMES) else "UNKNOWN"
+        if info["connected"]:
+            icon = "🟢" if status.get('arduino_connected', False) else "🟡"
+            self.status_label.setText(f"{icon} {state_name} L{status.get('current_level', 0)} · "
+                                      f"{info['rate']:.1f}/s · RTT {info['rtt_ms']:.0f} ms")
+        else:
+            self.status_label.setText(f"🔴 offline ({info['failures']}x) · {info['last_error'] or ''}"[:80])
+
+        # Warna tile = alarm paling berat di channel mana pun
+        levels = info["alarm_levels"]
+        level = max(levels.values(), key=SEVERITY.index) if levels else "ok"
+        if level != self.alarm_level:
+            self.alarm_level = level
+            color = ALARM_COLORS[level] or "#071026"
+            self.status_label.setStyleSheet(f"padding: 3px; background-color: {color}; border-radius: 3px; color: #c7f0e1;")
+        active = [f"{key}:{lvl}" for key, lvl in levels.items() if lvl != "ok"]
+        self.status_label.setToolTip(f"Alarms raised: {info['alarms_raised']}\n" + (", ".join(active) or "no active alarm")
+                                     + f"\nDedup: {info['compaction']:.2f}× (rows per stored run)")
+        latest = info["latest"]
+        if latest:
+            self.values_label.setText(" ".join(f"{label.split()[0]}={float(latest.get(key, 0)):.2f}"
+                                               for key, label in zip(CHANNELS, CHANNEL_LABELS)))
+        return True
 
 # =====================================================
 
 class MainWindow(QtWidgets.QMainWindow):
+    # Progress export dikirim dari worker thread -> queued ke GUI thread
+    export_progress = QtCore.pyqtSignal(object, object)
+    stream_packets = QtCore.pyqtSignal(object)
+    stream_state = QtCore.pyqtSignal(str, object)
+    arduino_result = QtCore.pyqtSignal(object, object, object)  # (device name/None, callback, future)
+    arduino_state = QtCore.pyqtSignal(str, object)
+
     def __init__(self):
         super().__init__()
+        self._startup_marks = {"imports": _T_IMPORTS}
         self.setWindowTitle("E-NOSE Monitor - Direct Arduino Control + Edge Impulse")
         self.resize(1400, 900)
         
@@ -196,21 +403,59 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_stop = QtWidgets.QPushButton("⏹ STOP MONITOR") 
         self.btn_status = QtWidgets.QPushButton("📊 GET STATUS")
         self.btn_export = QtWidgets.QPushButton("💾 EXPORT CSV")
+        self.btn_export_ts = QtWidgets.QPushButton("💾 EXPORT TIMESERIES")
+        self.btn_cancel_export = QtWidgets.QPushButton("✖ Cancel Export")
+        self.export_bar = QtWidgets.QProgressBar()
+        self.export_bar.setTextVisible(True)
+        self.export_bar.setFormat("Export: idle")
+        self.export_bar.setValue(0)
+        self.export_compact_check = QtWidgets.QCheckBox("Compact duplicates (RLE)")
+        self.export_compact_check.setChecked(EXPORT_COMPACT)
+        self.export_compact_check.setToolTip("Write repeated readings once, with run_count/run_end columns\n"
+                                             "(replay & batch expand them back to full resolution)")
         
         self.btn_start.setStyleSheet("background-color: #10b981;")
         self.btn_stop.setStyleSheet("background-color: #ef4444;")
         self.btn_status.setStyleSheet("background-color: #3b82f6;")
         self.btn_export.setStyleSheet("background-color: #f59e0b;")
+        self.btn_export_ts.setStyleSheet("background-color: #f59e0b;")
+        self.btn_cancel_export.setStyleSheet("background-color: #ef4444;")
+        self.btn_cancel_export.setEnabled(False)
         
         self.btn_start.clicked.connect(self.start_monitoring)
         self.btn_stop.clicked.connect(self.stop_monitoring)
         self.btn_status.clicked.connect(self.get_status)
         self.btn_export.clicked.connect(self.export_csv)
+        self.btn_export_ts.clicked.connect(self.export_timeseries_csv)
+        self.btn_cancel_export.clicked.connect(self.cancel_export)
         
         button_layout.addWidget(self.btn_start, 0, 0)
         button_layout.addWidget(self.btn_stop, 0, 1)
         button_layout.addWidget(self.btn_status, 1, 0)
         button_layout.addWidget(self.btn_export, 1, 1)
+        button_layout.addWidget(self.btn_export_ts, 2, 0)
+        button_layout.addWidget(self.btn_cancel_export, 2, 1)
+        button_layout.addWidget(self.export_bar, 3, 0, 1, 2)
+        button_layout.addWidget(self.export_compact_check, 4, 0, 1, 2)
+        
+        # ✅ BARU: Rekam semua paket yang di-ingest ke disk (format kolom biner)
+        self.btn_record = QtWidgets.QPushButton("⏺ RECORD")
+        self.btn_record.setCheckable(True)
+        self.btn_record.setStyleSheet("background-color: #be123c;")
+        self.btn_record.toggled.connect(self.toggle_recording)
+        self.record_label = QtWidgets.QLabel("Recorder: off")
+        self.record_label.setStyleSheet("padding: 4px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
+        button_layout.addWidget(self.btn_record, 4, 0)
+        button_layout.addWidget(self.record_label, 4, 1)
+        
+        # ✅ BARU: Push stream (satu koneksi panjang) atau polling
+        self.stream_check = QtWidgets.QCheckBox("Push stream")
+        self.stream_check.setChecked(STREAM_ENABLED)
+        self.stream_check.setStyleSheet("color: #e2e8f0;")
+        self.ingest_mode_label = QtWidgets.QLabel("Ingest: -")
+        self.ingest_mode_label.setStyleSheet("padding: 4px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
+        button_layout.addWidget(self.stream_check, 5, 0)
+        button_layout.addWidget(self.ingest_mode_label, 5, 1)
         controls_layout.addWidget(button_group)
 
         # ✅ Sampling Control Section
@@ -221,6 +466,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_stop_sampling = QtWidgets.QPushButton("STOP")
         self.sampling_status = QtWidgets.QLabel("Status: IDLE")
         self.actuator_status = QtWidgets.QLabel("Actuator: -")
+        self.arduino_link_label = QtWidgets.QLabel(f"Link: idle ({ARDUINO_IP}:{ARDUINO_PORT})")
+        self.arduino_link_label.setStyleSheet("color: #94a3b8; font-size: 10px;")
         
         self.btn_start_sampling.setStyleSheet("background-color: #10b981; font-weight: bold;")
         self.btn_stop_sampling.setStyleSheet("background-color: #ef4444; font-weight: bold;")
@@ -234,8 +481,27 @@ class MainWindow(QtWidgets.QMainWindow):
         sampling_layout.addWidget(self.btn_stop_sampling, 0, 1)
         sampling_layout.addWidget(self.sampling_status, 1, 0)
         sampling_layout.addWidget(self.actuator_status, 1, 1)
+        sampling_layout.addWidget(self.arduino_link_label, 2, 0, 1, 2)
         controls_layout.addWidget(sampling_group)
 
+        # ✅ BARU: Protocol scheduler (Arduino + file run berlabel, tanpa operator)
+        protocol_group = QtWidgets.QGroupBox("Sampling Protocol")
+        protocol_layout = QtWidgets.QGridLayout(protocol_group)
+        self.btn_load_protocol = QtWidgets.QPushButton("📋 Load Protocol")
+        self.btn_run_protocol = QtWidgets.QPushButton("▶ RUN PROTOCOL")
+        self.btn_run_protocol.setCheckable(True)
+        self.btn_run_protocol.setEnabled(False)
+        self.btn_run_protocol.setStyleSheet("background-color: #0e7490; font-weight: bold;")
+        self.protocol_label = QtWidgets.QLabel("Protocol: none loaded")
+        self.protocol_label.setStyleSheet("color: #94a3b8; font-size: 10px;")
+        self.protocol_label.setWordWrap(True)
+        self.btn_load_protocol.clicked.connect(self.choose_protocol)
+        self.btn_run_protocol.toggled.connect(self.toggle_protocol)
+        protocol_layout.addWidget(self.btn_load_protocol, 0, 0)
+        protocol_layout.addWidget(self.btn_run_protocol, 0, 1)
+        protocol_layout.addWidget(self.protocol_label, 1, 0, 1, 2)
+        controls_layout.addWidget(protocol_group)
+
         # ✅ Edge Impulse Section
         ei_group = QtWidgets.QGroupBox("Edge Impulse Integration")
         ei_layout = QtWidgets.QGridLayout(ei_group)
@@ -244,7 +510,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_disable_ei = QtWidgets.QPushButton("Disable EI")
         self.btn_test_ei = QtWidgets.QPushButton("🧪 Test EI")
         self.ei_status = QtWidgets.QLabel("Status: DISABLED")
-        self.ei_count = QtWidgets.QLabel("Data Sent: 0")
+        self.ei_count = QtWidgets.QLabel("Sent: 0 samples")
         
         self.btn_enable_ei.setStyleSheet("background-color: #10b981;")
         self.btn_disable_ei.setStyleSheet("background-color: #ef4444;")
@@ -315,25 +581,313 @@ class MainWindow(QtWidgets.QMainWindow):
         self.elapsed_label = QtWidgets.QLabel("Elapsed: 00:00")
         self.step_label = QtWidgets.QLabel("Current Step: -")
         self.progress_label = QtWidgets.QLabel("Progress: 0%")
+        self.cycle_label = QtWidgets.QLabel("Last Cycle: -")
+        self.odor_label = QtWidgets.QLabel("Odor: model loading...")
         
-        time_labels = [self.elapsed_label, self.step_label, self.progress_label]
+        time_labels = [self.elapsed_label, self.step_label, self.progress_label, self.cycle_label]
         for label in time_labels:
             label.setStyleSheet("padding: 4px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
         
         time_layout.addWidget(self.elapsed_label)
         time_layout.addWidget(self.step_label)
         time_layout.addWidget(self.progress_label)
+        time_layout.addWidget(self.cycle_label)
+        self.odor_label.setStyleSheet("padding: 6px; background-color: #071026; border-radius: 3px; "
+                                      "color: #fbbf24; font-weight: bold; font-size: 13px;")
+        time_layout.addWidget(self.odor_label)
         values_layout.addWidget(time_group)
         layout.addLayout(values_layout)
 
         # Plot Area
         plot_group = QtWidgets.QGroupBox("Real-time Sensor Data")
         plot_layout = QtWidgets.QVBoxLayout(plot_group)
+        # Plot dibuat di build_plot() (setelah paint pertama jika FAST_START), sampai itu placeholder
+        self.combined_plot = None
+        self.curves = []
+        self.plot_layout = plot_layout
+        self.plot_placeholder = QtWidgets.QLabel("Loading plot…")
+        self.plot_placeholder.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.plot_placeholder.setMinimumHeight(300)
+        self.plot_placeholder.setStyleSheet("background-color: #0f172a; color: #64748b;")
+        
+        # Plot window size (jumlah titik yang disimpan untuk plot)
+        window_layout = QtWidgets.QHBoxLayout()
+        window_layout.addWidget(QtWidgets.QLabel("Plot Window (points):"))
+        self.window_spin = QtWidgets.QSpinBox()
+        self.window_spin.setRange(100, 1_000_000)
+        self.window_spin.setSingleStep(500)
+        self.window_spin.setValue(500)
+        self.window_spin.valueChanged.connect(self.set_max_data_points)
+        window_layout.addWidget(self.window_spin)
+        
+        # Poll rate dan FPS render diatur terpisah
+        window_layout.addWidget(QtWidgets.QLabel("Poll (ms):"))
+        self.poll_spin = QtWidgets.QSpinBox()
+        self.poll_spin.setRange(50, 10_000)
+        self.poll_spin.setSingleStep(50)
+        self.poll_spin.setValue(POLL_INTERVAL_MS)
+        self.poll_spin.valueChanged.connect(self.set_poll_interval)
+        window_layout.addWidget(self.poll_spin)
+        
+        window_layout.addWidget(QtWidgets.QLabel("Render FPS:"))
+        self.fps_spin = QtWidgets.QSpinBox()
+        self.fps_spin.setRange(1, 120)
+        self.fps_spin.setValue(RENDER_FPS)
+        self.fps_spin.valueChanged.connect(self.set_render_fps)
+        window_layout.addWidget(self.fps_spin)
+        
+        # Koreksi baseline (IDLE/PURGE) untuk plot; nilai di label tetap mentah
+        window_layout.addWidget(QtWidgets.QLabel("Baseline:"))
+        self.calibration_combo = QtWidgets.QComboBox()
+        self.calibration_combo.addItems(CALIBRATION_MODES)
+        self.calibration_combo.setCurrentText(CALIBRATION_MODE)
+        self.calibration_combo.setToolTip(f"Plot, EI & export: {AXIS_LABELS[CALIBRATION_MODE]}\n"
+                                          "Baseline: waiting for IDLE/PURGE data")
+        self.calibration_combo.currentTextChanged.connect(self.set_calibration_mode)
+        window_layout.addWidget(self.calibration_combo)
+        window_layout.addStretch()
+        
+        # Rasio kompaksi duplikat (baris masuk / run tersimpan), diupdate tiap batch ingest
+        self.dedup_label = QtWidgets.QLabel("Dedup: -")
+        self.dedup_label.setStyleSheet("padding: 4px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
+        window_layout.addWidget(self.dedup_label)
+        
+        self.frame_label = QtWidgets.QLabel("Frame: - ms")
+        self.frame_label.setStyleSheet("padding: 4px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
+        window_layout.addWidget(self.frame_label)
+        self.btn_perf = QtWidgets.QPushButton("📊 Performance")
+        self.btn_perf.setCheckable(True)
+        window_layout.addWidget(self.btn_perf)
+        self.btn_devices = QtWidgets.QPushButton("🛰 Devices")
+        self.btn_devices.setCheckable(True)
+        window_layout.addWidget(self.btn_devices)
+        plot_layout.addLayout(window_layout)
+        
+        plot_layout.addWidget(self.plot_placeholder)
+        
+        # ✅ BARU: Replay offline (CSV dataset / rekaman) lewat plot yang sama
+        replay_layout = QtWidgets.QHBoxLayout()
+        self.btn_open_replay = QtWidgets.QPushButton("📂 Open Replay")
+        self.btn_play_replay = QtWidgets.QPushButton("▶ Play")
+        self.btn_play_replay.setCheckable(True)
+        self.btn_live = QtWidgets.QPushButton("📡 Live")
+        self.replay_speed_combo = QtWidgets.QComboBox()
+        self.replay_speed_combo.addItems([f"{speed}×" for speed in REPLAY_SPEEDS])
+        self.replay_slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.replay_label = QtWidgets.QLabel("Mode: LIVE")
+        self.replay_label.setStyleSheet("padding: 4px; background-color: #071026; border-radius: 3px; color: #c7f0e1;")
+        # ✅ BARU: Query fase lewat indeks (enose_index): lompat ke fase berikutnya / export semua yang cocok
+        self.replay_query = QtWidgets.QLineEdit()
+        self.replay_query.setPlaceholderText("Query: label=kecil_merah state=HOLD level=2 from=2025-12-11T12:00 to=...")
+        self.btn_query_next = QtWidgets.QPushButton("🔎 Next Match")
+        self.btn_query_export = QtWidgets.QPushButton("💾 Export Matches")
+        for widget in (self.btn_play_replay, self.btn_live, self.replay_speed_combo, self.replay_slider,
+                       self.replay_query, self.btn_query_next, self.btn_query_export):
+            widget.setEnabled(False)
+        
+        self.btn_open_replay.clicked.connect(self.open_replay)
+        self.btn_play_replay.toggled.connect(self.toggle_replay_playback)
+        self.btn_live.clicked.connect(self.close_replay)
+        self.replay_slider.valueChanged.connect(self._on_replay_slider)
+        self.replay_query.returnPressed.connect(self.find_next_replay_match)
+        self.btn_query_next.clicked.connect(self.find_next_replay_match)
+        self.btn_query_export.clicked.connect(self.export_replay_matches)
+        
+        replay_layout.addWidget(self.btn_open_replay)
+        replay_layout.addWidget(self.btn_play_replay)
+        replay_layout.addWidget(self.replay_speed_combo)
+        replay_layout.addWidget(self.replay_slider, 1)
+        replay_layout.addWidget(self.replay_label)
+        replay_layout.addWidget(self.btn_live)
+        plot_layout.addLayout(replay_layout)
+        query_layout = QtWidgets.QHBoxLayout()
+        query_layout.addWidget(self.replay_query, 1)
+        query_layout.addWidget(self.btn_query_next)
+        query_layout.addWidget(self.btn_query_export)
+        plot_layout.addLayout(query_layout)
+        layout.addWidget(plot_group)
+
+        # Data buffers: satu ring buffer NumPy (7 channel x max_data_points)
+        self.data_count = 0
+        self.max_data_points = 500
+        self.plot_buffer = ChannelRingBuffer(len(CHANNELS), self.max_data_points)
+        self.monitoring_active = False
+        self.poll_interval_ms = POLL_INTERVAL_MS
+
+        # ✅ BARU: Render scheduler - ingest hanya menulis buffer + dirty flag,
+        # render_timer yang menggambar ulang curve/label yang berubah
+        self.value_labels = dict(zip(CHANNELS, [
+            self.no2_label, self.eth_gm_label, self.voc_gm_label, self.co_gm_label,
+            self.co_mics_label, self.eth_mics_label, self.voc_mics_label]))
+        for label in self.value_labels.values():
+            label.setStyleSheet("font-weight: bold; color: #e2e8f0; font-size: 12px;")
+        self._latest_values = {}
+        self._dirty_labels = set()
+        self._dirty_curves = set()
+        self.render_fps = RENDER_FPS
+        self.frame_time_ms = 0.0
+        self.render_timer = QTimer()
+        self.render_timer.timeout.connect(self.render_frame)
+        self.render_timer.start(int(1000 / self.render_fps))
+
+        # ✅ BARU: Inti ingest tanpa Qt (enose_core, sama dengan mode --headless): recorder, siklus +
+        # klasifikasi, statistik, kalibrasi, upload EI & protokol. MainWindow hanya menampilkan hasilnya
+        self.metrics = Metrics()
+        self.core = AcquisitionCore(self.metrics, self.stats_options(), CalibrationCache(CALIBRATION_DIR),
+                                    CALIBRATION_MODE, self.dedup_options())
+        # ✅ BARU: Cursor incremental untuk /api/data
+        self.data_cursor = self.core.cursor
+
+        # ✅ BARU: Statistik online per channel (core.stats); alarm -> warna label + garis di plot (saat render)
+        self._alarm_levels = {key: "ok" for key in CHANNELS}
+        self._alarm_styles_dirty = False
+        self._pending_alarms = deque(maxlen=ALARM_ANNOTATIONS)  # (x, event) belum digambar
+        self.alarm_annotations = deque()
+
+        # ✅ BARU: Baseline per channel dari baris IDLE/PURGE (core.calibration, cache per device).
+        # Buffer tetap berisi data mentah; koreksi diterapkan saat render (setelah decimation)
+        self.replay_calibration = {}     # reader.path -> BaselineEstimator (dihitung di worker)
+        # ✅ BARU: Piramida min/max per chunk + indeks fase per file replay (enose_index, dibangun di worker)
+        self.replay_index = {}           # reader.path -> SessionIndex
+        self._replay_catalog = None
+        
+        # Timer for periodic updates
+        self.update_timer = QTimer()
+        self.update_timer.timeout.connect(self.poll_sensor_data)
+        
+        self.elapsed_timer = QTimer()
+        self.elapsed_timer.timeout.connect(self.update_elapsed_time)
+        self.elapsed_time = 0
+
+        # ✅ BARU: Semua I/O jaringan berjalan di background, lewat satu pool koneksi keep-alive
+        self.engine = IngestionEngine(parent=self)
+        # ✅ BARU: Histogram/counter hot path (self.metrics), ditampilkan di panel Performance (dock)
+        self._ingest_pending_since = None  # perf_counter paket pertama yang belum tergambar
+        self._newest_sensor_ts = None
+        self._perf_last = (time.perf_counter(), 0)
+        self.perf_dock = self.create_performance_dock()
+        self.btn_perf.toggled.connect(self.perf_dock.setVisible)
+        self.perf_dock.visibilityChanged.connect(self.btn_perf.setChecked)
+        self.perf_timer = QTimer()
+        self.perf_timer.timeout.connect(self.update_performance_panel)
+        self.perf_timer.start(PERF_REFRESH_MS)
+
+        # ✅ BARU: Device registry + poller paralel (parse & buffer di worker thread,
+        # GUI thread hanya menggambar tile yang berubah)
+        self.device_registry = DeviceRegistry(DEVICES_FILE, capacity=DEVICE_BUFFER_POINTS,
+                                              timeout=DEVICE_TIMEOUT, stats_options=self.stats_options(),
+                                              calibration=self.core.calibration_cache,
+                                              dedup_options=self.dedup_options())
+        try:
+            self.device_registry.load()
+        except (OSError, ValueError, TypeError) as e:
+            print(f"❌ Failed to load {DEVICES_FILE}: {e}")
+        self.device_poller = MultiPoller(self.device_registry, interval=self.poll_interval_ms / 1000,
+                                         max_workers=max(16, len(self.device_registry)), metrics=self.metrics)
+        self.device_tiles = {}
+        self.devices_dock = self.create_devices_dock()
+        self.btn_devices.toggled.connect(self.devices_dock.setVisible)
+        self.devices_dock.visibilityChanged.connect(self.btn_devices.setChecked)
+        self.device_timer = QTimer()
+        self.device_timer.timeout.connect(self.refresh_device_tiles)
+        self.device_timer.start(DEVICE_REFRESH_MS)
+        self.http = HttpClient(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, timeout=HTTP_TIMEOUT)
+
+        # ✅ BARU: Arduino Direct Control - satu koneksi persisten, command di-pipeline & di-ack.
+        # Thread channel -> signal -> GUI thread; koneksi dibuka saat command pertama
+        self.arduino = ArduinoChannel(ARDUINO_IP, ARDUINO_PORT, on_state=self._emit_arduino_state)
+        self.arduino_last_rtt = None
+        self.arduino_result.connect(self._on_arduino_result)
+        self.arduino_state.connect(self._on_arduino_state)
+
+        # ✅ BARU: Edge Impulse Integration (dibuat saat pertama dipakai, lihat property edge_impulse)
+        self._edge_impulse = None
+        # ✅ BARU: Fitur per siklus (core.cycle_tracker) diklasifikasi lokal saat siklus selesai
+        self.engine.submit(train_default, TRAINING_DATA_DIR, tag="train_classifier",
+                           on_done=self._on_classifier_trained, on_error=self._on_classifier_failed)
+
+        # ✅ BARU: Protocol scheduler - timing di thread runner, GUI hanya membaca progress
+        self.protocols = None
+        self.protocol_timer = QTimer()
+        self.protocol_timer.timeout.connect(self.refresh_protocol_status)
+        if os.path.exists(PROTOCOL_FILE):
+            self.load_protocol(PROTOCOL_FILE)
+
+        # ✅ BARU: Replay mode - plot menampilkan dataset offline, ingest live tetap berjalan
+        self.replay = None
+        self.replay_pos = 0
+        self.replay_timer = QTimer()
+        self.replay_timer.timeout.connect(self.advance_replay)
+        self._replay_clock = 0.0
+        self._replay_time = 0.0  # posisi play dalam waktu dataset (ms)
+
+        # ✅ BARU: Push stream - thread PacketStream -> signal -> GUI thread
+        self.stream = None
+        self.stream_packets.connect(self._on_stream_packets)
+        self.stream_state.connect(self._on_stream_state)
+
+        # ✅ BARU: Export streaming (progress + cancel)
+        self._export_cancel = None
+        self.export_progress.connect(self._on_export_progress)
+
+        self.ei_enabled = False  # core.ei_uploader dibuat saat EI di-enable
+
+        # Statistik uploader (throughput, antrian, kegagalan) di panel EI
+        self.ei_stats_timer = QTimer()
+        self.ei_stats_timer.timeout.connect(self.update_ei_stats)
+
+        # Startup: sisa pekerjaan berat menunggu paint pertama (paintEvent -> finish_startup)
+        self._startup_done = False
+        if not FAST_START:
+            self.build_plot()
+            for device in self.device_registry:
+                self._add_device_tile(device)
+            # Test connection on startup
+            QtCore.QTimer.singleShot(1000, self.test_connection)
+        self._mark_startup("window_built")
+
+    # ==================== STARTUP ====================
+    def _mark_startup(self, name):
+        self._startup_marks[name] = time.perf_counter()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if "first_paint" not in self._startup_marks:
+            self._mark_startup("first_paint")
+            QtCore.QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Deferred startup, runs once the window is on screen: plot, device tiles, backend probe"""
+        if self._startup_done:
+            return
+        self._startup_done = True
+        self.build_plot()
+        for device in self.device_registry:
+            if device.name not in self.device_tiles:
+                self._add_device_tile(device)
+        self._mark_startup("plot_ready")
+        if FAST_START:
+            self.probe_backend()
+        # Plot baru tergambar di putaran event loop berikutnya
+        QtCore.QTimer.singleShot(0, self._report_startup)
+
+    def _report_startup(self):
+        self._mark_startup("first_frame")
+        marks = {name: (t - _T0) * 1000 for name, t in self._startup_marks.items()}
+        for name, value in marks.items():
+            self.metrics.gauge(f"startup.{name}_ms", value)
+        print("⏱ Startup: " + " · ".join(f"{name} {value:.0f} ms" for name, value in marks.items()))
+
+    def build_plot(self):
+        """Create the live plot (pyqtgraph) in place of the placeholder; no-op when it exists"""
+        if self.combined_plot is not None:
+            return
+        pg = load_pyqtgraph()
         self.combined_plot = pg.PlotWidget()
         # background dark to match theme
         self.combined_plot.setBackground('#0f172a')
         self.combined_plot.addLegend(offset=(10, 10))
-        self.combined_plot.setLabel('left', 'Concentration (ppm)', color='#e2e8f0')
+        self.combined_plot.setLabel('left', AXIS_LABELS[self.core.calibration_mode], color='#e2e8f0')
         self.combined_plot.setLabel('bottom', 'Time (samples)', color='#e2e8f0')
         self.combined_plot.showGrid(x=True, y=True, alpha=0.3)
         
@@ -345,42 +899,229 @@ class MainWindow(QtWidgets.QMainWindow):
         self.curve_co_mics = self.combined_plot.plot(pen=pg.mkPen('#8b5cf6', width=2), name="CO MiCS")
         self.curve_eth_mics = self.combined_plot.plot(pen=pg.mkPen('#ec4899', width=2), name="Ethanol MiCS")
         self.curve_voc_mics = self.combined_plot.plot(pen=pg.mkPen('#06b6d4', width=2), name="VOC MiCS")
-        
-        plot_layout.addWidget(self.combined_plot)
-        layout.addWidget(plot_group)
+        # Urutan sama dengan CHANNELS (baris ring buffer)
+        self.curves = [self.curve_no2, self.curve_eth_gm, self.curve_voc_gm, self.curve_co_gm,
+                       self.curve_co_mics, self.curve_eth_mics, self.curve_voc_mics]
+        self.plot_layout.replaceWidget(self.plot_placeholder, self.combined_plot)
+        self.plot_placeholder.deleteLater()
+        self.plot_placeholder = None
 
-        # Data buffers
-        self.timestamps = []
-        self.no2_data = []
-        self.eth_gm_data = []
-        self.voc_gm_data = []
-        self.co_gm_data = []
-        self.co_mics_data = []
-        self.eth_mics_data = []
-        self.voc_mics_data = []
-        
-        self.data_count = 0
-        self.max_data_points = 500
-        self.monitoring_active = False
-        
-        # Timer for periodic updates
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.poll_sensor_data)
-        
-        self.elapsed_timer = QTimer()
-        self.elapsed_timer.timeout.connect(self.update_elapsed_time)
-        self.elapsed_time = 0
+        # ✅ BARU: Decimation min/max dihitung ulang saat zoom/pan atau resize plot
+        view_box = self.combined_plot.getViewBox()
+        view_box.sigXRangeChanged.connect(self._on_plot_range_changed)
+        view_box.sigResized.connect(self._mark_curves_dirty)
+        self._mark_curves_dirty()
 
-        # ✅ BARU: Arduino Direct Control
-        self.arduino_socket = None
+    @property
+    def edge_impulse(self):
+        if self._edge_impulse is None:
+            self._edge_impulse = EdgeImpulseIntegration(EI_API_KEY, EI_PROJECT_ID, EI_DEVICE_ID, self.http)
+        return self._edge_impulse
 
-        # ✅ BARU: Edge Impulse Integration
-        self.edge_impulse = EdgeImpulseIntegration()
-        self.ei_enabled = False
-        self.ei_data_count = 0
+    def create_performance_dock(self):
+        """Dockable panel with latency percentiles, rates and queue depths (hidden by default)"""
+        dock = QtWidgets.QDockWidget("Performance", self)
+        dock.setObjectName("performance_dock")
+        panel = QtWidgets.QWidget()
+        panel_layout = QtWidgets.QVBoxLayout(panel)
+
+        self.perf_summary = QtWidgets.QLabel("-")
+        self.perf_summary.setStyleSheet("padding: 6px; background-color: #071026; border-radius: 3px; "
+                                        "color: #c7f0e1; font-family: Consolas, monospace;")
+        panel_layout.addWidget(self.perf_summary)
+
+        self.perf_table = QtWidgets.QTableWidget(0, 6)
+        self.perf_table.setHorizontalHeaderLabels(["Metric (ms)", "count", "p50", "p90", "p99", "max"])
+        self.perf_table.verticalHeader().setVisible(False)
+        self.perf_table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.perf_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        panel_layout.addWidget(self.perf_table, 1)
+
+        self.perf_counters = QtWidgets.QLabel("-")
+        self.perf_counters.setWordWrap(True)
+        self.perf_counters.setStyleSheet("color: #94a3b8; font-family: Consolas, monospace;")
+        panel_layout.addWidget(self.perf_counters)
+
+        buttons = QtWidgets.QHBoxLayout()
+        btn_reset = QtWidgets.QPushButton("Reset")
+        btn_reset.clicked.connect(self.metrics.reset)
+        btn_export = QtWidgets.QPushButton("💾 Export Metrics")
+        btn_export.clicked.connect(self.export_metrics)
+        buttons.addWidget(btn_reset)
+        buttons.addWidget(btn_export)
+        panel_layout.addLayout(buttons)
+
+        dock.setWidget(panel)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, dock)
+        dock.hide()
+        return dock
+
+    def update_performance_panel(self):
+        """Refresh gauges every PERF_REFRESH_MS; the panel itself is only redrawn when visible"""
+        self.metrics.gauge("queue.engine_pending", self.engine.pending)
+        if self.core.ei_uploader is not None:
+            stats = self.core.ei_uploader.stats()
+            self.metrics.gauge("queue.ei_windows", stats["queued"])
+            self.metrics.gauge("queue.ei_spooled", stats["spooled"])
+        if self.core.recorder is not None:
+            self.metrics.gauge("recorder.rows", self.core.recorder.rows)
+        arduino = self.arduino.stats()
+        self.metrics.gauge("queue.arduino_queued", arduino["queued"])
+        self.metrics.gauge("queue.arduino_in_flight", arduino["in_flight"])
+        if not self.perf_dock.isVisible():
+            return
+
+        snapshot = self.metrics.snapshot()
+        histograms, counters, gauges = snapshot["histograms_ms"], snapshot["counters"], snapshot["gauges"]
+        now = time.perf_counter()
+        frames = counters.get("render.frames", 0)
+        last_time, last_frames = self._perf_last
+        fps = max(frames - last_frames, 0) / max(now - last_time, 1e-6)
+        self._perf_last = (now, frames)
+
+        def pct(name):
+            h = histograms.get(name, {})
+            return f"{h['p50']:.1f} / {h['p99']:.1f} ms" if h.get("count") else "-"
+
+        self.perf_summary.setText(
+            f"FPS: {fps:.1f} (target {self.render_fps})\n"
+            f"Sensor→pixel p50/p99: {pct('latency.sensor_to_pixel_ms')} (backend clock)\n"
+            f"Ingest→pixel p50/p99: {pct('latency.ingest_to_pixel_ms')}\n"
+            f"Poll RTT p50/p99: {pct('poll.rtt_ms')}\n"
+            f"Arduino RTT p50/p99: {pct('arduino.rtt_ms')} ({self.arduino.state})\n"
+            f"Queues: engine {gauges.get('queue.engine_pending', 0)} | "
+            f"EI {gauges.get('queue.ei_windows', 0)} + {gauges.get('queue.ei_spooled', 0)} spooled | "
+            f"Arduino {gauges.get('queue.arduino_queued', 0)} + {gauges.get('queue.arduino_in_flight', 0)} in flight")
+
+        self.perf_table.setRowCount(len(histograms))
+        for row, (name, h) in enumerate(histograms.items()):
+            cells = [name, str(h["count"])] + [f"{h.get(key, 0):.3f}" for key in ("p50", "p90", "p99", "max")]
+            for col, text in enumerate(cells):
+                self.perf_table.setItem(row, col, QtWidgets.QTableWidgetItem(text))
+        self.perf_counters.setText(" | ".join(f"{name}: {value}" for name, value in counters.items()) or "-")
+
+    def export_metrics(self):
+        """Dump histograms (with raw buckets), counters and gauges to a JSON file"""
+        filename = f"enose_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        try:
+            self.metrics.export(filename)
+            QtWidgets.QMessageBox.information(self, "Metrics Exported", f"Metrics exported to {filename}")
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, "Error", f"Failed to export metrics:\n{str(e)}")
+
+    # ✅ MULTI-DEVICE METHODS
+    def create_devices_dock(self):
+        """Dock with the device list editor and a grid of per-device tiles (hidden by default)"""
+        dock = QtWidgets.QDockWidget("Devices", self)
+        dock.setObjectName("devices_dock")
+        panel = QtWidgets.QWidget()
+        panel_layout = QtWidgets.QVBoxLayout(panel)
+
+        form = QtWidgets.QHBoxLayout()
+        self.device_name_edit = QtWidgets.QLineEdit()
+        self.device_name_edit.setPlaceholderText("name")
+        self.device_host_edit = QtWidgets.QLineEdit()
+        self.device_host_edit.setPlaceholderText("backend IP")
+        self.device_port_edit = QtWidgets.QLineEdit(str(RUST_PORT))
+        self.device_port_edit.setMaximumWidth(70)
+        self.device_arduino_edit = QtWidgets.QLineEdit()
+        self.device_arduino_edit.setPlaceholderText("Arduino IP:port (opsional)")
+        btn_add = QtWidgets.QPushButton("➕ Add")
+        btn_add.clicked.connect(self.add_device_from_form)
+        for widget in (self.device_name_edit, self.device_host_edit, self.device_port_edit,
+                       self.device_arduino_edit, btn_add):
+            form.addWidget(widget)
+        panel_layout.addLayout(form)
+
+        controls = QtWidgets.QHBoxLayout()
+        self.btn_poll_devices = QtWidgets.QPushButton("📡 Poll All Devices")
+        self.btn_poll_devices.setCheckable(True)
+        self.btn_poll_devices.setStyleSheet("background-color: #10b981;")
+        self.btn_poll_devices.toggled.connect(self.toggle_device_polling)
+        self.devices_summary = QtWidgets.QLabel("Devices: 0")
+        controls.addWidget(self.btn_poll_devices)
+        controls.addWidget(self.devices_summary, 1)
+        panel_layout.addLayout(controls)
 
-        # Test connection on startup
-        QtCore.QTimer.singleShot(1000, self.test_connection)
+        tiles = QtWidgets.QWidget()
+        self.device_grid = QtWidgets.QGridLayout(tiles)
+        scroll = QtWidgets.QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(tiles)
+        panel_layout.addWidget(scroll, 1)
+
+        dock.setWidget(panel)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.BottomDockWidgetArea, dock)
+        dock.hide()
+        return dock
+
+    def add_device_from_form(self):
+        arduino = self.device_arduino_edit.text().strip()
+        arduino_host, _, arduino_port = arduino.partition(":")
+        try:
+            device = self.device_registry.add(
+                self.device_name_edit.text().strip(), self.device_host_edit.text().strip(),
+                int(self.device_port_edit.text().strip() or RUST_PORT),
+                arduino_host or None, int(arduino_port or ARDUINO_PORT) if arduino_host else None)
+            self.device_registry.save()
+        except (ValueError, OSError) as e:
+            QtWidgets.QMessageBox.warning(self, "Devices", f"Cannot add device:\n{str(e)}")
+            return
+        self._add_device_tile(device)
+        self.device_name_edit.clear()
+
+    def _add_device_tile(self, device):
+        tile = DeviceTile(device)
+        tile.set_calibration_mode(self.core.calibration_mode)
+        tile.btn_start.clicked.connect(lambda: self.send_device_command(device, "START_SAMPLING"))
+        tile.btn_stop.clicked.connect(lambda: self.send_device_command(device, "STOP_SAMPLING"))
+        tile.btn_remove.clicked.connect(lambda: self.remove_device(device.name))
+        self.device_tiles[device.name] = tile
+        self._layout_device_tiles()
+
+    def _layout_device_tiles(self):
+        for i, tile in enumerate(self.device_tiles.values()):
+            self.device_grid.addWidget(tile, i // DEVICE_TILE_COLUMNS, i % DEVICE_TILE_COLUMNS)
+
+    def remove_device(self, name):
+        tile = self.device_tiles.pop(name, None)
+        if tile is not None:
+            self.device_grid.removeWidget(tile)
+            tile.deleteLater()
+        self.device_registry.remove(name)
+        self.device_registry.save()
+        self._layout_device_tiles()
+
+    def send_device_command(self, device, command):
+        """Arduino command for one device; each device has its own lane so a dead board blocks only itself"""
+        try:
+            future = device.send_arduino(command)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        future.add_done_callback(lambda f: self._emit_arduino_result(device.name, None, f))
+
+    def toggle_device_polling(self, enabled):
+        if enabled:
+            for device in self.device_registry:
+                device.reset()
+            self.device_poller.start()
+            self.btn_poll_devices.setText("⏹ Stop Polling Devices")
+        else:
+            self.device_poller.stop()
+            self.btn_poll_devices.setText("📡 Poll All Devices")
+
+    def refresh_device_tiles(self):
+        """Redraw tiles whose device got new data; skipped entirely while the dock is hidden"""
+        if not self.device_tiles or not self.devices_dock.isVisible():
+            return
+        start = time.perf_counter()
+        redrawn = sum(tile.refresh() for tile in self.device_tiles.values())
+        if redrawn:
+            self.metrics.observe("devices.refresh_ms", (time.perf_counter() - start) * 1000)
+        online = sum(device.connected for device in self.device_registry)
+        self.devices_summary.setText(f"Devices: {len(self.device_registry)} | online {online} | "
+                                     f"redrawn {redrawn}")
 
     def get_backend_url(self, endpoint=""):
         """Get backend URL for HTTP requests"""
@@ -391,30 +1132,46 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def test_connection(self):
         """Test connection to Rust backend via HTTP"""
-        try:
-            response = requests.get(self.get_backend_url("/api/status"), timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                self.connection_status.setText("🟢 Connected")
-                self.connection_status.setStyleSheet("font-weight: bold; padding: 4px 8px; background-color: #065f46; border-radius: 4px; color: #e2f7ef;")
-                self.update_status_display(data)
-                QtWidgets.QMessageBox.information(self, "Success", "Connected to Rust backend via HTTP API!")
-                return True
-        except Exception as e:
-            print(f"Connection test failed: {e}")
-        
+        self.engine.submit(fetch_status, self.http, self.get_backend_url(), tag="test_connection",
+                           on_done=self._on_connection_ok, on_error=self._on_connection_failed)
+
+    def probe_backend(self):
+        """Startup connection check in the background: status bar + console only, no dialog"""
+        self.engine.submit(fetch_status, self.http, self.get_backend_url(), tag="test_connection",
+                           on_done=lambda data: self._on_connection_ok(data, notify=False),
+                           on_error=lambda e: self._on_connection_failed(e, notify=False))
+
+    def _on_connection_ok(self, data, notify=True):
+        print(f"🟢 Backend reachable: {self.get_backend_url()}")
+        self.connection_status.setText("🟢 Connected")
+        self.connection_status.setStyleSheet("font-weight: bold; padding: 4px 8px; background-color: #065f46; border-radius: 4px; color: #e2f7ef;")
+        self.update_status_display(data)
+        if notify:
+            QtWidgets.QMessageBox.information(self, "Success", "Connected to Rust backend via HTTP API!")
+
+    def _on_connection_failed(self, e, notify=True):
+        print(f"Connection test failed: {e}")
         self.connection_status.setText("🔴 Disconnected")
         self.connection_status.setStyleSheet("font-weight: bold; padding: 4px 8px; background-color: #7f1d1d; border-radius: 4px; color: #fff;")
-        QtWidgets.QMessageBox.warning(self, "Connection Failed", 
-            f"Cannot connect to Rust backend!\n"
-            f"URL: {self.get_backend_url('/api/status')}\n"
-            f"Error: {str(e)}")
-        return False
+        if notify:
+            QtWidgets.QMessageBox.warning(self, "Connection Failed", 
+                f"Cannot connect to Rust backend!\n"
+                f"URL: {self.get_backend_url('/api/status')}\n"
+                f"Error: {str(e)}")
 
     def start_monitoring(self):
         """Start monitoring data from Rust backend"""
+        if self.monitoring_active:
+            return  # stream/timer kedua akan menggandakan setiap paket
         self.monitoring_active = True
-        self.update_timer.start(1000)  # Poll every 1 second
+        self.btn_start.setEnabled(False)
+        self.data_cursor.reset()
+        self.core.dedup.reset()  # rasio kompaksi per sesi monitoring
+        if self.stream_check.isChecked():
+            self.start_stream()
+        else:
+            self.ingest_mode_label.setText(f"Ingest: polling {self.poll_interval_ms} ms")
+        self.update_timer.start(STREAM_STATUS_INTERVAL_MS if self.stream else self.poll_interval_ms)
         self.elapsed_time = 0
         self.elapsed_timer.start(1000)
         QtWidgets.QMessageBox.information(self, "Monitoring Started", 
@@ -424,85 +1181,276 @@ class MainWindow(QtWidgets.QMainWindow):
     def stop_monitoring(self):
         """Stop monitoring data"""
         self.monitoring_active = False
+        self.btn_start.setEnabled(True)
         self.update_timer.stop()
+        self.stop_stream()
         self.elapsed_timer.stop()
+        print(f"📈 HTTP pool stats: {self.http.stats()}")
         QtWidgets.QMessageBox.information(self, "Monitoring Stopped", "Stopped monitoring data")
 
     def get_status(self):
         """Get status from Rust backend"""
-        try:
-            response = requests.get(self.get_backend_url("/api/status"), timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                status_text = f"""Backend Status:
+        self.engine.submit(fetch_status, self.http, self.get_backend_url(), tag="get_status",
+                           on_done=self._on_status_received,
+                           on_error=lambda e: QtWidgets.QMessageBox.warning(
+                               self, "Error", f"Failed to get status:\n{str(e)}"))
+
+    def _on_status_received(self, data):
+        http_stats = self.http.stats()
+        status_text = f"""Backend Status:
 Arduino Connected: {data.get('arduino_connected', False)}
 Current Level: {data.get('current_level', 0)}
 Current State: {data.get('current_state', 0)}
-Data Points: {data.get('data_points', 0)}"""
-                QtWidgets.QMessageBox.information(self, "Status", status_text)
-                self.update_status_display(data)
-            else:
-                QtWidgets.QMessageBox.warning(self, "Error", f"HTTP {response.status_code}: {response.text}")
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(self, "Error", f"Failed to get status:\n{str(e)}")
+Data Points: {data.get('data_points', 0)}
+
+HTTP Client:
+Requests: {http_stats['requests']}
+Connections Opened: {http_stats['connections_opened']}
+Connections Reused: {http_stats['connections_reused']}"""
+        QtWidgets.QMessageBox.information(self, "Status", status_text)
+        self.update_status_display(data)
 
     def export_csv(self):
         """Export CSV from Rust backend"""
-        try:
-            response = requests.get(self.get_backend_url("/api/csv"), timeout=10)
-            if response.status_code == 200:
-                filename = f"enose_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                with open(filename, 'w', newline='') as f:
-                    f.write(response.text)
-                QtWidgets.QMessageBox.information(self, "Exported", f"Data exported to {filename}")
-            else:
-                QtWidgets.QMessageBox.warning(self, "Error", f"HTTP {response.status_code}: {response.text}")
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(self, "Error", f"Failed to export data:\n{str(e)}")
+        filename = f"enose_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.start_export("/api/csv", filename)
+
+    def export_timeseries_csv(self):
+        """Export time-series CSV (state, level, label) from Rust backend"""
+        filename = f"enose_timeseries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.start_export("/api/csv/timeseries", filename)
+
+    def start_export(self, endpoint, filename):
+        """Stream an export to disk in the background with progress and cancel"""
+        cancel = threading.Event()
+        # Salinan baseline saat ini: worker tidak membaca estimator yang sedang di-update ingest
+        calibration = self.core.calibration
+        if self.core.calibration_mode == "off" or calibration is None:
+            calibration = None
+        else:
+            calibration = (self.core.calibration_mode, BaselineEstimator.from_dict(calibration.to_dict()))
+        submitted = self.engine.submit(
+            self._download_export, self.get_backend_url(endpoint), filename, self.export_compact_check.isChecked(),
+            calibration, progress=self.export_progress.emit, cancel=cancel, tag="export_csv",
+            on_done=self._on_export_done, on_error=self._on_export_failed)
+        if not submitted:
+            return  # export lain masih berjalan
+        self._export_cancel = cancel
+        self.btn_cancel_export.setEnabled(True)
+        self.export_bar.setRange(0, 0)  # busy sampai ukuran diketahui
+        self.export_bar.setFormat(f"Export: {endpoint}")
+
+    def _download_export(self, url, filename, compact, calibration=None, progress=None, cancel=None):
+        """Worker: download, optionally rewrite as runs, then calibrate like the plot.
+
+        Returns (filename, (rows, runs) or None, calibration mode or None). Kompaksi
+        dijalankan pada nilai mentah (baseline drift membuat nilai terkalibrasi tidak identik).
+        """
+        self.metrics.timed("export.download_ms", download_csv)(self.http, url, filename,
+                                                                progress=progress, cancel=cancel)
+        compaction = None
+        if compact:
+            compaction = self.metrics.timed("export.compact_ms", compact_csv)(filename, DEDUP_EPSILON, DEDUP_MAX_RUN_MS)
+        mode = None
+        if calibration is not None and self.metrics.timed("export.calibrate_ms", calibrate_csv)(filename, *calibration):
+            mode = calibration[0]
+        return filename, compaction, mode
+
+    def cancel_export(self):
+        if self._export_cancel is not None:
+            self._export_cancel.set()
+
+    def _on_export_progress(self, done, total):
+        if total:
+            self.export_bar.setRange(0, 100)
+            self.export_bar.setValue(int(done * 100 / total))
+            self.export_bar.setFormat(f"Export: {done / 1024:.0f} / {total / 1024:.0f} KB (%p%)")
+        else:
+            self.export_bar.setFormat(f"Export: {done / 1024:.0f} KB")
+
+    def _finish_export(self, text):
+        self._export_cancel = None
+        self.btn_cancel_export.setEnabled(False)
+        self.export_bar.setRange(0, 100)
+        self.export_bar.setValue(0)
+        self.export_bar.setFormat(text)
+
+    def _on_export_done(self, result):
+        filename, compaction, calibrated = result
+        self.metrics.incr("export.completed")
+        self._finish_export("Export: done")
+        message = f"Data exported to {filename}"
+        if compaction is not None:
+            rows, runs = compaction
+            message += f"\n{rows} rows stored as {runs} runs ({rows / max(runs, 1):.2f}× compaction)"
+        if calibrated is not None:
+            message += f"\nChannels calibrated ({calibrated}): {AXIS_LABELS[calibrated]}"
+        elif self.core.calibration_mode != "off":
+            message += "\nNo baseline yet (IDLE/PURGE) - channels exported raw"
+        QtWidgets.QMessageBox.information(self, "Exported", message)
+
+    def _on_export_failed(self, e):
+        if isinstance(e, DownloadCancelled):
+            self.metrics.incr("export.cancelled")
+            self._finish_export("Export: cancelled")
+            return
+        self.metrics.incr("export.failed")
+        self._finish_export("Export: failed")
+        QtWidgets.QMessageBox.warning(self, "Error", f"Failed to export data:\n{str(e)}")
 
     # ✅ DIRECT ARDUINO CONTROL METHODS
-    def send_direct_to_arduino(self, command):
-        """Kirim command langsung ke Arduino via TCP"""
+    def send_direct_to_arduino(self, command, on_sent=None):
+        """Kirim command langsung ke Arduino lewat channel persisten (tidak pernah blok GUI thread);
+        on_sent(command) dipanggil di GUI thread setelah command di-ack. Aman dipanggil dari thread lain"""
+        self.metrics.incr("arduino.commands")
+        future = self.arduino.send(command)
+        future.add_done_callback(lambda f: self._emit_arduino_result(None, on_sent, f))
+        return future
+
+    def _emit_arduino_result(self, source, callback, future):
+        # Dipanggil dari thread channel; window bisa saja sudah ditutup
         try:
-            if self.arduino_socket is None:
-                self.arduino_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.arduino_socket.settimeout(5)
-                # KONEKSI KE IP DAN PORT ARDUINO
-                self.arduino_socket.connect((ARDUINO_IP, ARDUINO_PORT))
-                print(f"✅ Connected to Arduino {ARDUINO_IP}:{ARDUINO_PORT}")
-            
-            self.arduino_socket.sendall(f"{command}\n".encode())
-            print(f"✅ Direct to Arduino: {command}")
-            return True
-            
+            self.arduino_result.emit(source, callback, future)
+        except RuntimeError:
+            pass
+
+    def _emit_arduino_state(self, state, detail=None):
+        try:
+            self.arduino_state.emit(state, detail)
+        except RuntimeError:
+            pass
+
+    def _on_arduino_result(self, source, callback, future):
+        name = source or "Arduino"
+        try:
+            result = future.result()
         except Exception as e:
-            print(f"❌ Direct Arduino failed: {e}")
-            self.arduino_socket = None
-            QtWidgets.QMessageBox.warning(self, "Direct Control Error", 
-                f"Failed to send command to Arduino:\n{str(e)}")
-            return False
+            # Tanpa dialog modal: error tampil di label link, channel reconnect sendiri
+            self.metrics.incr("arduino.failures")
+            print(f"❌ {name} command failed: {e}")
+            if source is None:
+                self.arduino_link_label.setText(f"Link: ⚠ {e}"[:90])
+            return
+        if result["status"] == "acked":
+            self.metrics.observe("arduino.rtt_ms", result["rtt_ms"])
+            print(f"✅ {name}: {result['command']} -> {result['reply']} ({result['rtt_ms']:.1f} ms)")
+        else:
+            self.metrics.incr("arduino.unacked")
+            print(f"✅ {name}: {result['command']} (no ack)")
+        if source is None:
+            self.arduino_last_rtt = result["rtt_ms"]
+            self._on_arduino_state(self.arduino.state)
+        if callback is not None:
+            callback(result["command"])
+
+    def _on_arduino_state(self, state, detail=None):
+        icons = {"connected": "🟢", "connecting": "🟡", "disconnected": "🔴"}
+        text = f"Link: {icons.get(state, '⚪')} {state} ({ARDUINO_IP}:{ARDUINO_PORT})"
+        if state == "connected" and self.arduino_last_rtt is not None:
+            text += f" · RTT {self.arduino_last_rtt:.0f} ms"
+        if detail:
+            text += f" · {detail}"
+        self.arduino_link_label.setText(text[:90])
 
     def start_sampling_direct(self):
         """Start sampling langsung ke Arduino"""
-        if self.send_direct_to_arduino("START_SAMPLING"):
-            self.sampling_status.setText("Status: RUNNING")
-            self.sampling_status.setStyleSheet("padding: 4px; background-color: #065f46; border-radius: 3px; font-weight: bold; color: #e6fff3;")
-            QtWidgets.QMessageBox.information(self, "Direct Control", 
-                "Sampling started via DIRECT Arduino connection!\n"
-                "• Kipas 2 menit → Pompa 4 menit → Repeat\n"
-                "• Sensor data tetap dikirim ke Rust untuk monitoring")
+        self.send_direct_to_arduino("START_SAMPLING", on_sent=self._on_sampling_started)
+
+    def _on_sampling_started(self, command):
+        self.sampling_status.setText("Status: RUNNING")
+        self.sampling_status.setStyleSheet("padding: 4px; background-color: #065f46; border-radius: 3px; font-weight: bold; color: #e6fff3;")
+        QtWidgets.QMessageBox.information(self, "Direct Control", 
+            "Sampling started via DIRECT Arduino connection!\n"
+            "• Kipas 2 menit → Pompa 4 menit → Repeat\n"
+            "• Sensor data tetap dikirim ke Rust untuk monitoring")
 
     def stop_sampling_direct(self):
         """Stop sampling langsung ke Arduino"""
-        if self.send_direct_to_arduino("STOP_SAMPLING"):
-            self.sampling_status.setText("Status: STOPPED")
-            self.sampling_status.setStyleSheet("padding: 4px; background-color: #7f1d1d; border-radius: 3px; font-weight: bold; color: #fff;")
-            self.actuator_status.setText("Actuator: -")
+        self.send_direct_to_arduino("STOP_SAMPLING", on_sent=self._on_sampling_stopped)
+
+    def _on_sampling_stopped(self, command):
+        self.sampling_status.setText("Status: STOPPED")
+        self.sampling_status.setStyleSheet("padding: 4px; background-color: #7f1d1d; border-radius: 3px; font-weight: bold; color: #fff;")
+        self.actuator_status.setText("Actuator: -")
+
+    # ✅ PROTOCOL METHODS
+    def choose_protocol(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Load Protocol", os.getcwd(), "Protocol (*.json);;All files (*)")
+        if path:
+            self.load_protocol(path)
+
+    def load_protocol(self, path):
+        try:
+            protocols = load_protocols(path)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"❌ Failed to load protocol {path}: {e}")
+            self.protocol_label.setText(f"Protocol: invalid ({e})"[:120])
+            return
+        self.protocols = protocols
+        total_s = sum((p["fan_s"] + p["pump_s"] + p["purge_s"]) * p["repetitions"] for p in protocols)
+        runs = sum(p["repetitions"] for p in protocols)
+        self.protocol_label.setText(f"Protocol: {os.path.basename(path)} · {len(protocols)} sample(s), "
+                                    f"{runs} run(s), {self._format_duration(total_s)}")
+        self.btn_run_protocol.setEnabled(True)
+
+    def toggle_protocol(self, enabled):
+        if enabled and self.core.protocol_runner is None and self.protocols:
+            out_dir = os.path.join(PROTOCOL_RUNS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+            self.core.protocol_runner = ProtocolRunner(
+                self.protocols, self.send_direct_to_arduino, out_dir,
+                on_event=lambda message: print(f"📋 {message}")).start()
+            self.btn_run_protocol.setText("⏹ ABORT PROTOCOL")
+            self.btn_load_protocol.setEnabled(False)
+            self.protocol_timer.start(PROTOCOL_REFRESH_MS)
+            print(f"📋 Protocol started -> {out_dir}")
+            # Data harus mengalir agar file run terisi
+            if not self.monitoring_active:
+                self.start_monitoring()
+        elif not enabled and self.core.protocol_runner is not None and self.core.protocol_runner.running:
+            # Runner menghentikan Arduino & menutup file sendiri; refresh_protocol_status membereskan sisanya
+            self.core.protocol_runner.stop(timeout=0)
+
+    def refresh_protocol_status(self):
+        runner = self.core.protocol_runner
+        if runner is None:
+            return
+        progress = runner.progress()
+        step = progress["step"]
+        if step is not None and step["run"] is not None:
+            self.step_label.setText(f"Current Step: {step['run']} ({step['rep']}/{step['repetitions']}) · "
+                                    f"{step['phase'].upper()} · {self._format_duration(progress['phase_remaining_s'])} left")
+        self.progress_label.setText(f"Progress: {progress['fraction'] * 100:.0f}% "
+                                    f"({self._format_duration(progress['elapsed_s'])} / "
+                                    f"{self._format_duration(progress['total_s'])}) · {progress['rows']} rows")
+        if runner.running:
+            return
+        self.protocol_timer.stop()
+        self.core.protocol_runner = None
+        self.step_label.setText(f"Current Step: protocol {progress['state']}")
+        self.protocol_label.setText(f"Protocol {progress['state']}: {len(runner.runs)} run file(s) in {runner.out_dir}")
+        self.btn_run_protocol.blockSignals(True)
+        self.btn_run_protocol.setChecked(False)
+        self.btn_run_protocol.blockSignals(False)
+        self.btn_run_protocol.setText("▶ RUN PROTOCOL")
+        self.btn_load_protocol.setEnabled(True)
+
+    @staticmethod
+    def _format_duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
 
     # ✅ EDGE IMPULSE METHODS
     def enable_edge_impulse(self):
         """Enable Edge Impulse integration"""
         self.ei_enabled = True
+        if self.core.ei_uploader is None:
+            self.core.ei_uploader = EdgeImpulseUploader(
+                self.metrics.timed("ei.upload_window_ms", self.edge_impulse.send_sensor_window),
+                window_samples=EI_WINDOW_SAMPLES, window_seconds=EI_WINDOW_SECONDS,
+                spool_dir=EI_SPOOL_DIR, interval_ms=EI_INTERVAL_MS)
+        self.ei_stats_timer.start(1000)
         self.ei_status.setText("Status: ENABLED")
         self.ei_status.setStyleSheet("padding: 4px; background-color: #065f46; border-radius: 3px; color: #e6fff3;")
         QtWidgets.QMessageBox.information(self, "Edge Impulse", 
@@ -512,110 +1460,301 @@ Data Points: {data.get('data_points', 0)}"""
     def disable_edge_impulse(self):
         """Disable Edge Impulse integration"""
         self.ei_enabled = False
+        if self.core.ei_uploader is not None:
+            # Window yang belum terkirim masuk spool, dikirim ulang saat EI di-enable lagi.
+            # Upload yang sedang berjalan bisa ~10 s -> join di worker, bukan di GUI thread
+            uploader = self.core.ei_uploader
+            self.update_ei_stats()
+            self.core.ei_uploader = None
+            self.engine.submit(uploader.stop, lane="ei_stop")
+        self.ei_stats_timer.stop()
         self.ei_status.setText("Status: DISABLED")
         self.ei_status.setStyleSheet("padding: 4px; background-color: #7f1d1d; border-radius: 3px; color: #fff;")
 
     def test_edge_impulse_manual(self):
         """Test manual Edge Impulse integration"""
-        try:
-            print("🧪 TESTING EDGE IMPULSE MANUALLY...")
-            
-            # Sample data (7 nilai)
-            test_values = [1.23, 4.56, 7.89, 1.23, 4.56, 7.89, 1.23]
-            success = self.edge_impulse.send_sensor_data(test_values)
-            
-            if success:
-                QtWidgets.QMessageBox.information(self, "Test Success", 
-                    "✅ Edge Impulse integration WORKING!\nData successfully sent.")
-            else:
-                QtWidgets.QMessageBox.warning(self, "Test Failed", 
-                    "❌ Edge Impulse integration FAILED.\nCheck console for error details.")
-                    
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Test Error", 
-                f"🚨 Manual test error: {str(e)}")
+        print("🧪 TESTING EDGE IMPULSE MANUALLY...")
+        
+        # Sample data (7 nilai)
+        test_values = [1.23, 4.56, 7.89, 1.23, 4.56, 7.89, 1.23]
+        self.engine.submit(self.edge_impulse.send_sensor_data, test_values, tag="test_ei",
+                           on_done=self._on_ei_test_result,
+                           on_error=lambda e: QtWidgets.QMessageBox.critical(
+                               self, "Test Error", f"🚨 Manual test error: {str(e)}"))
 
-    def send_to_edge_impulse(self, sensor_data):
-        """Kirim data ke Edge Impulse jika enabled"""
-        if not self.ei_enabled:
+    def _on_ei_test_result(self, success):
+        if success:
+            QtWidgets.QMessageBox.information(self, "Test Success", 
+                "✅ Edge Impulse integration WORKING!\nData successfully sent.")
+        else:
+            QtWidgets.QMessageBox.warning(self, "Test Failed", 
+                "❌ Edge Impulse integration FAILED.\nCheck console for error details.")
+
+    def update_ei_stats(self):
+        """Show uploader throughput, queue depth and failures in the EI panel"""
+        if self.core.ei_uploader is None:
             return
-            
-        try:
-            # Extract 7 sensor values dalam urutan yang benar (sesuai payload di EdgeImpulseIntegration)
-            sensor_values = [
-                float(sensor_data.get('no2', 0)),
-                float(sensor_data.get('eth_gm', 0)),  
-                float(sensor_data.get('voc_gm', 0)),
-                float(sensor_data.get('co_gm', 0)),
-                float(sensor_data.get('co_m', 0)),
-                float(sensor_data.get('eth_m', 0)),
-                float(sensor_data.get('voc_m', 0))
-            ]
-            
-            print(f"📡 Sending to Edge Impulse: {sensor_values}")
-            
-            # Kirim ke Edge Impulse
-            success = self.edge_impulse.send_sensor_data(sensor_values)
-            
-            if success:
-                self.ei_data_count += 1
-                self.ei_count.setText(f"Data Sent: {self.ei_data_count}")
-            else:
-                print("❌ Failed to send to Edge Impulse")
-                
-        except Exception as e:
-            print(f"❌ Edge Impulse send failed: {e}")
+        stats = self.core.ei_uploader.stats()
+        self.ei_count.setText(
+            f"Sent: {stats['samples_sent']} samples ({stats['windows_sent']} win) | "
+            f"{stats['samples_per_sec']:.1f}/s\n"
+            f"Queue: {stats['queued']} + {stats['spooled']} spooled | Failed: {stats['failures']}")
 
     def poll_sensor_data(self):
         """Poll for latest sensor data from Rust backend"""
         if not self.monitoring_active:
             return
+        if self.stream is not None:
+            # Paket datang lewat stream; timer hanya menyegarkan status
+            self.engine.submit(fetch_status, self.http, self.get_backend_url(), metrics=self.metrics,
+                               tag="status", on_done=self.update_status_display, on_error=self._on_poll_failed)
+            return
             
-        try:
-            # Get latest sensor data
-            response = requests.get(self.get_backend_url("/api/data"), timeout=5)
-            if response.status_code == 200:
-                sensor_data_list = response.json()
-                if sensor_data_list:
-                    # Take the latest data point
-                    latest_data = sensor_data_list[-1]
-                    self.update_sensor_display(latest_data)
-                    
-                    # ✅ Kirim ke Edge Impulse
-                    self.send_to_edge_impulse(latest_data)
-                    
-            # Also update status
-            status_response = requests.get(self.get_backend_url("/api/status"), timeout=5)
-            if status_response.status_code == 200:
-                self.update_status_display(status_response.json())
-                
-        except Exception as e:
-            print(f"Polling failed: {e}")
+        # Get only packets newer than the cursor (?since=) plus status, off the GUI thread.
+        # Tag "poll" -> kalau poll sebelumnya belum selesai, tick ini dilewati.
+        submitted = self.engine.submit(poll_backend, self.http, self.get_backend_url(),
+                                       self.data_cursor.params(), metrics=self.metrics, binary=WIRE_BINARY,
+                                       tag="poll", on_done=self._on_poll_result, on_error=self._on_poll_failed)
+        self.metrics.incr("poll.submitted" if submitted else "poll.skipped_busy")
+
+    def _on_poll_failed(self, e):
+        self.metrics.incr("poll.failures")
+        print(f"Polling failed: {e}")
+
+    def _on_poll_result(self, result):
+        if not self.monitoring_active:
+            return
+        sensor_data_list, status = result
+        
+        if isinstance(sensor_data_list, dict):
+            # Backend mengirim kolom biner -> ingest satu batch NumPy, tanpa dict per paket
+            columns = self.data_cursor.advance_columns(sensor_data_list)
+            self.ingest_columns(columns)
+            self.metrics.incr("ingest.already_seen",
+                              len(sensor_data_list["timestamp"]) - len(columns["timestamp"]))
+        else:
+            # Ingest every new packet, not just the latest one
+            new_packets = self.data_cursor.advance(sensor_data_list)
+            self.ingest_packets(new_packets)
+            self.metrics.incr("ingest.already_seen", len(sensor_data_list) - len(new_packets))
+        
+        # Also update status
+        self.update_status_display(status)
+
+    def ingest_packets(self, packets):
+        """Feed new packets (already de-duplicated by the cursor) through the ingest path"""
+        start = time.perf_counter()
+        for sensor_data in packets:
+            self.update_sensor_display(sensor_data)
+        
+        # Recorder, siklus, EI, protokol, statistik & kalibrasi: enose_core (sama dengan mode headless)
+        self._select_calibration_device()
+        self._on_core_result(self.core.ingest_packets(packets))
+        self.metrics.observe("ingest.batch_ms", (time.perf_counter() - start) * 1000)
+
+    def ingest_columns(self, columns):
+        """Vectorized ingest_packets for a column dict (binary /api/data), one buffer write per batch"""
+        n = len(columns["timestamp"])
+        if n == 0:
+            return
+        start = time.perf_counter()
+        latest = column_packet(columns)
+        for key in CHANNELS:
+            if latest[key] != self._latest_values.get(key):
+                self._latest_values[key] = latest[key]
+                self._dirty_labels.add(key)
+        
+        self.data_count += n
+        self._mark_curves_dirty()
+        
+        if self._ingest_pending_since is None:
+            self._ingest_pending_since = start
+        self._newest_sensor_ts = latest['timestamp']
+        
+        self._select_calibration_device()
+        self._on_core_result(self.core.ingest_columns(columns))
+        self.metrics.observe("ingest.batch_ms", (time.perf_counter() - start) * 1000)
+
+    # ==================== ONLINE STATS & ALARMS ====================
+    @staticmethod
+    def stats_options():
+        return {"windows": STATS_WINDOWS, "alpha": STATS_EWMA_ALPHA, "z_threshold": ALARM_Z,
+                "min_samples": ALARM_MIN_SAMPLES, "stuck_samples": STUCK_SAMPLES, "thresholds": ALARM_THRESHOLDS}
+
+    def _on_core_result(self, result):
+        """GUI side of an ingest batch (the last result["n"] samples): plot runs, cycles, alarms, baseline"""
+        if result is None:
+            return
+        first_x = self.data_count - result["n"] + 1
+        # Buffer plot hanya menyimpan awal & akhir tiap run (x = nomor paket), jadi run tergambar datar
+        index, values = step_points(result["runs"])
+        if index.size:
+            self.plot_buffer.extend(first_x + index, values)
+        self._update_dedup_label()
+        for cycle in result["cycles"]:
+            self.on_cycle_closed(cycle)
+        for event in result["events"]:
+            self._pending_alarms.append((first_x + event["index"], event))
+            if event["severity"] != "warn":
+                print(f"🚨 Alarm {event['channel']}: {event['kind']} ({event['value']:.3f})")
+        levels = self.core.stats.alarm_levels()
+        if levels != self._alarm_levels:
+            self._alarm_levels = levels
+            self._alarm_styles_dirty = True
+        if result["baseline_updated"]:
+            self._update_calibration_tooltip()
+
+    def _apply_alarm_styles(self):
+        """Value label background = highest active alarm severity of that channel"""
+        self._alarm_styles_dirty = False
+        for key, label in self.value_labels.items():
+            color = ALARM_COLORS[self._alarm_levels[key]]
+            background = f" background-color: {color}; border-radius: 3px;" if color else ""
+            label.setStyleSheet(f"font-weight: bold; color: #e2e8f0; font-size: 12px;{background}")
+
+    def _stats_tooltip(self, entry):
+        window = STATS_WINDOWS[0]
+        alarms = ", ".join(entry["alarms"]) or "none"
+        return (f"mean {entry['mean']:.3f} ± {entry['std']:.3f} (n={entry['count']})\n"
+                f"EWMA {entry['ewma']:.3f} ± {entry['ewma_std']:.3f} · rate {entry['rate_per_s']:+.3f}/s\n"
+                f"min/max last {window}: {entry[f'min_{window}']:.3f} / {entry[f'max_{window}']:.3f}\n"
+                f"same value ×{entry['stuck_run']} · missing (-1.0) {entry['sentinels']} · alarms: {alarms}")
+
+    def _add_alarm_annotations(self):
+        """Dashed vertical line + label on the live plot for each newly raised alarm"""
+        pg = load_pyqtgraph()
+        while self._pending_alarms:
+            x, event = self._pending_alarms.popleft()
+            color = ALARM_COLORS[event["severity"]]
+            text = f"{CHANNEL_LABELS[CHANNELS.index(event['channel'])]} {event['kind']}"
+            if "z" in event:
+                text += f" {event['z']:+.1f}σ"
+            line = pg.InfiniteLine(pos=x, angle=90, movable=False,
+                                   pen=pg.mkPen(color, width=1, style=QtCore.Qt.PenStyle.DashLine),
+                                   label=text, labelOpts={"position": 0.92, "color": color})
+            line.setVisible(self.replay is None)
+            # ignoreBounds: garis alarm tidak ikut menentukan auto-range
+            self.combined_plot.addItem(line, ignoreBounds=True)
+            self.alarm_annotations.append(line)
+            if len(self.alarm_annotations) > ALARM_ANNOTATIONS:
+                self.combined_plot.removeItem(self.alarm_annotations.popleft())
+
+    def _set_alarm_annotations_visible(self, visible):
+        # Posisi x garis alarm = indeks sampel live, tidak berlaku untuk sumbu replay
+        for line in self.alarm_annotations:
+            line.setVisible(visible)
+
+    # ==================== DUPLICATE SUPPRESSION ====================
+    @staticmethod
+    def dedup_options():
+        return {"epsilon": DEDUP_EPSILON, "max_run_ms": DEDUP_MAX_RUN_MS}
+
+    def _update_dedup_label(self):
+        stats = self.core.dedup.stats()
+        self.dedup_label.setText(f"Dedup: {stats['ratio']:.2f}×")
+        self.dedup_label.setToolTip(f"Rows ingested: {stats['rows']}\nRuns stored: {stats['runs']}\n"
+                                    f"Duplicates suppressed: {stats['suppressed']}")
+
+    # ==================== CALIBRATION ====================
+    def _select_calibration_device(self):
+        """Baseline of the backend in the IP/port fields (loaded from the cache when it changes)"""
+        ip = self.backend_ip.text().strip() or RUST_IP
+        if self.core.set_device(device_key(ip, self.backend_port.text().strip() or str(RUST_PORT))):
+            self._update_calibration_tooltip()
+
+    def _update_calibration_tooltip(self):
+        baseline = self.core.calibration.baseline if self.core.calibration is not None else None
+        shown = f"Plot, EI & export: {AXIS_LABELS[self.core.calibration_mode]}\n"
+        if baseline is None:
+            self.calibration_combo.setToolTip(shown + "Baseline: waiting for IDLE/PURGE data")
+            return
+        lines = [f"{label}: {value:.3f}" for label, value in zip(CHANNEL_LABELS, baseline)]
+        self.calibration_combo.setToolTip(shown + f"Baseline ({len(self.core.calibration.history)} segments)\n"
+                                          + "\n".join(lines))
+
+    def set_calibration_mode(self, mode):
+        self.core.calibration_mode = mode
+        for tile in self.device_tiles.values():
+            tile.set_calibration_mode(mode)
+        if self.combined_plot is not None:
+            self.combined_plot.setLabel('left', AXIS_LABELS[mode], color='#e2e8f0')
+        self._update_calibration_tooltip()
+        self._mark_curves_dirty()
+
+    def _calibrate_replay(self, readers):
+        """Worker: per-recording baselines, resumed from the cache (only new rows are read)"""
+        return {reader.path: calibrate_recording(reader, self.core.calibration_cache) for reader in readers}
+
+    def _on_replay_calibrated(self, dataset, estimators):
+        if self.replay is not dataset:
+            return
+        self.replay_calibration = estimators
+        segments = sum(len(estimator.history) for estimator in estimators.values())
+        print(f"📐 Replay baseline: {segments} IDLE/PURGE segment(s) in {len(estimators)} file(s)")
+        self._mark_curves_dirty()
+
+    # ✅ PUSH STREAM METHODS
+    def start_stream(self):
+        def emit_packets(packets):
+            try:
+                self.stream_packets.emit(packets)
+            except RuntimeError:
+                pass  # window sudah ditutup
+
+        def emit_state(state, detail):
+            try:
+                self.stream_state.emit(state, detail)
+            except RuntimeError:
+                pass
+
+        self.stream = PacketStream(self.get_backend_url(), self.data_cursor, emit_packets, emit_state).start()
+
+    def stop_stream(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.stop(timeout=0)  # thread stream keluar sendiri, GUI tidak menunggu join
+
+    def _on_stream_packets(self, packets):
+        if not self.monitoring_active or self.stream is None:
+            return
+        self.metrics.incr("stream.packets", len(packets))
+        self.ingest_packets(packets)
+
+    def _on_stream_state(self, state, detail):
+        if self.stream is None:
+            return
+        if state == "connected":
+            self.ingest_mode_label.setText("Ingest: stream 🟢")
+        elif state == "reconnecting":
+            self.metrics.incr("stream.reconnects")
+            self.ingest_mode_label.setText("Ingest: stream reconnecting...")
+            print(f"🔁 Stream disconnected, reconnecting: {detail}")
+        elif state == "unsupported":
+            # Backend lama tanpa /api/stream -> kembali ke polling biasa
+            self.stop_stream()
+            print("ℹ️ Backend has no /api/stream, falling back to polling")
+            self.ingest_mode_label.setText(f"Ingest: polling {self.poll_interval_ms} ms (no stream)")
+            if self.monitoring_active:
+                self.update_timer.start(self.poll_interval_ms)
 
     def update_status_display(self, data):
         """Update status display dengan data REAL dari Rust"""
-        state_names = ["IDLE", "PRE_COND", "RAMP_UP", "HOLD", "PURGE", "RECOVERY", "DONE"]
-        current_state = data.get('current_state', 0)
-        state_name = state_names[current_state] if current_state < len(state_names) else "UNKNOWN"
-        
-        self.state_label.setText(f"State: {state_name}")
-        self.level_label.setText(f"Level: {data.get('current_level', 0)}")
-        self.data_count_label.setText(f"Data Points: {data.get('data_points', 0)}")
+        status = describe_status(data)
+        self.state_label.setText(f"State: {status['state_name']}")
+        self.level_label.setText(f"Level: {status['level']}")
+        self.data_count_label.setText(f"Data Points: {status['data_points']}")
         
         # ✅ Update sampling status dari Arduino data
-        sampling_active = data.get('current_level', 0)  # Arduino kirim samplingActive di current_level
-        sampling_state = data.get('current_state', 0)  # Arduino kirim state di current_state
-        
-        if sampling_active == 1:  # Jika sampling aktif
-            if sampling_state == 1:
+        if status["sampling_active"]:
+            if status["actuator"] == "fan":
                 self.actuator_status.setText("Actuator: 🌀 KIPAS (2 menit)")
-            elif sampling_state == 2:
+            elif status["actuator"] == "pump":
                 self.actuator_status.setText("Actuator: 💧 POMPA (4 menit)")
         else:
             self.actuator_status.setText("Actuator: -")
         
         # Update connection status
-        if data.get('arduino_connected', False):
+        if status["arduino_connected"]:
             self.connection_status.setText("🟢 Arduino Connected")
             self.connection_status.setStyleSheet("font-weight: bold; padding: 4px 8px; background-color: #065f46; border-radius: 4px; color: #e6fff3;")
         else:
@@ -623,63 +1762,381 @@ Data Points: {data.get('data_points', 0)}"""
             self.connection_status.setStyleSheet("font-weight: bold; padding: 4px 8px; background-color: #7f1d1d; border-radius: 4px; color: #fff;")
 
     def update_sensor_display(self, sensor_data):
-        """Update sensor display dengan data REAL dari Rust backend"""
-        value_style = "font-weight: bold; color: #e2e8f0; font-size: 12px;"
+        """Ingest satu paket dari Rust backend: tulis buffer dan tandai yang perlu digambar ulang"""
+        start = time.perf_counter()
+        values = [float(sensor_data.get(key, 0)) for key in CHANNELS]
         
-        # Update labels dengan data aktual
-        self.no2_label.setText(f"{sensor_data.get('no2', 0):.3f}")
-        self.no2_label.setStyleSheet(value_style)
+        # Label hanya ditandai jika nilainya berubah
+        for key, value in zip(CHANNELS, values):
+            if value != self._latest_values.get(key):
+                self._latest_values[key] = value
+                self._dirty_labels.add(key)
         
-        self.eth_gm_label.setText(f"{sensor_data.get('eth_gm', 0):.3f}")
-        self.eth_gm_label.setStyleSheet(value_style)
+        # Buffer plot ditulis per run setelah batch lewat core (_on_core_result)
+        self.data_count += 1
+        self._mark_curves_dirty()
         
-        self.voc_gm_label.setText(f"{sensor_data.get('voc_gm', 0):.3f}")
-        self.voc_gm_label.setStyleSheet(value_style)
+        if self._ingest_pending_since is None:
+            self._ingest_pending_since = start
+        self._newest_sensor_ts = sensor_data.get('timestamp')
+        self.metrics.observe("ingest.packet_ms", (time.perf_counter() - start) * 1000)
+
+    def on_cycle_closed(self, cycle):
+        """Show a short summary (and the local classification) of the cycle that just finished"""
+        info, features = cycle["info"], cycle["features"]
+        state = STATE_NAMES[info['state']] if 0 <= info['state'] < len(STATE_NAMES) else "UNKNOWN"
+        delta = features[:, FEATURE_NAMES.index("delta")]
+        strongest = int(np.argmax(np.abs(delta)))
+        self.cycle_label.setText(
+            f"Last Cycle: L{info['level']} {state} · {info['samples']} samples · "
+            f"max ΔR {CHANNEL_LABELS[strongest]} {delta[strongest]:+.3f}")
+
+        prediction = cycle["prediction"]
+        if prediction is not None:
+            self.odor_label.setText(f"Odor: {class_display_name(prediction['label'])} "
+                                    f"({prediction['confidence']:.0%}) · {prediction['ms']:.1f} ms")
+
+    def _on_classifier_trained(self, result):
+        self.core.classifier, info = result
+        print(f"🧠 Local classifier trained: {info['cycles']} cycles from {info['files']} files, "
+              f"leave-one-file-out accuracy {info['lofo_accuracy']:.0%}")
+        self.odor_label.setText(f"Odor: waiting for cycle ({len(self.core.classifier.classes)} classes)")
+
+    def _on_classifier_failed(self, error):
+        print(f"❌ Local classifier training failed: {error}")
+        self.odor_label.setText("Odor: model unavailable")
+
+    def render_frame(self):
+        """Redraw dirty labels/curves; called by render_timer at render_fps"""
+        if not (self._dirty_labels or self._dirty_curves):
+            return
+        start = time.perf_counter()
         
-        self.co_gm_label.setText(f"{sensor_data.get('co_gm', 0):.3f}")
-        self.co_gm_label.setStyleSheet(value_style)
+        if self._dirty_labels:
+            stats = self.core.stats.snapshot()
+            for key in self._dirty_labels:
+                self.value_labels[key].setText(f"{self._latest_values[key]:.3f}")
+                self.value_labels[key].setToolTip(self._stats_tooltip(stats[key]))
+            self._dirty_labels.clear()
+        if self._alarm_styles_dirty:
+            self._apply_alarm_styles()
+        if self._pending_alarms and self.combined_plot is not None:
+            self._add_alarm_annotations()
         
-        self.co_mics_label.setText(f"{sensor_data.get('co_m', 0):.3f}")
-        self.co_mics_label.setStyleSheet(value_style)
+        if self.combined_plot is not None and (len(self.plot_buffer) > 1 or self.replay is not None):
+            # Curve yang disembunyikan (klik legend) tetap dirty sampai tampil lagi
+            xs, ys = self._decimated_view()
+            hidden = set()
+            for i in self._dirty_curves:
+                if self.curves[i].isVisible():
+                    self.curves[i].setData(xs[i], ys[i])
+                else:
+                    hidden.add(i)
+            self._dirty_curves = hidden
         
-        self.eth_mics_label.setText(f"{sensor_data.get('eth_m', 0):.3f}")
-        self.eth_mics_label.setStyleSheet(value_style)
+        # Frame time (EMA) vs budget per frame -> sisa headroom render
+        end = time.perf_counter()
+        elapsed_ms = (end - start) * 1000
+        self.metrics.observe("render.frame_ms", elapsed_ms)
+        self.metrics.incr("render.frames")
+        if self._ingest_pending_since is not None and not self._dirty_curves:
+            # Semua paket sampai titik ini sudah tergambar (setData; paint menyusul di event loop)
+            self.metrics.observe("latency.ingest_to_pixel_ms", (end - self._ingest_pending_since) * 1000)
+            if self._newest_sensor_ts:
+                self.metrics.observe("latency.sensor_to_pixel_ms",
+                                     max(time.time() * 1000 - self._newest_sensor_ts, 0))
+            self._ingest_pending_since = None
+        self.frame_time_ms = elapsed_ms if self.frame_time_ms == 0 else 0.9 * self.frame_time_ms + 0.1 * elapsed_ms
+        budget_ms = 1000 / self.render_fps
+        self.frame_label.setText(f"Frame: {self.frame_time_ms:.2f} ms / {budget_ms:.0f} ms budget")
+
+    def _decimated_view(self):
+        """Visible part of the buffer reduced to ~2 points per horizontal pixel (min/max per bucket)"""
+        view_box = self.combined_plot.getViewBox()
+        if self.replay is not None:
+            x, data = self._replay_window(view_box)
+            return minmax_decimate(x, data, max(int(view_box.width()), 100))
         
-        self.voc_mics_label.setText(f"{sensor_data.get('voc_m', 0):.3f}")
-        self.voc_mics_label.setStyleSheet(value_style)
+        x, data = self.plot_buffer.view()
+        # Saat auto-range X aktif seluruh buffer dipakai (agar view ikut bertambah),
+        # kalau user zoom/pan hanya rentang yang terlihat (+1 titik di tiap sisi)
+        if not view_box.autoRangeEnabled()[0]:
+            x_min, x_max = view_box.viewRange()[0]
+            lo = max(int(np.searchsorted(x, x_min)) - 1, 0)
+            hi = min(int(np.searchsorted(x, x_max)) + 1, x.size)
+            x, data = x[lo:hi], data[:, lo:hi]
         
-        # Update data buffers untuk plotting
-        self.data_count += 1
-        self.timestamps.append(self.data_count)
-        
-        self.no2_data.append(sensor_data.get('no2', 0))
-        self.eth_gm_data.append(sensor_data.get('eth_gm', 0))
-        self.voc_gm_data.append(sensor_data.get('voc_gm', 0))
-        self.co_gm_data.append(sensor_data.get('co_gm', 0))
-        self.co_mics_data.append(sensor_data.get('co_m', 0))
-        self.eth_mics_data.append(sensor_data.get('eth_m', 0))
-        self.voc_mics_data.append(sensor_data.get('voc_m', 0))
-        
-        # Trim buffers jika terlalu panjang
-        if len(self.timestamps) > self.max_data_points:
-            self.timestamps.pop(0)
-            self.no2_data.pop(0)
-            self.eth_gm_data.pop(0)
-            self.voc_gm_data.pop(0)
-            self.co_gm_data.pop(0)
-            self.co_mics_data.pop(0)
-            self.eth_mics_data.pop(0)
-            self.voc_mics_data.pop(0)
-        
-        # Update plots dengan data REAL
-        if len(self.timestamps) > 1:
-            self.curve_no2.setData(self.timestamps, self.no2_data)
-            self.curve_eth_gm.setData(self.timestamps, self.eth_gm_data)
-            self.curve_voc_gm.setData(self.timestamps, self.voc_gm_data)
-            self.curve_co_gm.setData(self.timestamps, self.co_gm_data)
-            self.curve_co_mics.setData(self.timestamps, self.co_mics_data)
-            self.curve_eth_mics.setData(self.timestamps, self.eth_mics_data)
-            self.curve_voc_mics.setData(self.timestamps, self.voc_mics_data)
+        n_buckets = max(int(view_box.width()), 100)
+        xs, ys = minmax_decimate(x, data, n_buckets)
+        # Koreksi per channel monoton -> boleh setelah decimation (min/max per bucket tetap sama)
+        if self.core.calibration is not None:
+            ys = apply_calibration(ys, self.core.calibration.baseline, self.core.calibration_mode)
+        return xs, ys
+
+    def _replay_window(self, view_box):
+        """Rows to plot in replay mode: the last max_data_points rows before the cursor,
+        or whatever range the user zoomed/panned to (x = row index)"""
+        if view_box.autoRangeEnabled()[0]:
+            start, stop = max(self.replay_pos - self.max_data_points, 0), self.replay_pos
+        else:
+            x_min, x_max = view_box.viewRange()[0]
+            start = min(max(int(x_min) - 1, 0), len(self.replay))
+            stop = min(max(int(x_max) + 2, start), len(self.replay))
+        # Jendela jauh lebih lebar dari layar: envelope min/max dari piramida, tanpa membaca baris mentah
+        envelope = replay_envelope(self.replay, self.replay_index, start, stop, max(int(view_box.width()), 100),
+                                   self.replay_calibration, self.core.calibration_mode)
+        if envelope is not None:
+            return envelope
+        data = self.replay.channels(start, stop)
+        if self.core.calibration_mode != "off" and self.replay_calibration:
+            # Baseline per baris (interpolasi antar fase IDLE/PURGE tiap file -> drift terkoreksi)
+            data = apply_calibration(data, replay_baseline(self.replay, self.replay_calibration, start, stop),
+                                     self.core.calibration_mode)
+        return np.arange(start, stop, dtype=np.float64), data
+
+    # ✅ REPLAY METHODS
+    def open_replay(self):
+        """Pick CSV datasets and/or recordings (index.json) to replay"""
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
+            self, "Open Replay", os.getcwd(), "E-Nose data (*.csv index.json);;All files (*)")
+        if not paths:
+            return
+        self.replay_label.setText(f"Indexing {len(paths)} file(s)...")
+        # Parsing CSV pertama kali bisa lama -> worker; berikutnya langsung dari cache
+        self.engine.submit(lambda: [open_cached(path, REPLAY_CACHE_DIR) for path in paths],
+                           tag="open_replay", on_done=self._on_replay_loaded,
+                           on_error=lambda e: QtWidgets.QMessageBox.warning(
+                               self, "Replay Error", f"Failed to open replay data:\n{str(e)}"))
+
+    def _on_replay_loaded(self, readers):
+        dataset = ReplayDataset(readers)
+        if len(dataset) == 0:
+            QtWidgets.QMessageBox.warning(self, "Replay", "Selected files contain no data")
+            self.replay_label.setText("Mode: LIVE")
+            return
+        self.replay = dataset
+        self.replay_calibration = {}
+        self.replay_index = {}
+        self._replay_catalog = None
+        self.engine.submit(index_sessions, dataset.readers, lane="index",
+                           on_done=lambda indexes: self._on_replay_indexed(dataset, indexes),
+                           on_error=lambda e: print(f"❌ Replay indexing failed: {e}"))
+        self.engine.submit(self._calibrate_replay, dataset.readers, lane="calibration",
+                           on_done=lambda estimators: self._on_replay_calibrated(dataset, estimators),
+                           on_error=lambda e: print(f"❌ Replay calibration failed: {e}"))
+        self.replay_slider.blockSignals(True)
+        self.replay_slider.setRange(1, len(dataset))
+        self.replay_slider.blockSignals(False)
+        for widget in (self.btn_play_replay, self.btn_live, self.replay_speed_combo, self.replay_slider,
+                       self.replay_query, self.btn_query_next, self.btn_query_export):
+            widget.setEnabled(True)
+        self.build_plot()
+        self._set_alarm_annotations_visible(False)
+        self.combined_plot.getViewBox().enableAutoRange(x=True)
+        self.seek_replay(min(self.max_data_points, len(dataset)))
+
+    def seek_replay(self, row):
+        """Move the replay cursor (end of the plotted window) to `row`"""
+        if self.replay is None:
+            return
+        self.replay_pos = int(min(max(row, 1), len(self.replay)))
+        if self.replay_slider.value() != self.replay_pos:
+            self.replay_slider.blockSignals(True)
+            self.replay_slider.setValue(self.replay_pos)
+            self.replay_slider.blockSignals(False)
+        
+        # Label nilai/state mengikuti baris di posisi cursor
+        last = self.replay_pos - 1
+        for key, value in zip(CHANNELS, self.replay.channels(last, last + 1)[:, 0]):
+            self._latest_values[key] = float(value)
+            self._dirty_labels.add(key)
+        state = int(self.replay.column("state", last, last + 1)[0])
+        level = int(self.replay.column("level", last, last + 1)[0])
+        self.update_status_display({"current_state": state, "current_level": level,
+                                    "data_points": len(self.replay), "arduino_connected": False})
+        timestamp = int(self.replay.column("timestamp", last, last + 1)[0])
+        self.replay_label.setText(
+            f"Replay: {self.replay.source_name(last)} | row {self.replay_pos}/{len(self.replay)} | "
+            f"{datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')}")
+        self._mark_curves_dirty()
+
+    def _on_replay_slider(self, row):
+        self.seek_replay(row)
+        self._sync_replay_time()
+
+    def _sync_replay_time(self):
+        self._replay_time = float(self.replay.column("timestamp", self.replay_pos - 1, self.replay_pos)[0])
+
+    def toggle_replay_playback(self, playing):
+        if playing and self.replay is not None:
+            self.btn_play_replay.setText("⏸ Pause")
+            self._replay_clock = time.monotonic()
+            self._sync_replay_time()
+            self.replay_timer.start(50)
+        else:
+            self.btn_play_replay.setText("▶ Play")
+            self.replay_timer.stop()
+
+    def advance_replay(self):
+        """Move the cursor by real elapsed time x speed, using the recorded timestamps"""
+        now = time.monotonic()
+        elapsed, self._replay_clock = now - self._replay_clock, now
+        if self.replay_pos >= len(self.replay):
+            self.btn_play_replay.setChecked(False)
+            return
+        speed = REPLAY_SPEEDS[self.replay_speed_combo.currentIndex()]
+        self._replay_time += elapsed * speed * 1000
+        
+        # Jeda panjang antar file/sesi dilompati, tidak ditunggu
+        next_ts = int(self.replay.column("timestamp", self.replay_pos, self.replay_pos + 1)[0])
+        if next_ts - self._replay_time > REPLAY_MAX_GAP_MS:
+            self._replay_time = float(next_ts)
+        
+        # Semua baris dengan timestamp <= waktu play sudah "terjadi"
+        row = self.replay.row_at_time(int(self._replay_time) + 1)
+        if row > self.replay_pos:
+            self.seek_replay(row)
+
+    def _on_replay_indexed(self, dataset, indexes):
+        if self.replay is not dataset:
+            return
+        self.replay_index = indexes
+        self._replay_catalog = Catalog(indexes.values())
+        print(f"🗂 Replay index: {len(self._replay_catalog.phases)} phase(s), "
+              f"labels: {', '.join(self._replay_catalog.labels) or '-'}")
+        self._mark_curves_dirty()
+
+    def _replay_matches(self):
+        """Phases of the replay matching the query field, with their dataset row range (None on error)"""
+        if self._replay_catalog is None:
+            QtWidgets.QMessageBox.information(self, "Query", "Replay index is still being built")
+            return None
+        try:
+            query = parse_query(self.replay_query.text())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Query", str(e))
+            return None
+        offsets = {reader.path: int(base) for reader, base in zip(self.replay.readers, self.replay.offsets)}
+        matches = self._replay_catalog.find(**query)
+        for match in matches:
+            match["row"] = offsets[match["path"]] + match["start"]
+        return matches
+
+    def find_next_replay_match(self):
+        """Jump to (and zoom on) the first matching phase after the replay cursor, wrapping around"""
+        matches = self._replay_matches()
+        if matches is None:
+            return
+        if not matches:
+            self.replay_label.setText("Query: no match")
+            return
+        matches.sort(key=lambda m: m["row"])
+        i = next((i for i, m in enumerate(matches) if m["row"] >= self.replay_pos), 0)
+        match = matches[i]
+        self.btn_play_replay.setChecked(False)
+        self.seek_replay(match["row"] + match["rows"])
+        self.combined_plot.getViewBox().setXRange(match["row"], match["row"] + match["rows"], padding=0.05)
+        state = STATE_NAMES[match["state"]] if 0 <= match["state"] < len(STATE_NAMES) else match["state"]
+        self.replay_label.setText(f"Match {i + 1}/{len(matches)}: {match['source']} | {state} L{match['level']} | "
+                                  f"{match['rows']} rows | "
+                                  f"{datetime.fromtimestamp(match['t0'] / 1000).strftime('%Y-%m-%d %H:%M:%S')}")
+
+    def export_replay_matches(self):
+        """Write every phase matching the query to one CSV (/api/csv format + source column)"""
+        matches = self._replay_matches()
+        if not matches:
+            if matches is not None:
+                QtWidgets.QMessageBox.information(self, "Query", "No matching phases to export")
+            return
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export Matches", f"enose_query_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", "CSV (*.csv)")
+        if not filename:
+            return
+        self.engine.submit(
+            self.metrics.timed("export.query_ms", self._replay_catalog.export_csv), matches, filename,
+            tag="export_query",
+            on_done=lambda rows: QtWidgets.QMessageBox.information(
+                self, "Exported", f"{len(matches)} phase(s), {rows} rows exported to {filename}"),
+            on_error=lambda e: QtWidgets.QMessageBox.warning(self, "Error", f"Failed to export matches:\n{e}"))
+
+    def close_replay(self):
+        """Leave replay mode and show the live buffer again"""
+        self.btn_play_replay.setChecked(False)
+        self.replay = None
+        self.replay_calibration = {}
+        self.replay_index = {}
+        self._replay_catalog = None
+        for widget in (self.btn_play_replay, self.btn_live, self.replay_speed_combo, self.replay_slider,
+                       self.replay_query, self.btn_query_next, self.btn_query_export):
+            widget.setEnabled(False)
+        self.replay_label.setText("Mode: LIVE")
+        if self.combined_plot is not None:
+            self.combined_plot.getViewBox().enableAutoRange(x=True)
+        self._set_alarm_annotations_visible(True)
+        self._mark_curves_dirty()
+
+    def _on_plot_range_changed(self, *args):
+        # Perubahan range karena auto-range tidak perlu decimation ulang
+        if not self.combined_plot.getViewBox().autoRangeEnabled()[0]:
+            self._mark_curves_dirty()
+
+    def _mark_curves_dirty(self, *args):
+        self._dirty_curves.update(range(len(CHANNELS)))
+
+    def toggle_recording(self, enabled):
+        """Start/stop appending every ingested packet to a new session recording"""
+        if enabled and self.core.recorder is None:
+            path = os.path.join(RECORDINGS_DIR, f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            self.core.recorder = SessionRecorder(path, meta={"backend": self.get_backend_url()})
+            self.record_label.setText(f"Recorder: {path}")
+            print(f"⏺ Recording to {path}")
+        elif not enabled and self.core.recorder is not None:
+            self.core.recorder.close()
+            self.record_label.setText(f"Recorder: off ({self.core.recorder.rows} rows saved)")
+            print(f"⏹ Recording closed: {self.core.recorder.path} ({self.core.recorder.rows} rows)")
+            self.core.recorder = None
+
+    def set_max_data_points(self, value):
+        """Resize the plot window, keeping the newest samples"""
+        self.max_data_points = int(value)
+        self.plot_buffer.resize(self.max_data_points)
+        self._mark_curves_dirty()
+
+    def set_poll_interval(self, value):
+        self.poll_interval_ms = int(value)
+        self.device_poller.interval = self.poll_interval_ms / 1000
+        if self.update_timer.isActive() and self.stream is None:
+            self.update_timer.setInterval(self.poll_interval_ms)
+
+    def set_render_fps(self, value):
+        self.render_fps = int(value)
+        self.render_timer.setInterval(int(1000 / self.render_fps))
+
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        self.perf_timer.stop()
+        self.device_timer.stop()
+        self.device_poller.shutdown()
+        self.stop_stream()
+        self.protocol_timer.stop()
+        if self.core.protocol_runner is not None:
+            self.core.protocol_runner.stop(timeout=5)
+        self.arduino.stop()
+        self.device_registry.close()
+        self.elapsed_timer.stop()
+        self.render_timer.stop()
+        self.replay_timer.stop()
+        self.ei_stats_timer.stop()
+        self.cancel_export()
+        self.toggle_recording(False)
+        if self.core.ei_uploader is not None:
+            # Thread non-daemon: window tertutup langsung, proses menunggu spool selesai sebelum keluar
+            threading.Thread(target=self.core.ei_uploader.stop, kwargs={"timeout": 15.0},
+                             name="ei-uploader-stop").start()
+            self.core.ei_uploader = None
+        self.engine.shutdown()
+        self.http.close()
+        super().closeEvent(event)
 
     def update_elapsed_time(self):
         """Update elapsed time display"""
@@ -706,4 +2163,12 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Mode batch: python frontend.py batch <folder/CSV...> [--out dataset.npz] [--workers N]
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from enose_batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+    # Query indeks: python frontend.py query <folder/CSV/rekaman...> [--label ..] [--state HOLD] [--export out.csv]
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        from enose_index import main as query_main
+        sys.exit(query_main(sys.argv[2:]))
     main()